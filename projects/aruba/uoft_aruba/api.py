@@ -1,6 +1,8 @@
 from requests import Session
 import urllib3
 
+from uoft_core.metrics import instrument_session
+
 
 class ArubaRESTAPIError(Exception):
     def __init__(self, msg, data=None, *args: object) -> None:
@@ -12,7 +14,7 @@ class ArubaRESTAPIClient:
     def __init__(self, host, username, password, default_config_path="/mm", ssl_verify=False) -> None:
         self.host = host
         self.auth = dict(username=username, password=password)
-        self.session = Session()
+        self.session = instrument_session(Session())
         self.session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
 
         self.default_config_path = default_config_path
@@ -1,4 +1,4 @@
-from typing import Any, Literal, overload
+from typing import Any, Iterator, Literal, overload
 from functools import cached_property
 
 from uoft_core.api import APIBase, RESTAPIError
@@ -129,13 +129,16 @@ class API(APIBase):
         # set a high limit to lower the number of requests,
         # but only if a limit hasn't already been set
         params.setdefault("limit", 99999)
-        res = self.get(url, params=params, **kwargs).json()
-        data = res["data"]
-        while res.get("_links", {}).get("next"):
-            logger.debug(f"Fetching next page of addresses: {res['_links']['next']['href']}")
-            res = self.get(res["_links"]["next"]["href"]).json()
-            data.extend(res["data"])
-        return data
+        return list(self.iter_records(url, params=params, **kwargs))
+
+    def iter_all(self, url, page_size: int = 1000, **kwargs) -> Iterator[dict[str, Any]]:
+        """
+        Like `get_all`, but yields records one page at a time instead of collecting them all into a list,
+        fetching the next page in the background while the current one is being processed.
+        Use this for very large collections (ie addresses) to keep peak memory low.
+        """
+        logger.info(f"Streaming all records in {url}")
+        yield from self.iter_records(url, page_size=page_size, **kwargs)
 
     @cached_property
     def configuration_id(self) -> int:
@@ -3,11 +3,16 @@
 import inspect
 import os
 import pickle
+import sqlite3
+import stat
 import sys
+import tempfile
+import threading
 import time
 from shutil import which
 from enum import Enum
 from functools import cached_property
+from hashlib import sha256
 from getpass import getuser
 from importlib.metadata import version
 from pathlib import Path
@@ -23,11 +28,13 @@ from typing import (
     ClassVar,
     Dict,
     List,
+    NamedTuple,
     Optional,
     Type,
     TypeVar,
     get_args,
     get_origin,
+    overload,
 )
 
 
@@ -38,6 +45,8 @@ import pydantic.v1.types
 from pydantic.v1.env_settings import SettingsSourceCallable
 
 from . import logging
+from . import secrets_agent
+from .profiling import span, start_profiling, ProfileMode
 from .types import StrEnum, SecretStr
 from . import toml
 from ._vendor.decorator import decorate
@@ -57,35 +66,209 @@ assert isinstance(logger, logging.UofTCoreLogger)
 F = TypeVar("F", bound=Callable)
 
 
-def memoize(f: F) -> F:
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: Optional[int]
+    ttl: Optional[float]
+    currsize: int
+
+
+@overload
+def memoize(f: F, *, maxsize: Optional[int] = None, ttl: Optional[float] = None) -> F: ...
+@overload
+def memoize(f: None = None, *, maxsize: Optional[int] = None, ttl: Optional[float] = None) -> Callable[[F], F]: ...
+def memoize(f=None, *, maxsize=None, ttl=None):
     """
-    A simple memoize implementation. It works by adding a .cache dictionary
-    to the decorated function. The cache will grow indefinitely, so it is
-    your responsibility to clear it, if needed.
-    to clear: `memoized_function.cache = {}`
+    A thread-safe memoize implementation, keyed on the arguments of the decorated function.
+    Can be used bare (`@memoize`), in which case the cache grows indefinitely,
+    or with arguments (`@memoize(maxsize=1024, ttl=300)`) to bound it.
+
+    Args:
+        maxsize: maximum number of results to keep. When the cache is full, the least recently used result is evicted.
+        ttl: number of seconds a cached result stays valid. Expired results are recomputed on their next call.
+
+    The decorated function gains a `cache_info()` method, which returns a `CacheInfo` tuple of
+    hit / miss / eviction counters and the current cache size, and a `cache_clear()` method,
+    which empties the cache and resets the counters.
+    The cache itself is available as `memoized_function.cache`.
+    Concurrent calls which miss on the same arguments may each run the function; the last result is kept.
     """
+    if f is None:
+        return lambda f: memoize(f, maxsize=maxsize, ttl=ttl)
+
+    cache: dict = {}
+    # expiry times, in insertion order (and therefore in expiry order, since ttl is fixed)
+    expires: dict = {}
+    lock = threading.Lock()
+    hits = misses = evictions = 0
+
+    def _evict(key):
+        nonlocal evictions
+        del cache[key]
+        expires.pop(key, None)
+        evictions += 1
 
     def _memoize(func, *args, **kw):
+        nonlocal hits, misses
         key = (args, frozenset(kw.items())) if kw else args
-        cache = func.cache  # attribute added by memoize
-        if key not in cache:
-            logger.trace(
-                f"caching output of function `{func}` with arguments {args} and {kw}"
-            )
-            cache[key] = func(*args, **kw)
-        return cache[key]
+        with lock:
+            if key in cache:
+                if ttl is None or expires[key] > time.monotonic():
+                    hits += 1
+                    if maxsize is not None:
+                        # move to the end, so that the front of the dict is always the least recently used entry
+                        cache[key] = cache.pop(key)
+                    return cache[key]
+                _evict(key)
+            misses += 1
+        logger.trace(
+            f"caching output of function `{func}` with arguments {args} and {kw}"
+        )
+        result = func(*args, **kw)
+        with lock:
+            cache.pop(key, None)
+            cache[key] = result
+            if ttl is not None:
+                now = time.monotonic()
+                expires.pop(key, None)
+                expires[key] = now + ttl
+                # sweep expired entries, so that results for arguments which are never seen again don't pile up
+                for k in list(expires):
+                    if expires[k] > now:
+                        break
+                    _evict(k)
+            if maxsize is not None:
+                while len(cache) > maxsize:
+                    _evict(next(iter(cache)))
+        return result
+
+    def cache_info() -> CacheInfo:
+        with lock:
+            return CacheInfo(hits, misses, evictions, maxsize, ttl, len(cache))
+
+    def cache_clear():
+        nonlocal hits, misses, evictions
+        with lock:
+            cache.clear()
+            expires.clear()
+            hits = misses = evictions = 0
+
+    wrapped = decorate(f, _memoize)
+    wrapped.cache = cache  # pyright: ignore[reportFunctionMemberAccess]
+    wrapped.cache_info = cache_info  # pyright: ignore[reportFunctionMemberAccess]
+    wrapped.cache_clear = cache_clear  # pyright: ignore[reportFunctionMemberAccess]
+    return wrapped
+
+
+def _stable_key(args: tuple, kw: dict) -> str:
+    """
+    Hash function arguments into a key which is the same across processes.
+    (`hash()` is randomized per process, and the iteration order of sets depends on it,
+    so sets and dicts are sorted before being serialized.)
+    """
+
+    def canonical(obj):
+        if isinstance(obj, dict):
+            return ("__dict__", tuple(sorted(((canonical(k), canonical(v)) for k, v in obj.items()), key=repr)))
+        if isinstance(obj, (set, frozenset)):
+            return ("__set__", tuple(sorted((canonical(i) for i in obj), key=repr)))
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(canonical(i) for i in obj)
+        return obj
+
+    data = canonical((args, kw))
+    try:
+        serialized = pickle.dumps(data, protocol=4)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        serialized = repr(data).encode()
+    return sha256(serialized).hexdigest()
+
 
-    f.cache = {} # pyright: ignore[reportFunctionMemberAccess]
-    return decorate(f, _memoize) # pyright: ignore[reportReturnType]
+class _DebugCacheStore:
+    """
+    A SQLite-backed store for `debug_cache` results.
+    Each cached result is its own row, so a cache miss only writes one entry,
+    and the database runs in WAL mode so that concurrent processes can read and write it safely.
+    """
 
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # sqlite connections can't be shared between threads
+        self._local = threading.local()
 
-def debug_cache(func: F) -> F:
+    @property
+    def db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(func TEXT, key TEXT, created REAL, value BLOB, PRIMARY KEY (func, key))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, func: str, key: str, ttl: Optional[float] = None) -> tuple[bool, Any]:
+        "returns a (found, value) tuple"
+        row = self.db.execute("SELECT created, value FROM cache WHERE func = ? AND key = ?", (func, key)).fetchone()
+        if row is None:
+            return False, None
+        created, value = row
+        if ttl is not None and created + ttl < time.time():
+            return False, None
+        try:
+            return True, pickle.loads(value)
+        except Exception:  # pylint: disable=broad-except
+            # written by an incompatible version of the code being cached, treat it as a miss
+            return False, None
+
+    def put(self, func: str, key: str, value: Any, maxsize: Optional[int] = None):
+        blob = pickle.dumps(value)
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (func, key, time.time(), blob))
+            if maxsize is not None:
+                db.execute(
+                    "DELETE FROM cache WHERE func = ? AND key NOT IN "
+                    "(SELECT key FROM cache WHERE func = ? ORDER BY created DESC LIMIT ?)",
+                    (func, func, maxsize),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def clear(self, func: str):
+        self.db.execute("DELETE FROM cache WHERE func = ?", (func,))
+
+
+@overload
+def debug_cache(func: F, *, ttl: Optional[float] = None, maxsize: Optional[int] = None) -> F: ...
+@overload
+def debug_cache(
+    func: None = None, *, ttl: Optional[float] = None, maxsize: Optional[int] = None
+) -> Callable[[F], F]: ...
+def debug_cache(func=None, *, ttl=None, maxsize=None):
     """
     A function cache which persists to disk, but only when the `PYDEBUG` env var is set.
     All calls to functions decorated with this decorator will store the results of those functions in the cache,
-    and that cache will be written to a file in the current directory called `.uoft_core.debug_cache.{function module + name}`.
+    which is a SQLite database called `debug_cache.sqlite3` in the uoft_core private cache directory
+    (see `Util.private_cache_dir`, which can be overridden with the `UOFT_CORE_USER_CACHE` env var).
+    Results are pickled, so they're never kept in the site-wide cache directory, where other users could
+    read them or plant results which would run code when they're loaded.
+    Results are keyed on the function's module and name, and a stable hash of its arguments,
+    so cached results survive across runs and can be shared by multiple processes running at once.
     A utility function will be attached to the decorated function, and can be used to clear that function's cached results.
 
+    Args:
+        ttl: number of seconds a cached result stays valid. By default, results never expire.
+        maxsize: maximum number of results to keep for this function. When exceeded, the oldest results are dropped.
+
     Example:
         ```python
         # in a file called `my_script.py`
@@ -94,15 +277,19 @@ def debug_cache(func: F) -> F:
         def my_function():
             ...
 
+        @debug_cache(ttl=3600)
+        def my_other_function():
+            ...
+
         result = my_function() # my_function will run as normal and store its result in the cache
         result2 = my_function() # my_function will not run this time, instead, its cached result will be returned
-        # at this point, there will be a file in your current directory called `.uoft_core.debug_cache.my_script.my_function`
-        my_function.clear_cache() # the cache is now empty, and `.uoft_core.debug_cache.my_script.my_function` has been deleted
-        result3 = my_function() # my_function will once again run as normal and store its result in the cache,
-        # at this point, `.uoft_core.debug_cache.my_script.my_function` has been recreated
+        my_function.clear_cache() # all of my_function's cached results are now deleted
+        result3 = my_function() # my_function will once again run as normal and store its result in the cache
         ```
 
     """
+    if func is None:
+        return lambda func: debug_cache(func, ttl=ttl, maxsize=maxsize)
     if not os.getenv("PYDEBUG"):
         logger.debug("PYDEBUG env var not set, debug_cache is disabled")
         return func
@@ -110,31 +297,26 @@ def debug_cache(func: F) -> F:
     fmodule = func.__module__
     if fmodule == "__main__":
         fmodule = os.path.splitext(os.path.basename(sys.argv[0]))[0]
-    file_name = f".uoft_core.debug_cache.{fmodule}.{fname}"
+    name = f"{fmodule}.{fname}"
     try:
-        with open(file_name, "rb") as f:
-            cache: dict = pickle.load(f)
-    except (IOError, ValueError):
-        cache = {}
+        store = _DebugCacheStore(Util("uoft_core").private_cache_dir("debug_cache") / "debug_cache.sqlite3")
+    except UofTCoreError as e:
+        logger.warning(f"{e}, debug_cache is disabled")
+        return func
 
     def clear_cache():
-        nonlocal cache
-        cache = {}
-        try:
-            os.remove(file_name)
-        except FileNotFoundError:
-            pass
+        store.clear(name)
 
     def wrapped_func(*args, **kw):
-        key = (args, frozenset(kw.items())) if kw else args
-        if key not in cache:
+        key = _stable_key(args, kw)
+        found, result = store.get(name, key, ttl)
+        if not found:
             logger.trace(
                 f"caching output of function `{fname}` with arguments {args} and {kw}"
             )
-            cache[key] = func(*args, **kw)
-            with open(file_name, "wb") as f:
-                pickle.dump(cache, f)
-        return cache[key]
+            result = func(*args, **kw)
+            store.put(name, key, result, maxsize)
+        return result
 
     wrapped_func.clear_cache = clear_cache # pyright: ignore[reportFunctionMemberAccess]
     wrapped_func.__name__ = func.__name__
@@ -255,7 +437,13 @@ class DataFileFormats(str, Enum):
     yaml = "yaml"
 
 
-def parse_config_file(file: Path, parse_as: Optional[DataFileFormats] = None):
+def parse_config_file(file: Path, parse_as: Optional[DataFileFormats] = None, plain: bool = False):
+    """
+    Parse a config / data file into a dict, based on its file extension (or `parse_as`).
+
+    Pass `plain=True` if the data will only be read and never written back out.
+    YAML files will then be loaded as builtin types, without retaining comments and formatting.
+    """
     obj: Dict[str, Any]
     content = file.read_text()
     if parse_as:
@@ -282,7 +470,7 @@ def parse_config_file(file: Path, parse_as: Optional[DataFileFormats] = None):
     elif file_format == ".yaml":
         from . import yaml
 
-        obj = dict(yaml.loads(content))
+        obj = dict(yaml.loads(content, plain=plain))
     else:
         raise UofTCoreError(
             chomptxt(
@@ -313,7 +501,8 @@ def write_config_file(
     elif file_format == ".json":
         import json  # noqa
 
-        file.write_text(json.dumps(obj, indent=4))
+        with file.open("w") as f:
+            json.dump(obj, f, indent=4)
     elif file_format == ".toml":
         from . import toml
 
@@ -321,7 +510,7 @@ def write_config_file(
     elif file_format == ".yaml":
         from . import yaml
 
-        file.write_text(yaml.dumps(obj))
+        yaml.dump_iter([obj], file)
     else:
         raise UofTCoreError(
             chomptxt(
@@ -377,9 +566,13 @@ class PassPath(type(Path())):
             logger.debug(f"{_pass_cmd} is not installed, skipping {self}")
             return ""
         if self._contents is None:
+            if (cached := secrets_agent.get(f"pass:{self}")) is not None:
+                self._contents = cached
+                return cached
             try:
                 logger.debug(f"Running pass command: `{self.command_name}`")
                 self._contents = shell(self.command_name)
+                secrets_agent.put(f"pass:{self}", self._contents)
             except CalledProcessError as e:
                 if 'gpg: decryption failed:' in e.stderr:
                     logger.error(e.stderr)
@@ -410,6 +603,7 @@ class PassPath(type(Path())):
         if _is_pass_installed():
             shell(f"{_pass_cmd} insert -m {self}", input_=data)
             self._contents = data
+            secrets_agent.put(f"pass:{self}", data)
             return len(data)
         else:
             raise UofTCoreError(
@@ -449,13 +643,18 @@ def bitwarden_unlock(password_file: Path | None = None):
 def bitwarden_get(secret_name: str) -> str:
     # this function may get called once or many times, depending on how many secrets are referenced in other config files
     # when called, this function needs to unlock the bitwarden vault if it hasn't already been unlocked, and then fetch the secret
+    if (cached := secrets_agent.get(f"bw:{secret_name}")) is not None:
+        return cached
     bitwarden_unlock()
-    return shell(f"bw get item {secret_name} --raw")
+    secret = shell(f"bw get item {secret_name} --raw")
+    secrets_agent.put(f"bw:{secret_name}", secret)
+    return secret
 
 class Timeit:
     """
     Wall-clock timer for performance profiling. makes it really easy to see
     elapsed real time between two points of execution.
+    For nested, aggregated timings, see `uoft_core.profiling.span`.
 
     Example:
         ```python
@@ -768,8 +967,93 @@ class Util:
                     )
                 )
 
+        @property
+        def snapshot_file(self) -> Optional[Path]:
+            "Where the merged config data is cached between runs, or None if there is no usable cache directory"
+            try:
+                return self.parent.cache_dir / f"config-snapshot.{getuser()}.pickle"
+            except UofTCoreError:
+                return None
+
+        def _signature(self, files: List[Path]) -> list:
+            """
+            Stat every config directory and every loaded config file.
+            Adding, removing, or renaming a config file changes its directory's mtime,
+            and editing or chmod-ing a file changes its own mtime / ctime,
+            so if the signature hasn't changed, neither has the merged config data.
+            """
+            sig = []
+            for path in [*self.dirs_generator(), *files]:
+                try:
+                    st = path.stat()
+                    sig.append((str(path), st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size))
+                except OSError:
+                    sig.append((str(path), None))
+            return sig
+
+        def _load_snapshot(self) -> Optional[Dict[str, Any]]:
+            if not (snapshot_file := self.snapshot_file):
+                return None
+            try:
+                st = snapshot_file.stat()
+                # only trust a pickle file that nobody else could have written
+                if hasattr(os, "getuid") and (st.st_uid != os.getuid() or st.st_mode & 0o022):
+                    return None
+                with snapshot_file.open("rb") as f:
+                    snapshot = pickle.load(f)
+            except Exception:  # pylint: disable=broad-except
+                return None
+            if (snapshot["app_name"], snapshot["config_file"]) != (
+                self.parent.app_name,
+                self.parent.get_env_var("config_file"),
+            ):
+                return None
+            if snapshot["signature"] != self._signature(snapshot["files"]):
+                logger.trace(f"Config files have changed since {snapshot_file} was written")
+                return None
+            logger.debug(f"Loaded config data for files {snapshot['files']} from snapshot {snapshot_file}")
+            return snapshot["data"]
+
+        def _save_snapshot(self, files: List[Path], data: Dict[str, Any]):
+            if not (snapshot_file := self.snapshot_file):
+                return
+            snapshot = dict(
+                app_name=self.parent.app_name,
+                config_file=self.parent.get_env_var("config_file"),
+                files=files,
+                signature=self._signature(files),
+                data=data,
+            )
+            try:
+                # config data may contain secrets, so the snapshot is only readable by its owner.
+                # mkstemp creates a new file with an unpredictable name and mode 0600, so nobody else sharing the
+                # cache directory can plant a symlink or file in its place
+                fd, tmp = tempfile.mkstemp(dir=snapshot_file.parent, prefix=f".{snapshot_file.name}.", suffix=".tmp")
+            except OSError as e:
+                logger.debug(f"Unable to write config snapshot {snapshot_file}: {e}")
+                return
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(snapshot, f)
+                os.replace(tmp, snapshot_file)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.debug(f"Unable to write config snapshot {snapshot_file}: {e}")
+                Path(tmp).unlink(missing_ok=True)
+
         @cached_property
         def merged_data(self) -> Dict[str, Any]:
+            """
+            All config data from all readable config files, merged together in priority order.
+            The result is cached in `snapshot_file`, so that on subsequent runs, as long as no config file has been
+            added, removed or changed, the list of candidate config files doesn't need to be probed
+            and the config files don't need to be parsed again.
+            """
+            with span("Util.Config.merged_data", app_name=self.parent.app_name):
+                return self._merged_data()
+
+        def _merged_data(self) -> Dict[str, Any]:
+            if (snapshot := self._load_snapshot()) is not None:
+                return snapshot
             data = {}
             files = self.readable_files
             if custom_config_file := self.parent.get_env_var("config_file"):
@@ -788,7 +1072,8 @@ class Util:
                 )
             for file in files:
                 logger.debug(f"Loading config data from {file}")
-                data.update(parse_config_file(file))
+                data.update(parse_config_file(file, plain=True))
+            self._save_snapshot(files, data)
             return data
 
         def get_key_or_fail(self, key: str):
@@ -919,6 +1204,32 @@ class Util:
                 )
             )
 
+    def private_cache_dir(self, name: str) -> Path:
+        """
+        Fetches a directory called {name} in the user-local cache directory for {self.app_name},
+        which only the current user can access.
+        Anything which is specific to one user, or which gets unpickled or executed when it's read back,
+        belongs here rather than in `cache_dir`, which may be the site-wide cache directory shared by every user.
+        If an environment variable like {self.app_name}_USER_CACHE exists, the directory is created in there instead.
+
+        Raises:
+            UofTCoreError: if the directory can't be created, or if it's not a directory owned by the current user
+                which no other user can access
+        """
+        root = self.get_env_var("user_cache") or self.dirs.user_cache_path.joinpath(self.app_name)
+        directory = Path(root, name)
+        try:
+            # mkdir's mode only applies to a directory it creates, so an existing directory still needs to be checked
+            directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+            st = directory.lstat()
+        except OSError as e:
+            raise UofTCoreError(f"Unable to create private cache directory {directory}: {e}") from e
+        if not stat.S_ISDIR(st.st_mode) or stat.S_IMODE(st.st_mode) & 0o077:
+            raise UofTCoreError(f"Private cache directory {directory} is not a directory only its owner can access")
+        if hasattr(os, "getuid") and st.st_uid != os.getuid():
+            raise UofTCoreError(f"Private cache directory {directory} is not owned by the current user")
+        return directory
+
     @property
     def history_cache(self) -> Path:
         history = self.cache_dir.joinpath("history")
@@ -962,6 +1273,7 @@ class BaseSettings(PydanticBaseSettings, metaclass=BaseSettingsMeta):
         # For each subclass of BaseSettings, this method should return an instance of that subclass
         with logging.Context(f'Settings(app_name={cls.Config.app_name})'):
             if cls._instance is None:
+                with span("BaseSettings.from_cache", app_name=cls.Config.app_name):
                     logger.debug("Loading settings")
                     cls._instance = cls()
             else:
@@ -1060,7 +1372,26 @@ class BaseSettings(PydanticBaseSettings, metaclass=BaseSettingsMeta):
                 annotation=Optional[type_],
             )
             settings_parameters.append(param)
-        parameters = settings_parameters + list(sig.parameters.values())
+        profile_parameters = [
+            inspect.Parameter(
+                "profile",
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=typer.Option(
+                    None,
+                    help="Profile this invocation with cProfile or a sampling profiler. "
+                    "Results are written to this app's cache directory",
+                    show_default=False,
+                ),
+                annotation=Optional[ProfileMode],
+            ),
+            inspect.Parameter(
+                "profile_memory",
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                default=typer.Option(False, help="With --profile, also record peak memory use of each span"),
+                annotation=bool,
+            ),
+        ]
+        parameters = settings_parameters + profile_parameters + list(sig.parameters.values())
         new_sig = sig.replace(parameters=parameters)
         func.__signature__ = new_sig # pyright: ignore[reportFunctionMemberAccess]
         func.settings_parameters = settings_parameters # pyright: ignore[reportFunctionMemberAccess]
@@ -1091,7 +1422,12 @@ class BaseSettings(PydanticBaseSettings, metaclass=BaseSettingsMeta):
                     **settings_kwargs
                 )  # pylint: disable=protected-access
             number_of_settings_args = len(func.settings_parameters) # pyright: ignore[reportFunctionMemberAccess]
-            new_args = args[number_of_settings_args:]
+            profile, profile_memory = args[number_of_settings_args : number_of_settings_args + 2]
+            if profile is not None:
+                start_profiling(
+                    profile, cls._util().cache_dir / "profiles", name=cls.__config__.app_name, memory=profile_memory
+                )
+            new_args = args[number_of_settings_args + 2 :]
             return f(*new_args)
 
         return decorate(func, _wrapper)  # pyright: ignore[reportReturnType]
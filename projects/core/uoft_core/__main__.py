@@ -1,16 +1,60 @@
+import json
 import os
 import sys
-from typing import Optional
+import tempfile
+from typing import Any, Optional
 from sys import version_info, platform, executable
+from importlib import import_module
 from importlib.metadata import version
+from importlib.util import find_spec
+from pathlib import Path
 from shutil import which
 
-from . import Util
+from . import Util, UofTCoreError, logging
+from .profiling import ProfileMode, start_profiling
 
 import typer
+from typer.core import TyperCommand, TyperGroup
+from typer.models import DefaultPlaceholder
+
+logger = logging.getLogger(__name__)
+
+# subcommands from other uoft_* packages, which haven't been imported yet. see _add_subcommands
+_lazy_subcommands: dict[str, "LazyCommand"] = {}
+# (internal, external) subcommand project names, once _add_subcommands has run
+_subcommands: Optional[tuple[set[str], set[str]]] = None
+
+
+class LazyCommand(TyperCommand):
+    """
+    Stand-in for the subcommand of another uoft_* package. Its name and help text come from the subcommand manifest,
+    and the package's cli module is only imported when the subcommand is actually invoked or completed.
+    """
+
+    def __init__(self, name: str, module: str, help: Optional[str]) -> None:
+        super().__init__(name, help=help, add_help_option=False)
+        self.module = module
+
+    def load(self):
+        logger.debug(f"Loading subcommand {self.name} from {self.module}")
+        return typer.main.get_command(import_module(self.module).app)
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        # the context (and therefore everything that runs in it) belongs to the real command
+        return self.load().make_context(info_name, args, parent=parent, **extra)
+
+
+class LazyGroup(TyperGroup):
+    "Top-level command group which includes the not-yet-imported subcommands in `_lazy_subcommands`"
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        for name, cmd in _lazy_subcommands.items():
+            self.commands.setdefault(name, cmd)
+
 
 assert __package__
-app = typer.Typer(name=__package__)
+app = typer.Typer(name=__package__, cls=LazyGroup)
 
 util = Util(__package__)
 
@@ -33,6 +77,12 @@ def callback(
         callback=version_callback,
         help="Show version information and exit",
     ),
+    profile: Optional[ProfileMode] = typer.Option(
+        None,
+        help="Profile this invocation with cProfile or a sampling profiler. Results are written to the cache directory",
+        show_default=False,
+    ),
+    profile_memory: bool = typer.Option(False, help="With --profile, also record peak memory use of each span"),
 ):
     """
     Command-line namespace for all uoft command-line utilities. makes each uoft_* command available as a subcommand.
@@ -46,6 +96,58 @@ def callback(
     import logging
 
     logging.basicConfig(level=log_level, format="%(levelname)s: %(message)s", stream=sys.stderr)
+    if profile is not None:
+        start_profiling(profile, util.cache_dir / "profiles", name="uoft", memory=profile_memory)
+
+
+agent_app = typer.Typer(name="agent", help="Manage the secrets agent, which caches decrypted settings in memory")
+app.add_typer(agent_app)
+
+
+@agent_app.command("start")
+def agent_start(
+    ttl: float = typer.Option(3600, help="Number of seconds to keep each decrypted secret for"),
+    foreground: bool = typer.Option(False, help="Run the agent in the foreground instead of detaching"),
+):
+    "Start the secrets agent, if it isn't already running"
+    from . import secrets_agent
+
+    if foreground:
+        secrets_agent.serve(ttl)
+        return
+    status = secrets_agent.start_background(ttl)
+    print(f"Secrets agent running (pid {status['pid']}) on {status['socket']}")
+
+
+@agent_app.command("stop")
+def agent_stop():
+    "Stop the secrets agent, discarding all cached secrets"
+    from . import secrets_agent
+
+    if not secrets_agent.stop():
+        print("Secrets agent is not running")
+
+
+@agent_app.command("clear")
+def agent_clear():
+    "Discard all cached secrets, without stopping the agent"
+    from . import secrets_agent
+
+    if not secrets_agent.clear():
+        print("Secrets agent is not running")
+
+
+@agent_app.command("status")
+def agent_status():
+    "Show whether the secrets agent is running, and how many secrets it holds"
+    from . import secrets_agent
+
+    status = secrets_agent.status()
+    if status is None:
+        print("Secrets agent is not running")
+        raise typer.Exit(1)
+    print(f"Secrets agent running (pid {status['pid']}) on {status['socket']}")
+    print(f"{status['entries']} secrets cached, ttl {status['ttl']}s")
 
 
 # [[[cog
@@ -68,37 +170,147 @@ ALL_PROJECTS = [
 # [[[end]]]
 
 
+def _manifest_signature() -> list[list]:
+    """
+    Find each project's cli module (or uoft-* executable) without importing anything.
+    If this hasn't changed since the subcommand manifest was built, neither have the subcommands.
+    """
+    sig = []
+    for p in ALL_PROJECTS:
+        # find_spec on a top-level package locates it without running its __init__.py
+        spec = find_spec(f"uoft_{p}")
+        locations = spec.submodule_search_locations if spec else None
+        cli_files = [f for loc in locations or [] if (f := Path(loc, "cli.py")).exists()]
+        if cli_files:
+            sig.append([p, str(cli_files[0]), cli_files[0].stat().st_mtime_ns])
+        else:
+            sig.append([p, None, which(f"uoft-{p}")])
+    return sig
+
+
+def _build_manifest(signature: list[list]) -> dict[str, dict[str, Any]]:
+    "Import every project's cli module to record its subcommand name and help text"
+
+    def value(v):
+        return v.value if isinstance(v, DefaultPlaceholder) else v
+
+    manifest = {}
+    for p, cli_file, ext in signature:
+        if cli_file:
+            try:
+                subapp = import_module(f"uoft_{p}.cli").app
+                name = value(subapp.info.name) or p
+                manifest[name] = dict(project=p, module=f"uoft_{p}.cli", help=value(subapp.info.help))
+                continue
+            except (ImportError, AttributeError):
+                # if the module isn't fully installed, or doesn't have an app object,
+                # fall back to looking for an executable on PATH
+                ext = which(f"uoft-{p}")
+        if ext:
+            manifest[p] = dict(project=p, executable=ext)
+    return manifest
+
+
+def _subcommand_manifest() -> dict[str, dict[str, Any]]:
+    """
+    Fetch the name, help text and entrypoint of every available subcommand,
+    from a manifest file in the cache directory if it's still valid, or by importing every subcommand if it isn't.
+    The manifest decides which modules get imported, so it's kept in the private per-user cache directory,
+    where no other user can rewrite it.
+    """
+    signature = _manifest_signature()
+    try:
+        manifest_file = util.private_cache_dir("cli") / "subcommands.json"
+    except UofTCoreError:
+        return _build_manifest(signature)
+    try:
+        cached = json.loads(manifest_file.read_text())
+        if cached["signature"] == signature:
+            return cached["subcommands"]
+    except (OSError, ValueError, KeyError):
+        pass
+    logger.debug("Subcommand manifest is missing or out of date, rebuilding it")
+    manifest = _build_manifest(signature)
+    try:
+        fd, tmp = tempfile.mkstemp(dir=manifest_file.parent, prefix=f".{manifest_file.name}.", suffix=".tmp")
+    except OSError as e:
+        logger.debug(f"Unable to write subcommand manifest {manifest_file}: {e}")
+        return manifest
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(dict(signature=signature, subcommands=manifest), f)
+        os.replace(tmp, manifest_file)
+    except OSError as e:
+        logger.debug(f"Unable to write subcommand manifest {manifest_file}: {e}")
+        Path(tmp).unlink(missing_ok=True)
+    return manifest
+
+
 def _add_subcommands() -> tuple[set[str], set[str]]:
     """
-    Dynamically add subcommands from uoft_* packages, and add virtual subcommands for any uoft-* executables
+    Add subcommands from uoft_* packages, and add virtual subcommands for any uoft-* executables
     not already added as a subcommand.
+    Subcommands from uoft_* packages are registered lazily (see `LazyCommand`),
+    so their packages are only imported when they're invoked.
     """
+    global _subcommands
+    if _subcommands is not None:
+        return _subcommands
     internal_subcommands = set()
     external_subcommands = set()
 
-    for p in ALL_PROJECTS:
-        try:
-            # look for a python package named uoft_<p> in the local virtualenv and a cli module in it
-            # try to add a subcommand for it
-            subapp = __import__(f"uoft_{p}.cli").cli.app
+    for name, entry in _subcommand_manifest().items():
+        # only names and help text are taken from the manifest as-is.
+        # modules and executables are always derived from one of our own project names
+        if (p := entry.get("project")) not in ALL_PROJECTS:
+            continue
+        if entry.get("module"):
             internal_subcommands.add(p)
-            app.add_typer(subapp)
-        except (ImportError, AttributeError):
-            # if the module isn't installed locally, doesn't have a cli.py,
-            # or if it doesn't have an app object,
-            # look for it on PATH and add a virtual subcommand for it
-            ext = which(f"uoft-{p}")
-            if ext:
-                name = ext
-                external_subcommands.add(p)
+            _lazy_subcommands[name] = LazyCommand(name, f"uoft_{p}.cli", entry.get("help"))
+        else:
+            external_subcommands.add(p)
+
+            # I think a typer update broke my lambda...
+            # seems to require an actual function now
+            def _(p=p):
+                # look the executable up again, rather than running whatever path was recorded in the manifest
+                if not (ext := which(f"uoft-{p}")):
+                    logger.error(f"uoft-{p} is no longer installed")
+                    raise typer.Exit(1)
+                os.execv(ext, [f"uoft-{p}"] + sys.argv[2:])
 
-                # I think a typer update broke my lambda...
-                # seems to require an actual function now
-                @app.command(p)
-                def _():
-                    os.execv(name, [f"uoft-{p}"] + sys.argv[2:])
+            app.command(name)(_)
 
-    return internal_subcommands, external_subcommands
+    _subcommands = internal_subcommands, external_subcommands
+    return _subcommands
+
+
+def _fast_complete() -> bool:
+    """
+    Answer shell completion requests from a cached completion tree (see `uoft_core.completion`),
+    so that pressing tab doesn't import every subcommand.
+    The tree is rebuilt whenever the subcommand manifest signature or this module changes.
+    Returns False if the request needs to be handled by the full app.
+    """
+    if not os.environ.get("_UOFT_COMPLETE", "").startswith("complete_"):
+        return False
+    from . import completion
+
+    signature = [_manifest_signature(), Path(__file__).stat().st_mtime_ns]
+    try:
+        # the tree is built from the same subcommands as the manifest, so it's kept next to it
+        tree_file = util.private_cache_dir("cli") / "completion-tree.json"
+    except UofTCoreError:
+        return False
+    if (tree := completion.load_tree(tree_file, signature)) is None:
+        logger.debug("Completion tree is missing or out of date, rebuilding it")
+        _, external = _add_subcommands()
+        tree = completion.build_tree(typer.main.get_command(app))
+        for name in external:
+            # external subcommands are completed by their own executables
+            tree["commands"][name] = dict(unknown=True, help=tree["commands"][name].get("help"))
+        completion.save_tree(tree_file, signature, tree)
+    return completion.fast_complete(tree, "uoft", "_UOFT_COMPLETE")
 
 
 def _get_subcommand_name():
@@ -146,6 +358,8 @@ def handle_external_subcommand_completion(external: set[str]):
 
 def cli():
     try:
+        if _fast_complete():
+            return
         internal, external = _add_subcommands()
         handle_external_subcommand_completion(external)
         app()
@@ -2,14 +2,33 @@
 General abstractions for working with REST APIs
 """
 
-from typing import Any, TYPE_CHECKING, cast
+from typing import Any, ClassVar, Iterator, Literal, TYPE_CHECKING, cast
 from concurrent.futures import ThreadPoolExecutor, Future, as_completed, wait
-
-from requests import Session, Response, HTTPError
+from dataclasses import asdict, dataclass, field
+from fnmatch import fnmatchcase
+from hashlib import sha256
+from pathlib import Path
+from urllib.parse import urlsplit
+import asyncio
+import base64
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from requests import Session, Request, Response, HTTPError
+from requests.adapters import HTTPAdapter
+from requests.models import PreparedRequest
+from requests.structures import CaseInsensitiveDict
 import urllib3
+from urllib3.util.retry import Retry
 from typing_extensions import Self
 from yarl import URL
 
+from .metrics import api_metrics
+
 
 class RESTAPIError(HTTPError):
     """An error raised when an API request fails.
@@ -42,6 +61,382 @@ class RESTAPIError(HTTPError):
         return e
 
 
+class JitteredRetry(Retry):
+    """A urllib3 Retry policy with "full jitter" exponential backoff.
+
+    Plain exponential backoff causes every thread which got throttled at the same time to retry at the same time,
+    which just gets them all throttled again. Picking a random sleep between 0 and the computed backoff time
+    spreads the retries out.
+    """
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return backoff
+        return random.uniform(0, backoff)
+
+
+class RateLimiter:
+    """A thread-safe token-bucket rate limiter.
+
+    Tokens are added to the bucket at a rate of `rate` tokens per second, up to a maximum of `burst` tokens.
+    Each call to `acquire` takes a token from the bucket, blocking until one is available.
+
+    Args:
+        rate (float): The sustained number of requests per second to allow.
+        burst (int, optional): The maximum number of requests which can be made back-to-back
+            before throttling kicks in. Defaults to `rate`, rounded up to the nearest whole number.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number")
+        self.rate = rate
+        self.burst = burst or max(1, int(rate + 0.999))
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens: int) -> float:
+        # try to take `tokens` from the bucket. returns 0 on success, or the number of seconds to wait before retrying
+        if tokens > self.burst:
+            # the bucket never holds more than `burst` tokens, so this would wait forever
+            raise ValueError(f"Cannot acquire {tokens} tokens at once from a rate limiter with a burst of {self.burst}")
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Take `tokens` from the bucket, blocking until they are available.
+
+        Returns:
+            float: the number of seconds spent waiting
+        """
+        waited = 0.0
+        while delay := self._take(tokens):
+            # sleep outside the lock so other threads can refill / check the bucket in the meantime
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        "Same as `acquire`, but yields to the event loop instead of blocking the thread while waiting"
+        waited = 0.0
+        while delay := self._take(tokens):
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+
+@dataclass
+class CachedResponse:
+    "A GET response as stored on disk by `ResponseCache`"
+
+    url: str
+    status_code: int
+    reason: str
+    headers: dict[str, str]
+    content: bytes
+    encoding: str | None
+    expires: float
+    etag: str | None = None
+    last_modified: str | None = None
+    stored: float = field(default_factory=time.time)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def validators(self) -> dict[str, str]:
+        "Headers to send with a conditional request to revalidate this entry"
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data["content"] = base64.b64encode(self.content).decode()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, text: str) -> "CachedResponse":
+        data = json.loads(text)
+        data["content"] = base64.b64decode(data["content"])
+        return cls(**data)
+
+    def to_response(self) -> Response:
+        res = Response()
+        res.status_code = self.status_code
+        res.reason = self.reason
+        res.headers = CaseInsensitiveDict(self.headers)
+        res._content = self.content
+        res.encoding = self.encoding
+        res.url = self.url
+        res.from_cache = True  # pyright: ignore[reportAttributeAccessIssue]
+        return res
+
+
+class ResponseCache:
+    """An on-disk cache of successful GET responses, one file per request.
+
+    Entries are served straight from disk until their TTL expires. After that, if the server provided an `ETag`
+    or `Last-Modified` header, the entry is revalidated with a conditional request (`If-None-Match` /
+    `If-Modified-Since`), and a `304 Not Modified` reply refreshes the entry without re-downloading it.
+
+    Args:
+        directory (Path): Where to store cached responses, ex. `Util("bluecat").cache_dir / "http"`
+        default_ttl (float, optional): Seconds a response stays fresh. Defaults to 300.
+        ttls (dict[str, float], optional): Per-endpoint TTL overrides, keyed by shell-style glob patterns
+            matched against the full request URL (ex. `{"*/api/extras/statuses/*": 86400}`).
+            First match wins. A TTL of 0 means "always revalidate".
+
+    Entries are keyed on the full URL (including query parameters) and the credentials used to make the request,
+    so that different users sharing a cache directory never see each other's responses. They are stored as JSON in a
+    directory tree which mirrors the URL's path, so that `invalidate_url` can drop everything under a given path
+    without reading any entries.
+    """
+
+    def __init__(self, directory: Path, default_ttl: float = 300, ttls: dict[str, float] | None = None):
+        self.directory = Path(directory)
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def ttl_for(self, url: str) -> float:
+        for pattern, ttl in self.ttls.items():
+            if fnmatchcase(url, pattern):
+                return ttl
+        return self.default_ttl
+
+    @staticmethod
+    def _segments(url: str) -> list[str]:
+        # one directory per URL path segment, below one for the scheme and host.
+        # segments are hashed so that any character in a URL is safe to use in a file name
+        parts = urlsplit(url)
+        segments = [f"{parts.scheme}://{parts.netloc}", *(s for s in parts.path.split("/") if s)]
+        return [sha256(s.encode()).hexdigest()[:16] for s in segments]
+
+    def key(self, url: str, credentials: str = "") -> str:
+        return "/".join([*self._segments(url), sha256(f"{credentials}\0{url}".encode()).hexdigest()])
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.response"
+
+    def get(self, key: str) -> CachedResponse | None:
+        try:
+            return CachedResponse.from_json(self._path(key).read_text())
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _write(self, key: str, entry: CachedResponse):
+        # write to a temp file and atomically move it into place,
+        # so that concurrent readers never see a partially-written entry
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(entry.to_json())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def put(self, key: str, res: Response) -> CachedResponse | None:
+        "Store a response. Returns the new entry, or None if the response is not cacheable"
+        if res.status_code != 200 or "no-store" in res.headers.get("Cache-Control", ""):
+            return None
+        entry = CachedResponse(
+            url=res.url,
+            status_code=res.status_code,
+            reason=res.reason,
+            headers=dict(res.headers),
+            content=res.content,
+            encoding=res.encoding,
+            expires=time.time() + self.ttl_for(res.url),
+            etag=res.headers.get("ETag"),
+            last_modified=res.headers.get("Last-Modified"),
+        )
+        self._write(key, entry)
+        return entry
+
+    def refresh(self, key: str, entry: CachedResponse) -> CachedResponse:
+        "Mark an entry as fresh again, after the server confirmed it hasn't changed"
+        entry.expires = time.time() + self.ttl_for(entry.url)
+        self._write(key, entry)
+        return entry
+
+    def invalidate(self, pattern: str | None = None) -> int:
+        """Remove cached entries.
+
+        Args:
+            pattern (str, optional): A shell-style glob pattern matched against each entry's URL.
+                If not provided, the whole cache is cleared.
+
+        Returns:
+            int: the number of entries removed
+        """
+        removed = 0
+        for file in self.directory.rglob("*.response"):
+            if pattern is not None:
+                entry = self.get(file.relative_to(self.directory).with_suffix("").as_posix())
+                if entry is not None and not fnmatchcase(entry.url, pattern):
+                    continue
+            file.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def invalidate_url(self, url: str) -> int:
+        """Remove the cached entries a write to `url` may have made stale: `url` itself (with any query parameters),
+        everything below it, and the collection it belongs to (ie `/api/things/` after a write to `/api/things/1/`).
+
+        Returns:
+            int: the number of entries removed
+        """
+        segments = self._segments(url)
+        files = list(self.directory.joinpath(*segments).rglob("*.response"))
+        if len(segments) > 1:
+            # only the collection's own entries, not its other members
+            files.extend(self.directory.joinpath(*segments[:-1]).glob("*.response"))
+        for file in files:
+            file.unlink(missing_ok=True)
+        return len(files)
+
+    def clear(self) -> int:
+        return self.invalidate()
+
+
+class CassetteMissError(KeyError):
+    "Raised in replay mode when a request has no recorded response in the cassette"
+
+
+class Cassette:
+    """Records request / response pairs to a file, and plays them back later without touching the network.
+
+    Used to benchmark and profile code which talks to REST APIs (ie the sync engine) reproducibly and offline.
+    Record a real run once, then replay it as many times as needed, with the latency of each request either
+    simulated from the recorded timings, fixed, or removed entirely.
+
+    Recordings are stored as JSON lines, one request / response pair per line. Requests are matched on method, URL
+    (including query parameters) and a hash of the request body. When the same request was recorded more than once
+    (ie polling a status endpoint), recorded responses are replayed in order, and the last one is repeated once
+    the recording runs out.
+
+    Args:
+        path (Path): the cassette file.
+        mode ("record" | "replay"): "record" truncates the file and records all requests to it,
+            "replay" serves all requests from it.
+        latency (float | "recorded"): simulated latency in replay mode. "recorded" sleeps for as long as the
+            original request took, a number sleeps for that many seconds on every request. Defaults to "recorded".
+        latency_scale (float): multiplier applied to the simulated latency. Defaults to 1.0
+    """
+
+    _instances: ClassVar[dict[Path, "Cassette"]] = {}
+    _instances_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(
+        self,
+        path: Path,
+        mode: Literal["record", "replay"] = "replay",
+        latency: "float | Literal['recorded']" = "recorded",
+        latency_scale: float = 1.0,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid cassette mode {mode!r}, must be 'record' or 'replay'")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._recordings: dict[tuple[str, str, str], list[dict[str, Any]]] = {}
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("")
+        else:
+            with self.path.open() as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        key = (entry["method"], entry["url"], entry["body_hash"])
+                        self._recordings.setdefault(key, []).append(entry)
+
+    @classmethod
+    def open(cls, path: Path, mode: Literal["record", "replay"] = "replay", **kwargs) -> "Cassette":
+        "Get a shared Cassette instance for `path`, so that every API session in a process records to the same file"
+        path = Path(path).resolve()
+        with cls._instances_lock:
+            if path not in cls._instances or cls._instances[path].mode != mode:
+                cls._instances[path] = cls(path, mode, **kwargs)
+            return cls._instances[path]
+
+    @staticmethod
+    def prepare(method: str, url: str, kwargs: dict[str, Any]) -> PreparedRequest:
+        return Request(
+            method, url, params=kwargs.get("params"), data=kwargs.get("data"), json=kwargs.get("json")
+        ).prepare()
+
+    @staticmethod
+    def _key(req: PreparedRequest) -> tuple[str, str, str]:
+        body = req.body or b""
+        if isinstance(body, str):
+            body = body.encode()
+        return (req.method or "GET", req.url or "", sha256(body).hexdigest())
+
+    def record(self, req: PreparedRequest, res: Response, elapsed: float):
+        method, url, body_hash = self._key(req)
+        content = res.content or b""
+        try:
+            body, encoding = content.decode("utf-8"), "text"
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode(), "base64"
+        entry = dict(
+            method=method,
+            url=url,
+            body_hash=body_hash,
+            status_code=res.status_code,
+            reason=res.reason,
+            headers=dict(res.headers),
+            body=body,
+            body_encoding=encoding,
+            elapsed=elapsed,
+        )
+        line = json.dumps(entry) + "\n"
+        with self._lock, self.path.open("a") as f:
+            f.write(line)
+
+    def replay(self, req: PreparedRequest) -> Response:
+        key = self._key(req)
+        with self._lock:
+            entries = self._recordings.get(key)
+            if not entries:
+                raise CassetteMissError(f"No recorded response for {key[0]} {key[1]} in cassette {self.path}")
+            entry = entries.pop(0) if len(entries) > 1 else entries[0]
+        delay = entry["elapsed"] if self.latency == "recorded" else self.latency
+        if delay := delay * self.latency_scale:
+            time.sleep(delay)
+        res = Response()
+        res.status_code = entry["status_code"]
+        res.reason = entry["reason"]
+        res.headers = CaseInsensitiveDict(entry["headers"])
+        body = entry["body"]
+        res._content = base64.b64decode(body) if entry["body_encoding"] == "base64" else body.encode("utf-8")
+        # the recorded headers describe the original (possibly compressed) transfer, not our decoded body
+        res.headers.pop("Content-Encoding", None)
+        res.headers["Content-Length"] = str(len(res._content))
+        res.url = entry["url"]
+        res.request = req
+        res.encoding = "utf-8"
+        return res
+
+
 class APIBase(Session):  # pyright: ignore[reportRedeclaration] # APIBase will be redeclared in a TYPE_CHECKING block below
     """A Requests session with a base URL.
 
@@ -50,6 +445,10 @@ class APIBase(Session):  # pyright: ignore[reportRedeclaration] # APIBase will b
     Args:
         base_url (str): The base URL of the REST API server.
         api_root (str, optional): The root path of the REST API, relative to the base URL. Defaults to '/'.
+        verify (bool | str, optional): Whether to verify TLS certificates, or a path to a CA bundle. Defaults to True.
+
+    Transport settings (connection pool sizes, retries, rate limiting) can be tuned after construction
+    with `configure_transport`, so that they can be adjusted on any subclass without changes to its __init__.
 
     Example:
 
@@ -72,6 +471,20 @@ class APIBase(Session):  # pyright: ignore[reportRedeclaration] # APIBase will b
     RESTAPIError = RESTAPIError
     HTTPError = HTTPError
 
+    # Default transport settings. Subclasses can override these as class attributes
+    pool_connections: int = 10
+    pool_maxsize: int = 32
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+    retry_statuses: frozenset[int] = frozenset({429, 502, 503, 504})
+    rate_limiter: RateLimiter | None = None
+    response_cache: ResponseCache | None = None
+    cassette: Cassette | None = None
+
+    # Name of the query parameter which controls page size on paginated endpoints.
+    # Subclasses should override this if their API uses something else (ie "page_size", "per_page")
+    page_size_param: str = "limit"
+
     # At its core, an API wrapper is just a requests Session where all requests operate relative to a base URL,
     # and where some form of authentication needs to happen before requests can be made.
     def __init__(self, base_url: str, api_root: str = "", verify: bool | str = True):
@@ -85,6 +498,133 @@ class APIBase(Session):  # pyright: ignore[reportRedeclaration] # APIBase will b
         self.verify = verify
         if not self.verify:
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        self.configure_transport()
+        if cassette := os.environ.get("UOFT_API_CASSETTE"):
+            # record / replay every API session in the process without any code changes
+            mode = os.environ.get("UOFT_API_CASSETTE_MODE", "replay")
+            latency_scale = float(os.environ.get("UOFT_API_CASSETTE_LATENCY_SCALE", "1.0"))
+            self.cassette = Cassette.open(Path(cassette), mode, latency_scale=latency_scale)  # pyright: ignore[reportArgumentType]
+
+    def configure_transport(
+        self,
+        *,
+        pool_connections: int | None = None,
+        pool_maxsize: int | None = None,
+        max_retries: int | None = None,
+        backoff_factor: float | None = None,
+        retry_statuses: set[int] | frozenset[int] | None = None,
+        rate_limit: "float | RateLimiter | None" = None,
+    ) -> None:
+        """(Re)configure connection pooling, retries, and rate limiting for this session.
+
+        Any argument left as None keeps its current value.
+
+        Args:
+            pool_connections (int, optional): Number of per-host connection pools to cache.
+            pool_maxsize (int, optional): Maximum number of connections to keep open per host.
+                Should be at least as large as the number of threads making requests concurrently.
+            max_retries (int, optional): Number of times to retry a failed request. Connection errors are retried
+                for all HTTP methods, while read errors and `retry_statuses` responses are only retried for
+                idempotent methods (GET, HEAD, PUT, DELETE, OPTIONS, TRACE). Set to 0 to disable retries.
+            backoff_factor (float, optional): Base for the jittered exponential backoff between retries.
+            retry_statuses (set[int], optional): HTTP status codes which should trigger a retry.
+                A `Retry-After` header on 429 / 503 responses is honoured.
+            rate_limit (float | RateLimiter, optional): Maximum number of requests per second.
+                Pass an existing `RateLimiter` to share a single limit across several sessions.
+                The limiter is shared by every thread using this session (ie a `ThreadedAPIPool`).
+                Set to 0 to disable rate limiting.
+        """
+        if pool_connections is not None:
+            self.pool_connections = pool_connections
+        if pool_maxsize is not None:
+            self.pool_maxsize = pool_maxsize
+        if max_retries is not None:
+            self.max_retries = max_retries
+        if backoff_factor is not None:
+            self.backoff_factor = backoff_factor
+        if retry_statuses is not None:
+            self.retry_statuses = frozenset(retry_statuses)
+        if isinstance(rate_limit, RateLimiter):
+            self.rate_limiter = rate_limit
+        elif rate_limit is not None:
+            self.rate_limiter = RateLimiter(rate_limit) if rate_limit > 0 else None
+
+        retry = JitteredRetry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses,
+            # let the response through once retries are exhausted, so that `request` can turn it into a RESTAPIError
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        for prefix in ("https://", "http://"):
+            # mounting a new adapter doesn't close the one it replaces, which would leak its pooled connections
+            if (old := self.adapters.get(prefix)) is not None:
+                old.close()
+            self.mount(
+                prefix,
+                HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=retry),
+            )
+
+    def enable_response_cache(
+        self, directory: Path, default_ttl: float = 300, ttls: dict[str, float] | None = None
+    ) -> ResponseCache:
+        """Opt in to caching GET responses on disk. See `ResponseCache` for details.
+
+        Successful POST / PUT / PATCH / DELETE requests made through this session automatically invalidate any
+        cached entries at or below the URL they were made to, as well as the collection that URL belongs to.
+
+        Example:
+            >>> api.enable_response_cache(settings.util.cache_dir / "http", ttls={"*/configurations*": 86400})
+            >>> api.response_cache.invalidate("*/tags*")
+        """
+        self.response_cache = ResponseCache(directory, default_ttl=default_ttl, ttls=ttls)
+        return self.response_cache
+
+    def use_cassette(
+        self,
+        path: Path,
+        mode: Literal["record", "replay"] = "replay",
+        latency: "float | Literal['recorded']" = "recorded",
+        latency_scale: float = 1.0,
+    ) -> Cassette:
+        """Record all requests made through this session to `path`, or replay them from it. See `Cassette` for details.
+
+        Cassettes can also be enabled for every API session in a process with environment variables:
+        `UOFT_API_CASSETTE=<path>`, `UOFT_API_CASSETTE_MODE=record|replay` (default replay), and
+        `UOFT_API_CASSETTE_LATENCY_SCALE=<float>` (default 1.0)
+
+        Example:
+            >>> api.use_cassette(Path("sync-run.jsonl"), mode="record")
+            >>> # later, offline:
+            >>> api.use_cassette(Path("sync-run.jsonl"), latency=0)
+        """
+        self.cassette = Cassette.open(path, mode, latency=latency, latency_scale=latency_scale)
+        return self.cassette
+
+    def _send(self, method: str, url: str, *args, **kwargs) -> Response:
+        # send a request over the network, or to / from a cassette
+        cassette = self.cassette
+        if cassette is not None and cassette.mode == "replay":
+            return cassette.replay(cassette.prepare(method, url, kwargs))
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        start = time.perf_counter()
+        res = super().request(method, url, *args, **kwargs)
+        if cassette is not None:
+            cassette.record(cassette.prepare(method, url, kwargs), res, time.perf_counter() - start)
+        return res
+
+    def _credentials_fingerprint(self, kwargs: dict[str, Any]) -> str:
+        # anything that identifies *who* is making the request, so cached responses are never shared between users
+        headers = CaseInsensitiveDict({**self.headers, **(kwargs.get("headers") or {})})
+        credentials = sorted(
+            (k.lower(), str(v))
+            for k, v in headers.items()
+            if k.lower() in ("authorization", "cookie") or "token" in k.lower() or "key" in k.lower()
+        )
+        auth = kwargs.get("auth") or self.auth
+        return sha256(repr((credentials, auth)).encode()).hexdigest()
 
     def safe_append_path(self, url: URL, path: str) -> URL:
         # paths with leading slashes are treated by most of the computing world as absolute paths
@@ -123,7 +663,39 @@ class APIBase(Session):  # pyright: ignore[reportRedeclaration] # APIBase will b
 
         # convert URL to string before passing it on to the super class
         url = str(url)
-        res = super().request(method, url, *args, **kwargs)
+        if isinstance(method, bytes):
+            method = method.decode()
+        method = method.upper()
+
+        cache, cache_key, cached = self.response_cache, None, None
+        if cache is not None and method == "GET" and not args and not kwargs.get("stream"):
+            req = PreparedRequest()
+            req.prepare_url(url, kwargs.get("params"))
+            cache_key = cache.key(req.url, self._credentials_fingerprint(kwargs))  # pyright: ignore[reportArgumentType]
+            cached = cache.get(cache_key)
+            if cached is not None:
+                if cached.fresh:
+                    return cached.to_response()
+                # stale entry, ask the server if it has changed
+                kwargs["headers"] = {**cached.validators(), **(kwargs.get("headers") or {})}
+
+        start = time.perf_counter()
+        try:
+            res = self._send(method, url, *args, **kwargs)
+        except Exception:
+            api_metrics.record(method, url, time.perf_counter() - start, error=True)
+            raise
+        # elapsed time here includes any retries, which is what we want: it's the time the caller actually waited
+        api_metrics.record_response(res, time.perf_counter() - start)
+
+        if cache is not None:
+            if cached is not None and res.status_code == 304:
+                assert cache_key
+                return cache.refresh(cache_key, cached).to_response()
+            if cache_key and res.ok:
+                cache.put(cache_key, res)
+            elif method in ("POST", "PUT", "PATCH", "DELETE") and res.ok:
+                cache.invalidate_url(url)
         try:
             res.raise_for_status()
         except HTTPError as e:
@@ -139,6 +711,99 @@ class APIBase(Session):  # pyright: ignore[reportRedeclaration] # APIBase will b
     def threadpool(self, *args, **kwargs):
         return ThreadedAPIPool(self, *args, **kwargs)
 
+    def next_page_url(self, page: Any) -> URL | None:
+        """Extract the URL of the next page from a decoded page of results, or None if this is the last page.
+
+        Understands DRF / Nautobot style (`{"next": "<url>"}`) and HAL style (`{"_links": {"next": {"href": "<url>"}}}`)
+        pagination out of the box. Subclasses can override this to support other pagination schemes.
+        """
+        if not isinstance(page, dict):
+            return None
+        next_ = page.get("next")
+        if next_ is None:
+            next_ = page.get("_links", {}).get("next", {}).get("href")
+        if not next_ or not isinstance(next_, str):
+            return None
+        # next links may be absolute URLs, or paths relative to the server root. Either way, they are *not*
+        # relative to the api root, so they must be resolved against the base URL rather than passed to `request`
+        # as a string
+        return self.url.join(URL(next_))
+
+    def page_records(self, page: Any) -> list[Any]:
+        """Extract the list of records from a decoded page of results.
+
+        Understands pages which are bare lists, or dicts with a `results`, `data` or `items` key.
+        Subclasses can override this to support other pagination schemes.
+        """
+        if isinstance(page, list):
+            return page
+        for key in ("results", "data", "items"):
+            if key in page:
+                return page[key]
+        raise ValueError(f"Could not find a list of records in page with keys {list(page)}")
+
+    def iter_pages(
+        self,
+        url: URL | str,
+        params: dict[str, Any] | None = None,
+        page_size: int | None = None,
+        prefetch: bool = True,
+        **kwargs,
+    ) -> Iterator[Any]:
+        """Iterate over the decoded JSON pages of a paginated endpoint.
+
+        While the caller is busy processing one page, the next page is fetched in a background thread,
+        so that network time overlaps with processing time. Only one page is ever fetched ahead,
+        so memory use stays bounded to roughly two pages regardless of the size of the full result set.
+
+        Args:
+            url (URL | str): The endpoint to fetch, same as for `get`.
+            params (dict, optional): Query parameters for the first request.
+                Subsequent requests use the parameters embedded in the server's next-page links.
+            page_size (int, optional): Number of records per page, sent as the `page_size_param` query parameter.
+            prefetch (bool, optional): Fetch the next page in the background. Defaults to True.
+            **kwargs: passed on to `get`
+        """
+        params = dict(params or {})
+        if page_size is not None:
+            params[self.page_size_param] = page_size
+
+        def fetch(u: URL | str, p: dict[str, Any] | None):
+            return self.get(u, params=p, **kwargs).json()
+
+        if not prefetch:
+            next_url: URL | str | None = url
+            next_params: dict[str, Any] | None = params
+            while next_url is not None:
+                page = fetch(next_url, next_params)
+                next_url, next_params = self.next_page_url(page), None
+                yield page
+            return
+
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.__class__.__name__}-prefetch")
+        try:
+            future: Future | None = pool.submit(fetch, url, params)
+            while future is not None:
+                page = future.result()
+                next_url = self.next_page_url(page)
+                future = pool.submit(fetch, next_url, None) if next_url is not None else None
+                yield page
+        finally:
+            # if the caller stops iterating early, don't wait around for a page nobody will read
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def iter_records(
+        self,
+        url: URL | str,
+        params: dict[str, Any] | None = None,
+        page_size: int | None = None,
+        prefetch: bool = True,
+        **kwargs,
+    ) -> Iterator[Any]:
+        "Iterate over every record of a paginated endpoint, one page at a time. See `iter_pages` for details."
+        for page in self.iter_pages(url, params=params, page_size=page_size, prefetch=prefetch, **kwargs):
+            yield from self.page_records(page)
+
 
 class ThreadedAPIPool(ThreadPoolExecutor):
     # Attach common threadpool primitives to the pool itself
@@ -156,6 +821,10 @@ class ThreadedAPIPool(ThreadPoolExecutor):
     def __init__(self, api: APIBase, *args, **kwargs):
         thread_name_prefix = kwargs.pop("thread_name_prefix", None) or f"{api.__class__.__name__}-thread"
         super().__init__(*args, thread_name_prefix=thread_name_prefix, **kwargs)
+        # make sure there's a pooled connection available for every worker thread,
+        # otherwise urllib3 will open and discard extra connections with a "Connection pool is full" warning
+        if self._max_workers > api.pool_maxsize:
+            api.configure_transport(pool_maxsize=self._max_workers)
 
 
 if TYPE_CHECKING:
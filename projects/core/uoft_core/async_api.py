@@ -0,0 +1,349 @@
+"""
+Asyncio counterpart to `uoft_core.api`
+
+Where `APIBase` + `ThreadedAPIPool` need one OS thread per in-flight request, `AsyncAPIBase` can keep thousands of
+requests in flight on a single event loop. It keeps the same URL semantics as `APIBase` (string paths are joined to
+the api root with `safe_append_path`, `yarl.URL`s are used as-is), returns the same `requests.Response` objects,
+and raises the same `RESTAPIError`s, so code written against `APIBase` can be ported one call at a time.
+
+Requires the `httpx` package, which is not installed with uoft_core by default.
+
+Example:
+
+    >>> class MyAPI(AsyncAPIBase):
+    ...     async def login(self):
+    ...         self.headers["Authorization"] = "Bearer <token>"
+    >>> async def main():
+    ...     async with MyAPI("https://<rest-api-server>/", api_root="/api") as api:
+    ...         responses = await api.gather(*[api.get(f"/records/{i}") for i in range(1000)])
+
+    Or from synchronous code (ie a typer command):
+
+    >>> with MyAPI("https://<rest-api-server>/", api_root="/api").sync() as api:
+    ...     api.get("/records").json()
+    ...     api.run(main_coroutine(api.api))
+"""
+
+import asyncio
+import inspect
+import random
+import ssl
+import threading
+import time
+from typing import Any, Awaitable, Coroutine, Iterable, TypeVar
+
+import httpx
+from requests import Response, HTTPError
+from requests.structures import CaseInsensitiveDict
+from typing_extensions import Self
+from yarl import URL
+
+from .api import APIBase, RESTAPIError, RateLimiter
+from .metrics import api_metrics
+from . import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS", "TRACE"})
+
+
+def _to_requests_response(res: httpx.Response) -> Response:
+    # Convert an httpx response into a requests response, so that callers (and RESTAPIError)
+    # see exactly the same response objects they would get from APIBase
+    r = Response()
+    r.status_code = res.status_code
+    r.reason = res.reason_phrase
+    r.headers = CaseInsensitiveDict(res.headers)
+    r._content = res.content
+    r.encoding = res.charset_encoding
+    r.url = str(res.url)
+    return r
+
+
+class AsyncAPIBase:
+    """An asyncio-based REST API session with a base URL.
+
+    Args:
+        base_url (str): The base URL of the REST API server.
+        api_root (str, optional): The root path of the REST API, relative to the base URL. Defaults to '/'.
+        verify (bool | str, optional): Whether to verify TLS certificates, or a path to a CA bundle. Defaults to True.
+        max_concurrency (int, optional): Maximum number of requests in flight at once. Defaults to 100.
+
+    Retry and rate limiting settings mirror those of `APIBase`, and can be tuned with `configure_transport`.
+    """
+
+    RESTAPIError = RESTAPIError
+    HTTPError = HTTPError
+
+    max_concurrency: int = 100
+    max_retries: int = APIBase.max_retries
+    backoff_factor: float = APIBase.backoff_factor
+    retry_statuses: frozenset[int] = APIBase.retry_statuses
+    rate_limiter: RateLimiter | None = None
+    timeout: float | None = 60
+
+    safe_append_path = APIBase.safe_append_path
+
+    def __init__(
+        self, base_url: str, api_root: str = "", verify: bool | str = True, max_concurrency: int | None = None
+    ):
+        url = URL(base_url)
+        if not url.scheme:
+            url = url.with_scheme("https")
+        self.url = url
+        self.api_url = self.safe_append_path(url, api_root)
+        self.verify = verify
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        # same as requests.Session, headers and auth set here (ie in `login`) are sent with every request
+        self.headers: dict[str, str] = {}
+        self.auth: tuple[str, str] | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def configure_transport(
+        self,
+        *,
+        max_concurrency: int | None = None,
+        max_retries: int | None = None,
+        backoff_factor: float | None = None,
+        retry_statuses: set[int] | frozenset[int] | None = None,
+        rate_limit: "float | RateLimiter | None" = None,
+    ) -> None:
+        """Configure concurrency, retries, and rate limiting. See `APIBase.configure_transport` for details.
+
+        Must be called before the session is opened.
+        """
+        if self._client is not None:
+            raise RuntimeError("configure_transport must be called before the session is opened")
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        if max_retries is not None:
+            self.max_retries = max_retries
+        if backoff_factor is not None:
+            self.backoff_factor = backoff_factor
+        if retry_statuses is not None:
+            self.retry_statuses = frozenset(retry_statuses)
+        if isinstance(rate_limit, RateLimiter):
+            self.rate_limiter = rate_limit
+        elif rate_limit is not None:
+            self.rate_limiter = RateLimiter(rate_limit) if rate_limit > 0 else None
+
+    async def login(self):
+        # login is called in __aenter__, so it must not require any parameters.
+        # All authentication data should be stored in the instance.
+        pass
+
+    async def logout(self):
+        # logout is called in __aexit__, so it must not require any parameters.
+        pass
+
+    async def open(self):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        verify = self.verify
+        if isinstance(verify, str):
+            # path to a CA bundle
+            verify = ssl.create_default_context(cafile=verify)
+        self._client = httpx.AsyncClient(verify=verify, limits=limits, timeout=self.timeout)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+
+    async def __aenter__(self) -> Self:
+        await self.open()
+        await self.login()
+        return self
+
+    async def __aexit__(self, *args):
+        try:
+            await self.logout()
+        finally:
+            await self.close()
+
+    def _backoff(self, attempt: int) -> float:
+        # same "full jitter" exponential backoff as uoft_core.api.JitteredRetry
+        if attempt <= 1:
+            return 0.0
+        return random.uniform(0, self.backoff_factor * (2 ** (attempt - 1)))
+
+    async def _send(
+        self, method: str, url: str, params: Any, json: Any, headers: dict[str, str], auth: Any, kwargs: dict
+    ) -> tuple[httpx.Response, Response]:
+        # send a request, retrying according to the configured retry policy
+        assert self._client is not None and self._semaphore is not None
+        attempt = 0
+        while True:
+            attempt += 1
+            async with self._semaphore:
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire_async()
+                try:
+                    raw = await self._client.request(
+                        method, url, params=params, json=json, headers=headers, auth=auth, **kwargs
+                    )
+                except httpx.TransportError as e:
+                    # connection errors are safe to retry for any method, read errors only for idempotent ones
+                    retryable = isinstance(e, httpx.ConnectError) or method in IDEMPOTENT_METHODS
+                    if not retryable or attempt > self.max_retries:
+                        raise
+                    logger.debug(f"{method} {url} failed with {e!r}, retrying (attempt {attempt})")
+                    raw = None
+            # back off outside the semaphore, so that a retrying request doesn't hold a concurrency slot while it waits
+            if raw is None:
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            res = _to_requests_response(raw)
+            if res.status_code in self.retry_statuses and method in IDEMPOTENT_METHODS and attempt <= self.max_retries:
+                retry_after = res.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdecimal() else self._backoff(attempt)
+                logger.debug(f"{method} {url} returned {res.status_code}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            return raw, res
+
+    async def request(
+        self,
+        method: str,
+        url: URL | str,
+        *,
+        params: Any = None,
+        data: Any = None,
+        json: Any = None,
+        headers: dict[str, str] | None = None,
+        auth: tuple[str, str] | None = None,
+        timeout: float | None = None,
+        **kwargs,
+    ) -> Response:
+        if self._client is None or self._semaphore is None:
+            raise RuntimeError(
+                f"{self.__class__.__name__} session is not open. Use `async with` or the `sync()` facade"
+            )
+        # If the URL is a string, join it with the api URL
+        if isinstance(url, str):
+            url = self.safe_append_path(self.api_url, url)
+        method = method.upper()
+        merged_headers = {**self.headers, **(headers or {})}
+        auth = auth or self.auth
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if isinstance(params, dict):
+            # requests silently drops params whose value is None, httpx does not
+            params = {k: v for k, v in params.items() if v is not None}
+        if data is not None:
+            # httpx distinguishes between form data (dict) and raw content (str/bytes)
+            kwargs["data" if isinstance(data, dict) else "content"] = data
+
+        start = time.perf_counter()
+        try:
+            raw, res = await self._send(method, str(url), params, json, merged_headers, auth, kwargs)
+        except Exception:
+            api_metrics.record(method, url, time.perf_counter() - start, error=True)
+            raise
+        api_metrics.record(
+            method,
+            url,
+            time.perf_counter() - start,
+            bytes_sent=len(raw.request.content),
+            bytes_received=len(res.content),
+            error=res.status_code >= 400,
+        )
+
+        try:
+            res.raise_for_status()
+        except HTTPError as e:
+            # same error enhancement as APIBase.request
+            raise RESTAPIError.from_http_error(e)
+        return res
+
+    async def get(self, url: URL | str, **kwargs) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def options(self, url: URL | str, **kwargs) -> Response:
+        return await self.request("OPTIONS", url, **kwargs)
+
+    async def head(self, url: URL | str, **kwargs) -> Response:
+        return await self.request("HEAD", url, **kwargs)
+
+    async def post(self, url: URL | str, data: Any = None, json: Any = None, **kwargs) -> Response:
+        return await self.request("POST", url, data=data, json=json, **kwargs)
+
+    async def put(self, url: URL | str, data: Any = None, **kwargs) -> Response:
+        return await self.request("PUT", url, data=data, **kwargs)
+
+    async def patch(self, url: URL | str, data: Any = None, **kwargs) -> Response:
+        return await self.request("PATCH", url, data=data, **kwargs)
+
+    async def delete(self, url: URL | str, **kwargs) -> Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    @staticmethod
+    async def gather(*aws: Awaitable[T], return_exceptions: bool = False) -> list[T]:
+        "Convenience wrapper around asyncio.gather. Concurrency is bounded by `max_concurrency`"
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)  # pyright: ignore[reportReturnType]
+
+    async def get_many(self, urls: Iterable[URL | str], **kwargs) -> list[Response]:
+        "GET a batch of URLs concurrently, returning responses in the same order as `urls`"
+        return await self.gather(*[self.get(url, **kwargs) for url in urls])
+
+    def sync(self) -> "SyncAPI":
+        "Return a synchronous facade for this API, for use in non-async code"
+        return SyncAPI(self)
+
+
+class SyncAPI:
+    """A blocking facade over an `AsyncAPIBase`.
+
+    Runs the API's event loop in a dedicated background thread, so it can be used from plain synchronous code
+    (including from multiple threads at once). Every coroutine method of the wrapped API (including those defined
+    on subclasses) is exposed as a regular blocking method.
+
+    Example:
+
+        >>> with MyAPI("https://<rest-api-server>/").sync() as api:
+        ...     api.get("/records").json()
+        ...     api.get_many([f"/records/{i}" for i in range(1000)])
+    """
+
+    def __init__(self, api: AsyncAPIBase):
+        self.api = api
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name=f"{api.__class__.__name__}-loop", daemon=True
+        )
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        "Run a coroutine on the API's event loop, blocking until it completes"
+        if not self._thread.is_alive():
+            raise RuntimeError("SyncAPI is not running. Use it as a context manager")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        self.run(self.api.__aenter__())
+        return self
+
+    def __exit__(self, *args):
+        try:
+            self.run(self.api.__aexit__(*args))
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.api, name)
+        if inspect.iscoroutinefunction(attr):
+
+            def blocking(*args, **kwargs):
+                return self.run(attr(*args, **kwargs))
+
+            blocking.__name__ = name
+            blocking.__doc__ = attr.__doc__
+            return blocking
+        return attr
@@ -0,0 +1,392 @@
+"""
+Fast shell completion for typer apps.
+
+Normally, every time you press tab, the shell runs the whole CLI app in completion mode,
+which means importing every module the app is built from, and rerunning any dynamic completion functions
+(which may be walking a directory tree, loading settings, or querying an API).
+
+This module provides two things to avoid that:
+
+- `build_tree` walks a typer / click app once and records its subcommands, options, arguments and choices
+  as a plain-data completion tree, which `fast_complete` can then answer completion requests from
+  without importing or building the app at all. Anything the tree can't answer statically falls back to the app.
+- `cached_completion` wraps a dynamic completion function so that its candidate list is cached on disk,
+  and only recomputed when it expires or when one of the paths it depends on changes.
+  `fast_complete` also serves these cached candidate lists.
+"""
+
+import json
+import os
+import tempfile
+import time
+from hashlib import sha256
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Callable, Iterable, Literal, Optional, Sequence
+
+import typer
+
+from . import Util, UofTCoreError, logging
+
+logger = logging.getLogger(__name__)
+
+Candidates = list["str | tuple[str, str]"]
+MatchMode = Literal["prefix", "substring", "icontains"]
+
+
+def _cache_dir() -> Optional[Path]:
+    # candidate lists may have been fetched with the current user's credentials (ie. device names from an API),
+    # so they're kept in the private per-user cache directory rather than the shared site-wide one
+    try:
+        return Util("uoft_core").private_cache_dir("completion")
+    except UofTCoreError:
+        return None
+
+
+def _write_json(file: Path, data: Any):
+    # write to a temp file and atomically move it into place, so that concurrent readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=file.parent, prefix=f".{file.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _stat_signature(paths: Iterable[Path]) -> list[list]:
+    sig = []
+    for path in paths:
+        try:
+            sig.append([str(path), path.stat().st_mtime_ns])
+        except OSError:
+            sig.append([str(path), None])
+    return sig
+
+
+# region dynamic candidates
+def _candidates_file(key: str, param_values: Sequence[str]) -> Optional[Path]:
+    if (cache_dir := _cache_dir()) is None:
+        return None
+    digest = sha256(json.dumps([key, *param_values]).encode()).hexdigest()[:32]
+    return cache_dir / f"{digest}.json"
+
+
+def load_candidates(key: str, param_values: Sequence[str]) -> Optional[Candidates]:
+    "Fetch a cached candidate list, or None if there isn't one or it's no longer valid"
+    if (file := _candidates_file(key, param_values)) is None:
+        return None
+    try:
+        cached = json.loads(file.read_text())
+    except (OSError, ValueError):
+        return None
+    if cached["expires"] < time.time():
+        return None
+    if cached["watch"] != _stat_signature(Path(p) for p, _ in cached["watch"]):
+        return None
+    return [tuple(c) if isinstance(c, list) else c for c in cached["candidates"]]
+
+
+def matches(value: str, incomplete: str, match: MatchMode = "prefix") -> bool:
+    "Whether a candidate value should be offered for the incomplete value being completed"
+    if match == "substring":
+        return incomplete in value
+    if match == "icontains":
+        return incomplete.lower() in value.lower()
+    return value.startswith(incomplete)
+
+
+def save_candidates(key: str, param_values: Sequence[str], candidates: Candidates, ttl: float, watch: list[Path]):
+    if (file := _candidates_file(key, param_values)) is None:
+        return
+    data = dict(expires=time.time() + ttl, watch=_stat_signature(watch), candidates=candidates)
+    try:
+        _write_json(file, data)
+    except OSError as e:
+        logger.debug(f"Unable to cache completion candidates in {file}: {e}")
+
+
+def cached_completion(
+    ttl: float = 300,
+    params: Sequence[str] = (),
+    watch: Optional[Callable[[typer.Context], Iterable[Path]]] = None,
+    match: MatchMode = "prefix",
+):
+    """
+    Decorator for typer autocompletion functions which caches their candidate lists on disk.
+
+    The decorated function takes the typer context, and returns the full list of candidates
+    (either strings, or (value, help) tuples). Candidates are filtered by the incomplete value
+    being completed after they're fetched from the cache, so they don't need to be filtered by the function itself.
+
+    Args:
+        ttl: number of seconds the candidate list stays valid
+        params: names of the command parameters that the candidate list depends on.
+            A separate candidate list is cached for each combination of their values.
+        watch: a function which takes the typer context and returns a list of paths that the candidate list depends on.
+            The cached list is discarded whenever any of their modification times change.
+            (Note that a directory's mtime changes when entries are added to or removed from it,
+            but not when its subdirectories change, so return every directory you need watched.)
+        match: how candidates are matched against the incomplete value: "prefix" (the default),
+            "substring", or "icontains" (case-insensitive substring).
+
+    Example:
+        ```python
+        @cached_completion(params=["templates_dir"], watch=lambda ctx: [ctx.params["templates_dir"]])
+        def template_names(ctx: typer.Context):
+            return [p.name for p in ctx.params["templates_dir"].glob("*.j2")]
+
+        @app.command()
+        def render(template: str = typer.Argument(..., autocompletion=template_names), templates_dir: Path = ...):
+            ...
+        ```
+    """
+
+    def decorator(func: Callable[[typer.Context], Candidates]):
+        key = f"{func.__module__}.{func.__qualname__}"
+
+        def completion(ctx: typer.Context, partial: str):
+            param_values = [str(ctx.params.get(p)) for p in params]
+            candidates = load_candidates(key, param_values)
+            if candidates is None:
+                candidates = list(func(ctx))
+                save_candidates(key, param_values, candidates, ttl, list(watch(ctx)) if watch else [])
+            return [c for c in candidates if matches(c[0] if isinstance(c, tuple) else c, partial or "", match)]
+
+        # read by build_tree, so that fast_complete can look up and match the same candidate lists
+        completion.cached_completion = dict(key=key, params=list(params), match=match)  # pyright: ignore[reportFunctionMemberAccess]
+        completion.__name__ = func.__name__
+        completion.__qualname__ = func.__qualname__
+        completion.__doc__ = func.__doc__
+        completion.__module__ = func.__module__
+        return completion
+
+    return decorator
+
+
+# endregion dynamic candidates
+# region completion tree
+def _find_cached_completion(param) -> Optional[dict]:
+    # typer wraps autocompletion functions a couple of times before attaching them to a click parameter,
+    # so dig through the closures to find our marker
+    seen = set()
+    todo = [getattr(param, "_custom_shell_complete", None)]
+    while todo:
+        func = todo.pop()
+        if func is None or id(func) in seen:
+            continue
+        seen.add(id(func))
+        if marker := getattr(func, "cached_completion", None):
+            return marker
+        todo.append(getattr(func, "__wrapped__", None))
+        for cell in getattr(func, "__closure__", None) or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                continue
+            if callable(contents):
+                todo.append(contents)
+    return None
+
+
+def _param_node(param) -> dict[str, Any]:
+    node: dict[str, Any] = dict(name=param.name)
+    if getattr(param, "_custom_shell_complete", None) is not None:
+        if marker := _find_cached_completion(param):
+            node["dynamic"] = marker
+        else:
+            node["dynamic"] = None
+    elif choices := getattr(param.type, "choices", None):
+        node["choices"] = [str(getattr(c, "value", c)) for c in choices]
+    return node
+
+
+def build_tree(command, help_option_names: Sequence[str] = ("--help",)) -> dict[str, Any]:
+    """
+    Record the subcommands, options and arguments of a click command (ie. `typer.main.get_command(app)`)
+    as a JSON-serializable completion tree
+    """
+    if load := getattr(command, "load", None):
+        # a placeholder for a lazily-loaded command, see uoft_core.__main__.LazyCommand
+        command = load()
+    help_option_names = (command.context_settings or {}).get("help_option_names", help_option_names)
+    node: dict[str, Any] = dict(options=[], arguments=[], defaults={})
+    for param in command.params:
+        # dynamic completions may depend on the values of other parameters, which take these values if not given
+        node["defaults"][param.name] = str(None if callable(param.default) else param.default)
+        if getattr(param, "hidden", False):
+            continue
+        if param.param_type_name == "option":
+            opt = _param_node(param)
+            opt.update(
+                opts=[*param.opts, *param.secondary_opts],
+                help=param.help,
+                flag=bool(param.is_flag or param.count),
+                multiple=bool(param.multiple),
+            )
+            node["options"].append(opt)
+        elif param.param_type_name == "argument":
+            node["arguments"].append(dict(_param_node(param), nargs=param.nargs))
+    node["options"].append(
+        dict(name="help", opts=list(help_option_names), help="Show this message and exit.", flag=True, multiple=False)
+    )
+    if (subcommands := getattr(command, "commands", None)) is not None:
+        node["commands"] = {}
+        for name, sub in subcommands.items():
+            if sub.hidden:
+                continue
+            try:
+                child = build_tree(sub, help_option_names)
+            except Exception as e:  # pylint: disable=broad-except
+                # a subcommand that can't be loaded can't be completed statically either
+                logger.debug(f"Unable to build completion tree for subcommand {name}: {e}")
+                child = dict(unknown=True)
+            child["help"] = sub.get_short_help_str()
+            node["commands"][name] = child
+    return node
+
+
+def load_tree(file: Path, signature: Any) -> Optional[dict[str, Any]]:
+    "Load a completion tree saved by `save_tree`, if it was saved with the same signature"
+    try:
+        cached = json.loads(file.read_text())
+    except (OSError, ValueError):
+        return None
+    if cached.get("signature") != signature:
+        return None
+    return cached["tree"]
+
+
+def save_tree(file: Path, signature: Any, tree: dict[str, Any]):
+    try:
+        _write_json(file, dict(signature=signature, tree=tree))
+    except OSError as e:
+        logger.debug(f"Unable to save completion tree to {file}: {e}")
+
+
+def _complete_param(
+    node: dict[str, Any], param: dict[str, Any], values: dict[str, str], incomplete: str
+) -> Optional[list[tuple[str, Optional[str]]]]:
+    if "dynamic" in param:
+        if (dynamic := param["dynamic"]) is None:
+            return None
+        param_values = [values.get(p, node["defaults"].get(p, "None")) for p in dynamic["params"]]
+        candidates = load_candidates(dynamic["key"], param_values)
+        if candidates is None:
+            return None
+        items = [c if isinstance(c, tuple) else (c, None) for c in candidates]
+        return [(v, h) for v, h in items if matches(v, incomplete, dynamic.get("match", "prefix"))]
+    if choices := param.get("choices"):
+        return [(c, None) for c in choices if c.startswith(incomplete)]
+    # no candidates at all is how typer tells the shell to fall back to its own completion,
+    # which is what completes file names for path parameters (`complete -o default` in bash, `_files` in zsh)
+    return []
+
+
+def complete(tree: dict[str, Any], args: list[str], incomplete: str) -> Optional[list[tuple[str, Optional[str]]]]:
+    """
+    Work out the completions for `incomplete`, given the preceding command-line `args`, from a completion tree.
+    Returns a list of (value, help) tuples, or None if the answer can't be worked out from the tree alone.
+    """
+    node = tree
+    used: set[str] = set()
+    values: dict[str, str] = {}
+    position = 0
+    pending = None
+
+    def find_option(name):
+        return next((o for o in node["options"] if name in o["opts"]), None)
+
+    for arg in args:
+        if node.get("unknown"):
+            return None
+        if pending is not None:
+            values[pending["name"]] = arg
+            pending = None
+            continue
+        if arg == "--":
+            return None
+        if arg.startswith("-") and arg != "-":
+            name, eq, value = arg.partition("=")
+            if (opt := find_option(name)) is None:
+                return None
+            used.add(opt["name"])
+            if not opt["flag"]:
+                if eq:
+                    values[opt["name"]] = value
+                else:
+                    pending = opt
+            continue
+        if (commands := node.get("commands")) is not None:
+            if arg not in commands:
+                return None
+            node = commands[arg]
+            used = set()
+            position = 0
+            continue
+        if position < len(node["arguments"]):
+            values[node["arguments"][position]["name"]] = arg
+        position += 1
+
+    if node.get("unknown"):
+        return None
+    if pending is not None:
+        return _complete_param(node, pending, values, incomplete)
+    if incomplete.startswith("-"):
+        if "=" in incomplete:
+            return None
+        return [
+            (name, opt.get("help"))
+            for opt in node["options"]
+            if opt["multiple"] or opt["name"] not in used
+            for name in opt["opts"]
+            if name.startswith(incomplete)
+        ]
+    if (commands := node.get("commands")) is not None:
+        return [(name, cmd.get("help")) for name, cmd in commands.items() if name.startswith(incomplete)]
+    arguments = node["arguments"]
+    if position >= len(arguments):
+        if not (arguments and arguments[-1]["nargs"] == -1):
+            return []
+        position = len(arguments) - 1
+    return _complete_param(node, arguments[position], values, incomplete)
+
+
+class _NoFastPath(Exception):
+    pass
+
+
+def fast_complete(tree: dict[str, Any], prog_name: str, complete_var: str) -> bool:
+    """
+    Answer a shell completion request from a completion tree, in the same format typer would.
+    Returns False if the request can't be answered from the tree, in which case the real app should handle it.
+    """
+    instruction = os.environ.get(complete_var, "")
+    action, _, shell = instruction.partition("_")
+    if action != "complete":
+        return False
+    import typer._completion_classes as completion_classes
+
+    completion_classes.completion_init()
+    shell_completion = import_module(completion_classes.ShellComplete.__module__)
+    shell_class = shell_completion.get_completion_class(shell)
+    if shell_class is None:
+        return False
+
+    class FastComplete(shell_class):
+        def get_completions(self, args, incomplete):
+            items = complete(tree, args, incomplete)
+            if items is None:
+                raise _NoFastPath
+            return [completion_classes.CompletionItem(value, help=help_) for value, help_ in items]
+
+    try:
+        output = FastComplete(None, {}, prog_name, complete_var).complete()
+    except _NoFastPath:
+        return False
+    print(output)
+    return True
+
+
+# endregion completion tree
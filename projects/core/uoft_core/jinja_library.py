@@ -1,5 +1,13 @@
 # vendored version of django_jinja.library, for use in multiple projects
 
+import hashlib
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
 
 # Global register dict for third party
 # template functions, filters and extensions.
@@ -71,3 +79,113 @@ def test(*args, **kwargs):
 def filter(*args, **kwargs):
     return _register_function("filters", *args, **kwargs)
 
+
+# Shared, cached jinja environments
+#
+# Building a new jinja Environment for every render means every template gets lexed, parsed and compiled again
+# each time. Environments handed out by `get_environment` are reused for as long as the process lives (so templates
+# rendered more than once are only compiled once), and compiled templates are stored in a bytecode cache on disk
+# (so that the next process doesn't have to compile them either).
+#
+# Jinja executes whatever code it finds in the bytecode cache, so the cache always lives in a directory private to
+# the current user, never in the shared, site-wide cache directory.
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    environments: int
+
+
+_environments: "dict[tuple, Environment]" = {}
+_environments_lock = threading.Lock()
+_bytecode_stats = {"hits": 0, "misses": 0}
+
+
+def _private_cache_dir() -> Path | None:
+    "The per-user bytecode cache directory, or None if it can't be created or other users can get into it"
+    from . import Util, UofTCoreError
+
+    try:
+        return Util("uoft_core").private_cache_dir("jinja")
+    except UofTCoreError:
+        return None
+
+
+def _bytecode_cache(options: dict[str, Any]):
+    from jinja2 import FileSystemBytecodeCache
+
+    class _CountingBytecodeCache(FileSystemBytecodeCache):
+        def load_bytecode(self, bucket):
+            super().load_bytecode(bucket)
+            # a bucket with no code is either missing from the cache or was compiled from an older source / jinja
+            _bytecode_stats["hits" if bucket.code is not None else "misses"] += 1
+
+    # bytecode cache keys only cover the template name and path, but the compiled code also depends on syntax
+    # options like line_statement_prefix, so environments with different options get different cache files
+    options_hash = hashlib.sha1(repr(sorted((k, repr(v)) for k, v in options.items())).encode()).hexdigest()[:12]
+    directory = _private_cache_dir()
+    # with no directory, jinja uses a per-user directory in /tmp, which it creates with mode 0700 and checks the
+    # owner of
+    return _CountingBytecodeCache(str(directory) if directory else None, pattern=f"__jinja2_{options_hash}_%s.cache")
+
+
+def get_environment(
+    search_path: "str | Path | list[str | Path]",
+    filters: "dict[str, Callable] | None" = None,
+    tests: "dict[str, Callable] | None" = None,
+    **options: Any,
+) -> "Environment":
+    """
+    Get a jinja Environment which loads templates from `search_path`, with the given filters and tests added to it.
+    Extra keyword arguments are passed to the Environment constructor.
+
+    Environments are shared: calls with the same search path, filters, tests and options return the same
+    Environment, so don't modify the returned environment's globals, filters, or tests. Pass per-render data to
+    `Template.render()`, or load the template with `load_template` to make it available as globals instead.
+    """
+    from jinja2 import Environment, FileSystemLoader
+
+    if isinstance(search_path, (str, Path)):
+        search_path = [search_path]
+    paths = tuple(str(Path(p).resolve()) for p in search_path)
+    filters = filters or {}
+    tests = tests or {}
+    key = (
+        paths,
+        frozenset(filters.items()),
+        frozenset(tests.items()),
+        frozenset((k, tuple(v) if isinstance(v, list) else v) for k, v in options.items()),
+    )
+    with _environments_lock:
+        if (env := _environments.get(key)) is not None:
+            return env
+        env = Environment(loader=FileSystemLoader(paths), bytecode_cache=_bytecode_cache(options), **options)
+        env.filters.update(filters)
+        env.tests.update(tests)
+        _environments[key] = env
+        return env
+
+
+def load_template(environment: "Environment", name: str, globals: "dict[str, Any] | None" = None) -> "Template":
+    """
+    Load a fresh copy of a template from a shared environment, with `globals` available to it (and to any templates
+    it imports or includes). Unlike `Environment.get_template(name, globals=...)`, which updates the globals of the
+    environment's cached copy of the template, the globals of one render don't leak into the next.
+    The template is built from the bytecode cache, so it isn't recompiled unless its source has changed.
+    """
+    if environment.loader is None:
+        raise TypeError("no loader for this environment specified")
+    return environment.loader.load(environment, name, environment.make_globals(globals))
+
+
+def cache_info() -> CacheInfo:
+    "Bytecode cache hits and misses, and the number of shared environments created by `get_environment`"
+    return CacheInfo(_bytecode_stats["hits"], _bytecode_stats["misses"], len(_environments))
+
+
+def cache_clear():
+    "Drop all shared environments and reset the stats. Bytecode already written to disk is kept"
+    with _environments_lock:
+        _environments.clear()
+        _bytecode_stats.update(hits=0, misses=0)
@@ -4,9 +4,13 @@ Behaves exactly like the standard library logging module,
 but with support for log contexts and custom log levels TRACE and SUCCESS."""
 
 from typing import TYPE_CHECKING, Literal, Iterable, IO
+import atexit
 import logging
+import logging.handlers
+import queue
+import sys
 from pathlib import Path
-from contextvars import ContextVar
+from contextvars import ContextVar, Token
 
 from .console import console
 
@@ -51,19 +55,144 @@ class UofTCoreLogger(BaseLogger):
 
 logging.setLoggerClass(UofTCoreLogger)
 
-_logging_contexts: ContextVar[set[str]] = ContextVar("logging_contexts", default=set())
+# each task / thread sees its own immutable stack of contexts, outermost first.
+# entering a Context sets a new tuple rather than mutating a shared one,
+# so contexts can't leak between threads or asyncio tasks
+_logging_contexts: ContextVar[tuple[str, ...]] = ContextVar("logging_contexts", default=())
+_context_tokens: "ContextVar[tuple[Token[tuple[str, ...]], ...]]" = ContextVar("logging_context_tokens", default=())
 
 
-class _ContextFilter(logging.Filter):
-    def filter(self, record):
-        contexts = _logging_contexts.get()
-        if contexts:
-            record.contexts = contexts
-            msg = record.msg
-            for context in contexts:
-                msg = f"{context}: {msg}"
-            record.msg = msg
-        return True
+# same deal as the logger class above. records are only ever created once a logger has
+# decided the record's level is enabled, so capturing contexts here costs nothing for
+# records which are discarded, and the contexts are captured in the thread which logged
+# the record, even if the record is later emitted from another thread (ex. queue mode)
+BaseLogRecord = logging.getLogRecordFactory()
+if not (isinstance(BaseLogRecord, type) and issubclass(BaseLogRecord, logging.LogRecord)):
+    BaseLogRecord = logging.LogRecord
+
+
+class UofTCoreLogRecord(BaseLogRecord):  # pyright: ignore[reportGeneralTypeIssues]
+    contexts: tuple[str, ...]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.contexts = _logging_contexts.get()
+
+    def getMessage(self):
+        """
+        Return the message for this LogRecord, prefixed with any log contexts which were
+        active when the record was created.
+
+        Only called when a record is actually formatted for output.
+        """
+        msg = super().getMessage()
+        if self.contexts:
+            return f"{': '.join(self.contexts)}: {msg}"
+        return msg
+
+
+logging.setLogRecordFactory(UofTCoreLogRecord)
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """
+    A plain-text StreamHandler which doesn't flush after every record.
+
+    Records are written to the stream's buffer, and the buffer is only flushed
+    once `capacity` records have accumulated, or when a record at or above
+    `flush_level` comes through, or when the handler is flushed or closed.
+    """
+
+    def __init__(self, stream=None, capacity: int = 100, flush_level: int = logging.ERROR):
+        super().__init__(stream)
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self._pending = 0
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                # a FileHandler opened with delay=True
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._pending += 1
+            if record.levelno >= self.flush_level or self._pending >= self.capacity:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self._pending = 0
+
+    def close(self):
+        # StreamHandler.close doesn't flush, and records still in the buffer would be lost
+        self.flush()
+        super().close()
+
+
+class BufferedFileHandler(BufferedStreamHandler, logging.FileHandler):
+    """
+    A `BufferedStreamHandler` which appends to a file.
+
+    Log files like the shared error logs are written to by many processes at once, which can't
+    coordinate rotating them, so this handler only ever appends. Rotation is left to logrotate.
+    """
+
+    def __init__(
+        self,
+        filename,
+        mode="a",
+        encoding=None,
+        delay=True,
+        errors=None,
+        capacity: int = 100,
+        flush_level: int = logging.ERROR,
+    ):
+        # FileHandler.__init__ calls StreamHandler.__init__ directly, rather than going through super()
+        logging.FileHandler.__init__(self, filename, mode=mode, encoding=encoding, delay=delay, errors=errors)
+        self.capacity = capacity
+        self.flush_level = flush_level
+        self._pending = 0
+
+
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler for an in-process queue.
+
+    The stock QueueHandler.prepare formats the record and strips its exc_info so that
+    it can be pickled. Our queue never leaves the process, so we only merge the message
+    args (which may be mutated by the caller after the fact) and leave everything else,
+    including exc_info, intact for the handlers on the other side of the queue
+    (RichHandler renders its own tracebacks).
+    """
+
+    def prepare(self, record):
+        # merge the args without the context prefix, record.contexts travels with the record
+        if isinstance(record, UofTCoreLogRecord):
+            record.msg = super(UofTCoreLogRecord, record).getMessage()
+        else:
+            record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_queue_listener: logging.handlers.QueueListener | None = None
+
+
+def _stop_queue_listener():
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        for handler in _queue_listener.handlers:
+            handler.close()
+        _queue_listener = None
+
+
+atexit.register(_stop_queue_listener)
 
 
 def basicConfig(**kwargs):   # pyright: ignore[reportRedeclaration]
@@ -116,6 +245,10 @@ def basicConfig(**kwargs):   # pyright: ignore[reportRedeclaration]
     error_log_filename
               If specified, the filename to log errors to. The default is 'errors.log'.
               Only used if log_errors_to_file is True.
+    queue     If specified as true, the root logger gets a single QueueHandler, and all
+              other handlers are run by a QueueListener on a background thread.
+              Threads which log no longer block on console rendering or file I/O.
+              The default is False.
 
     Note that you could specify a stream created using open(filename, mode)
     rather than passing the filename and mode in. However, it should be
@@ -143,7 +276,14 @@ def basicConfig(**kwargs):   # pyright: ignore[reportRedeclaration]
     # with sys.stderr, we create a rich handler with sys.stderr
     import os
     from rich.logging import RichHandler
-    from rich.console import Console
+
+    use_queue = kwargs.pop("queue", False)
+    root_logger = logging.getLogger()
+    if kwargs.get("force"):
+        _stop_queue_listener()
+    elif root_logger.handlers:
+        # stdlib basicConfig is a no-op in this case, so don't start a listener
+        use_queue = False
 
     if "format" not in kwargs:
         # let the RichHandler manage time, level, and source. 
@@ -161,43 +301,70 @@ def basicConfig(**kwargs):   # pyright: ignore[reportRedeclaration]
         if level <= logging.DEBUG:
             show_path = True
 
-        handlers.append(RichHandler(console=console(), show_time=False, show_path=show_path))
+        # when stderr isn't a TTY (ie. it's piped to a file or captured by cron / systemd), and for log files,
+        # there's nothing for rich to render. plain, buffered handlers are much cheaper per record
+        plain_fmt = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        if console().is_terminal:
+            handlers.append(RichHandler(console=console(), show_time=False, show_path=show_path))
+        else:
+            stderr_handler = BufferedStreamHandler(sys.stderr)
+            stderr_handler.setFormatter(plain_fmt)
+            handlers.append(stderr_handler)
+        # error logs can be written to by many processes (and, in /var/log, many users) at once,
+        # so they're only ever appended to. rotating them is left to logrotate
+        file_handlers: list[logging.Handler] = []
         if kwargs.pop("log_errors_to_file", False):
-            handlers.append(RichHandler(console=Console(file=open(error_log_filename, "a"))))
+            file_handlers.append(BufferedFileHandler(error_log_filename))
 
         # if `/var/log/uoft-tools` exists and is writable, log errors to `/var/log/uoft-tools/<error_log_filename>`
         # otherwise, log errors to `<error_log_filename>` in the current working directory
         log_dir = Path("/var/log/uoft-tools")
         if log_dir.exists() and log_dir.is_dir() and os.access(log_dir, os.W_OK):
             error_log_path = log_dir / error_log_filename
-            handlers.append(RichHandler(console=Console(file=open(error_log_path, "a"))))
-
-        kwargs["handlers"] = handlers
-
-    # Logger-level filtering happens on a per-logger basis. If we register a filter with the root logger AFTER
-    # a logger has already been instantiated (which is guaranteed to be true atleast for the `uoft_core` logger),
-    # the filter will not be applied to the already instantiated logger.
-    # The only way to ensure that the filter is applied to all loggers is to register the filter with the root logger
-    # and *all* loggers that have been instantiated so far.
-    _filter = _ContextFilter("ContextFilter")
-    root_logger = logging.getLogger()
-    root_logger.addFilter(_filter)
-    for logger in logging.Logger.manager.loggerDict.values():
-        if isinstance(logger, logging.Logger):  # we don't want to add filters to loggin.PlaceHolder instances
-            logger.addFilter(_filter)
+            file_handlers.append(BufferedFileHandler(error_log_path))
+
+        for handler in file_handlers:
+            handler.setFormatter(plain_fmt)
+        kwargs["handlers"] = handlers + file_handlers
+
+    if use_queue:
+        global _queue_listener
+        handlers = list(kwargs.pop("handlers"))
+        # stdlib basicConfig only sets formatters on the handlers it's given,
+        # which will now be just the QueueHandler
+        fmt = logging.Formatter(kwargs.get("format"), kwargs.get("datefmt"), kwargs.get("style", "%"))
+        for handler in handlers:
+            if handler.formatter is None:
+                handler.setFormatter(fmt)
+        log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _queue_listener.start()
+        kwargs["handlers"] = [_LocalQueueHandler(log_queue)]
 
     return logging.basicConfig(**kwargs)
 
 
 class Context:
+    """
+    Prefix every log message created within this context manager with `context_msg`.
+
+    Contexts nest, and are local to the current thread / asyncio task.
+    They're also available as a tuple on each LogRecord, as `record.contexts`.
+    """
+
     def __init__(self, context_msg: str):
         self.context_msg = context_msg
 
     def __enter__(self):
-        _logging_contexts.get().add(self.context_msg)
+        # the same Context object may be entered from several threads / tasks at once (ie. a module-level context
+        # used in a thread pool), so the tokens to reset on exit are kept per thread / task as well
+        token = _logging_contexts.set((*_logging_contexts.get(), self.context_msg))
+        _context_tokens.set((*_context_tokens.get(), token))
 
     def __exit__(self, *args):
-        _logging_contexts.get().remove(self.context_msg)
+        *tokens, token = _context_tokens.get()
+        _context_tokens.set(tuple(tokens))
+        _logging_contexts.reset(token)
 
 
 if TYPE_CHECKING:
@@ -223,4 +390,5 @@ if TYPE_CHECKING:
         errors: str | None = ...,
         log_errors_to_file: bool = ...,
         error_log_filename: str = ...,
+        queue: bool = ...,
     ) -> None: ...
@@ -0,0 +1,258 @@
+"""
+Per-endpoint latency and throughput metrics for REST API clients.
+
+Every request made through `uoft_core.api.APIBase` (or `AsyncAPIBase`) is recorded automatically in the global
+`api_metrics` registry. Clients built directly on `requests.Session` can opt in with `instrument_session`.
+
+Requests are grouped by HTTP method and a path template, where variable path segments like numeric ids, UUIDs,
+IP addresses and MAC addresses are replaced with placeholders, so that `GET /api/v2/networks/1234` and
+`GET /api/v2/networks/5678` are both counted as `GET /api/v2/networks/{id}`.
+
+To get a report of the hottest endpoints at the end of a run, set the `UOFT_API_METRICS` environment variable:
+
+- `UOFT_API_METRICS=1` prints a summary table to stderr at process exit
+- `UOFT_API_METRICS=/path/to/file.json` writes all metrics as JSON at process exit
+- `UOFT_API_METRICS=/path/to/file.prom` writes all metrics in Prometheus textfile-collector format at process exit
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any
+
+from requests import Response, Session
+from yarl import URL
+
+# Prometheus-style latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_placeholders = [
+    ("{uuid}", re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")),
+    ("{id}", re.compile(r"\d+")),
+    ("{mac}", re.compile(r"([0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2}|([0-9a-fA-F]{4}\.){2}[0-9a-fA-F]{4}")),
+    ("{ip}", re.compile(r"\d{1,3}(\.\d{1,3}){3}(%2[fF]\d{1,2})?|[0-9a-fA-F]*:[0-9a-fA-F:]+(%2[fF]\d{1,3})?")),
+]
+
+
+def path_template(url: "str | URL") -> str:
+    "Reduce a URL to its path, with variable segments replaced by placeholders"
+    path = URL(str(url)).raw_path
+    segments = []
+    for segment in path.split("/"):
+        for placeholder, pattern in _placeholders:
+            if pattern.fullmatch(segment):
+                segment = placeholder
+                break
+        segments.append(segment)
+    return "/".join(segments)
+
+
+class EndpointStats:
+    "Running totals for a single (method, path template) pair"
+
+    __slots__ = ("buckets", "bytes_received", "bytes_sent", "count", "errors", "max_time", "min_time", "total_time")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.min_time = float("inf")
+        self.max_time = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # one counter per bucket in LATENCY_BUCKETS, plus one for +Inf
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, elapsed: float, bytes_sent: int, bytes_received: int, error: bool):
+        self.count += 1
+        self.errors += error
+        self.total_time += elapsed
+        self.min_time = min(self.min_time, elapsed)
+        self.max_time = max(self.max_time, elapsed)
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        "Estimate a latency quantile from the histogram (upper bound of the bucket the quantile falls in)"
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max_time)
+        return self.max_time
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(
+            count=self.count,
+            errors=self.errors,
+            total_time=self.total_time,
+            mean_time=self.mean_time,
+            min_time=self.min_time if self.count else 0.0,
+            max_time=self.max_time,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            histogram=dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], self.buckets)),
+        )
+
+
+class APIMetrics:
+    "A thread-safe registry of `EndpointStats`, keyed by (host, method, path template)"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.endpoints: dict[tuple[str, str, str], EndpointStats] = {}
+
+    def record(
+        self,
+        method: str,
+        url: "str | URL",
+        elapsed: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        error: bool = False,
+    ):
+        url = URL(str(url))
+        key = (url.host or "", method.upper(), path_template(url))
+        with self._lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats()
+            stats.add(elapsed, bytes_sent, bytes_received, error)
+
+    def record_response(self, res: Response, elapsed: float | None = None):
+        "Record a completed requests Response. `elapsed` defaults to the response's time-to-headers"
+        req = res.request
+        body = req.body if req is not None else None
+        sent = len(body) if body else 0
+        if res.headers.get("Content-Length", "").isdecimal():
+            received = int(res.headers["Content-Length"])
+        elif res._content_consumed:  # pyright: ignore[reportAttributeAccessIssue]
+            received = len(res.content or b"")
+        else:
+            received = 0
+        if elapsed is None:
+            elapsed = res.elapsed.total_seconds()
+        method = req.method if req is not None and req.method else "GET"
+        self.record(method, res.url, elapsed, sent, received, error=res.status_code >= 400)
+
+    def clear(self):
+        with self._lock:
+            self.endpoints.clear()
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        "All endpoint stats as a list of dicts, sorted by total time spent (hottest endpoints first)"
+        with self._lock:
+            items = [
+                dict(host=host, method=method, path=path, **stats.as_dict())
+                for (host, method, path), stats in self.endpoints.items()
+            ]
+        return sorted(items, key=lambda d: d["total_time"], reverse=True)
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "uoft_api") -> str:
+        "Render all metrics in the Prometheus text exposition format, suitable for the node_exporter textfile collector"
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds REST API request latency",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        counters = {
+            "errors_total": ("REST API requests which failed", "errors"),
+            "sent_bytes_total": ("Bytes sent in REST API request bodies", "bytes_sent"),
+            "received_bytes_total": ("Bytes received in REST API response bodies", "bytes_received"),
+        }
+        snapshot = self.snapshot()
+        for item in snapshot:
+            labels = f'host="{item["host"]}",method="{item["method"]}",path="{item["path"]}"'
+            cumulative = 0
+            for bound, n in item["histogram"].items():
+                cumulative += n
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_request_duration_seconds_sum{{{labels}}} {item['total_time']}")
+            lines.append(f"{prefix}_request_duration_seconds_count{{{labels}}} {item['count']}")
+        for name, (help_, field) in counters.items():
+            lines.append(f"# HELP {prefix}_{name} {help_}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for item in snapshot:
+                labels = f'host="{item["host"]}",method="{item["method"]}",path="{item["path"]}"'
+                lines.append(f"{prefix}_{name}{{{labels}}} {item[field]}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path):
+        "Write metrics to `path`, as Prometheus text if the file name ends in `.prom`, otherwise as JSON"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = self.to_prometheus() if path.suffix == ".prom" else self.to_json()
+        # write to a temp file and rename it into place, as the textfile collector expects
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(content)
+        tmp.replace(path)
+
+    def print_summary(self, limit: int = 20):
+        "Print a table of the `limit` endpoints with the most total time spent to stderr"
+        from rich.table import Table
+        from .console import console
+
+        snapshot = self.snapshot()
+        if not snapshot:
+            return
+        table = Table(title="REST API requests by total time")
+        for col in ["Method", "Endpoint", "Count", "Errors", "Total", "Mean", "p95", "Max", "Received"]:
+            table.add_column(col, justify="left" if col in ("Method", "Endpoint") else "right")
+        for item in snapshot[:limit]:
+            table.add_row(
+                item["method"],
+                f"{item['host']}{item['path']}",
+                str(item["count"]),
+                str(item["errors"]),
+                f"{item['total_time']:.3f}s",
+                f"{item['mean_time'] * 1000:.1f}ms",
+                f"{item['p95'] * 1000:.1f}ms",
+                f"{item['max_time'] * 1000:.1f}ms",
+                f"{item['bytes_received'] / 1024:.1f}KiB",
+            )
+        console().print(table)
+
+
+api_metrics = APIMetrics()
+
+
+def instrument_session(session: Session, metrics: APIMetrics = api_metrics) -> Session:
+    """Record metrics for every request made through a plain `requests.Session`.
+
+    Latency is measured as time-to-response-headers (`Response.elapsed`), since that's all a response hook can see.
+    """
+
+    def hook(res: Response, *args, **kwargs):
+        metrics.record_response(res)
+
+    session.hooks["response"].append(hook)
+    return session
+
+
+def _report_at_exit():
+    target = os.environ.get("UOFT_API_METRICS", "")
+    if target.lower() in ("", "0", "false", "no"):
+        return
+    if target.lower() in ("1", "true", "yes"):
+        api_metrics.print_summary()
+    else:
+        api_metrics.write(Path(target))
+
+
+atexit.register(_report_at_exit)
@@ -1,10 +1,79 @@
 import re
-from typing import Any, Iterable
+from functools import lru_cache
+from typing import Any, Iterable, Iterator
 
 UnStructuredData = Iterable[tuple[str, Any]]
 RegexOrString = str | re.Pattern[str]
 
 
+_MISSING = object()
+
+
+def _is_index_key(k: str) -> bool:
+    return k.startswith("[") and k.endswith("]") and k[1:-1].isdecimal()
+
+
+def _children(data: list | dict) -> Iterator[tuple[str, Any]]:
+    "(keyname, item) pairs for each child of a list or dict, as they appear in a keypath"
+    if isinstance(data, list):
+        for index, item in enumerate(data):
+            yield f"[{index}]", item
+    else:
+        for key, item in data.items():
+            if not isinstance(key, str):
+                raise Exception("This function only supports dictionaries whose keys are strings")
+            yield (f'"{key}"' if " " in key else key), item
+
+
+class _Node(dict):
+    """
+    An interior node of the trie built by `NestedData.restructure`, mapping keys to child nodes or leaf values.
+    (it's a dict itself rather than holding one, since a large document can have hundreds of thousands of these)
+    """
+
+    __slots__ = ("first", "key", "parent")
+
+    def __init__(self, first: Any, parent: "_Node | None" = None, key: str = "") -> None:
+        # the first value inserted anywhere below this node
+        self.first = first
+        self.parent = parent
+        self.key = key
+
+    def descend(self, key: str, value: Any) -> "_Node":
+        "The interior node at `key`, creating it if needed. `value` is the leaf being inserted below it"
+        child = self.get(key, _MISSING)
+        if child is _MISSING:
+            node = self[key] = _Node(value, self, key)
+        elif isinstance(child, _Node):
+            node = child
+        else:
+            # this leaf now has children, so it moves down to the empty key of a new interior node
+            node = self[key] = _Node(child, self, key)
+            node[""] = child
+        return node
+
+    def insert(self, key: str, value: Any) -> None:
+        "Insert a leaf at `key`"
+        node = self
+        while (child := node.get(key, _MISSING)) is not _MISSING:
+            if not isinstance(child, _Node):
+                # duplicate keypath, the first value wins
+                return
+            # a keypath which ends at an interior node continues on with empty keys until it reaches a free slot,
+            # so that `a` and `a.` both name the same leaf, as they always have
+            node, key = child, ""
+        node[key] = value
+
+    def build(self) -> Any:
+        "The dict, list or value this node stands for. Every child node must already have been replaced by its own"
+        if len(self) == 1 and "" in self:
+            # only empty keys below this node, so it's really a leaf. its value is the first one inserted below it
+            return self.first
+        if all(_is_index_key(k) for k in self):
+            return list(self.values())
+        return dict(self)
+
+
 class NestedData:
     """
     A collection of functions for working with nested data structures
@@ -27,26 +96,26 @@ class NestedData:
                 a list of 2-tuples representing "leaf node" elements
                 from the datastructure, and their keypaths.
         """
-        if isinstance(data, list):
-            for index, item in enumerate(data):
-                keyname = f"[{index}]"
-                for keypath, value in cls.unstructure(item):
-                    keypath = f"{keyname}.{keypath}" if keypath else keyname
-                    yield keypath, value
-        elif isinstance(data, dict):
-            for key, item in data.items():
-                if not isinstance(key, str):
-                    raise Exception(
-                        "This function only supports dictionaries whose keys are strings"
-                    )
-                keyname = f'"{key}"' if " " in key else key
-                for keypath, value in cls.unstructure(item):
-                    keypath = f"{keyname}.{keypath}" if keypath else keyname
-                    yield keypath, value
-        else:
-            # We've reached a leaf node in the data structure. return a falsy value as keypath so that previous
-            # recursion uses its own keypath as the final keypath
+        if not isinstance(data, (list, dict)):
+            # the whole structure is a single leaf node
             yield "", data
+            return
+        # Walk the structure depth-first with an explicit stack instead of recursing, so that structures nested deeper
+        # than the recursion limit can still be unstructured. Each stack entry holds the keypath of a container,
+        # that keypath with any trailing empty keys dropped (which is what a leaf at that level is reported as),
+        # and an iterator over the container's remaining children
+        stack = [(None, "", _children(data))]
+        while stack:
+            prefix, trimmed, children = stack[-1]
+            for keyname, item in children:
+                keypath = f"{prefix}.{keyname}" if prefix is not None else keyname
+                trimmed_keypath = keypath if keyname else trimmed
+                if isinstance(item, (list, dict)):
+                    stack.append((keypath, trimmed_keypath, _children(item)))
+                    break
+                yield trimmed_keypath, item
+            else:
+                stack.pop()
 
     @classmethod
     def restructure(cls, data: UnStructuredData) -> Any:
@@ -66,41 +135,43 @@ class NestedData:
                 Can be a list or dict containing lists or dicts, to an almost infinite depth.
         """
 
-        # The first thing we want to do is group items from the list based on the first element of their keypath.
-        # All items sharing a common first element of a keypath belong to the same nested dict/list
-        root_names: dict[str, Any] = {}
+        # Insert every keypath into a trie in a single pass. Interior nodes of the trie are `_Node`s,
+        # and leaves are the values themselves. Interior nodes are also cached by keypath, so that each leaf only has
+        # to look up its parent, and each new interior node only has to walk down from its nearest existing ancestor
+        root = _Node(None)
+        parents: dict[str, _Node] = {}
         for keypath, value in data:
-            key, _, keypath = keypath.partition(".")
-
-            if key not in root_names:
-                root_names[key] = []
-            root_names[key].append((keypath, value))
-
-        # Now, to reconstruct the object. The keys in root_names can either be all strings
-        # (meaning this object is a dict), or they can all strings of the pattern '[#]'
-        # representing list indices, or they can be blank, meaning we've reached "leaf nodes" in the data tree.
-        # in order to figure out which object to reconstruct,
-        # we need to know what kind of keys we're dealing with
-        if len(root_names) == 1 and list(root_names.keys())[0] == "":
-            # We've reached a "leaf node"
-            return root_names[""][0][1]
-
-        def is_index_key(k: str) -> bool:
-            return k.startswith("[") and k.endswith("]") and k[1:-1].isdecimal()
-
-        if all(is_index_key(key) for key in root_names):
-            # All keys match the pattern for index keys (numbers wrapped in square brackets)
-            result = []
-            for value in root_names.values():
-                r = cls.restructure(value)
-                result.append(r)
-        else:
-            # This is a dict
-            result = {}
-            for key, value in root_names.items():
-                r = cls.restructure(value)
-                result[key] = r
-        return result
+            parent_keypath, sep, key = keypath.rpartition(".")
+            if not sep:
+                node = root
+            elif (node := parents.get(parent_keypath)) is None:
+                # walk up to the nearest ancestor that's already in the trie, then back down creating nodes
+                missing = []
+                path = parent_keypath
+                while True:
+                    path_parent, sep, segment = path.rpartition(".")
+                    missing.append((path, segment))
+                    if not sep:
+                        node = root
+                        break
+                    if (node := parents.get(path_parent)) is not None:
+                        break
+                    path = path_parent
+                for path, segment in reversed(missing):
+                    node = parents[path] = node.descend(segment, value)
+            if key in node:
+                node.insert(key, value)
+            else:
+                node[key] = value
+
+        # nothing hands the root the first value inserted below it, which it needs if that value is all there is
+        root.first = child.first if isinstance(child := root.get(""), _Node) else child
+
+        # `parents` holds every interior node in the order they were created, so walking it backwards replaces each
+        # node's children with their final values before the node itself is replaced in its parent
+        for node in reversed(parents.values()):
+            node.parent[node.key] = node.build()  # pyright: ignore[reportOptionalSubscript]
+        return root.build()
 
     @classmethod
     def _compile_keys_if_needed(
@@ -125,36 +196,98 @@ class NestedData:
         return new_key1, new_key2
 
     @classmethod
-    def remap(
-        cls, data: UnStructuredData, key_map: list[tuple[str, str]]
-    ) -> UnStructuredData:
-        result = list(data)
-        for from_key, to_key in key_map:
-            from_key, to_key = cls._compile_keys_if_needed(from_key, to_key)
-            for index, tup in enumerate(result):
-                key, value = tup
-                if isinstance(from_key, re.Pattern):  # noqa
-                    # do a regex substitution
-                    new_key = re.sub(from_key, to_key, key)
-                else:
-                    # do a regular substitution
-                    new_key = key.replace(from_key, to_key)
-                result[index] = new_key, value
-        return result
+    def remap(cls, data: UnStructuredData, key_map: "list[tuple[str, str]] | KeyMap") -> UnStructuredData:
+        """
+        Rename keypaths according to a list of `(from_key, to_key)` rules, applied in order.
+        `from_key` can contain shell-style `*` wildcards, which are substituted into the matching `*`s in `to_key`.
+        To apply the same rules to many documents, compile them once with `KeyMap` and pass that in instead.
+        """
+        if not isinstance(key_map, KeyMap):
+            key_map = KeyMap(key_map)
+        return key_map(data)
 
     @classmethod
-    def filter_(cls, data: UnStructuredData, key_list: list[str]) -> UnStructuredData:
-        def test(pattern, tup):
-            if isinstance(pattern, re.Pattern):  # noqa
-                return bool(re.match(pattern, tup[0]))
-            # else:
-            return bool(pattern in tup[0])
+    def filter_(cls, data: UnStructuredData, key_list: "list[str] | KeyFilter") -> UnStructuredData:
+        """
+        Keep only the keypaths which contain one of the plain strings in `key_list`,
+        or which start with a match for one of the shell-style `*` wildcard patterns in it.
+        To apply the same filters to many documents, compile them once with `KeyFilter` and pass that in instead.
+        """
+        if not isinstance(key_list, KeyFilter):
+            key_list = KeyFilter(key_list)
+        return key_list(data)
+
 
-        filters_list = [cls._compile_keys_if_needed(key)[0] for key in key_list]
+class KeyMap:
+    """
+    A compiled set of `NestedData.remap` rules, which can be reused across many documents.
+
+    Each rule is compiled once, and a rule is only applied to a keypath if the literal text it needs appears in that
+    keypath. Keypaths which don't contain any rule's literal text are rejected with a single regex search, and the
+    result for each distinct keypath is cached, so remapping a batch of similar documents mostly costs a dict lookup
+    per keypath.
+    """
+
+    def __init__(self, key_map: list[tuple[str, str]], cache_size: int | None = 2**16) -> None:
+        self.rules: list[tuple[RegexOrString, str, str]] = []
+        for from_key, to_key in key_map:
+            pattern, replacement = NestedData._compile_keys_if_needed(from_key, to_key)
+            # the longest run of literal text, which any keypath this rule matches must contain
+            required = max(from_key.split("*"), key=len)
+            self.rules.append((pattern, replacement, required))
+        # rules are applied in order, so a later rule can match text put there by an earlier one. But if a keypath
+        # doesn't contain any rule's literal text, the first rule can't change it, and neither can any of the others
+        self._prefilter = None
+        if self.rules and all(required for _, _, required in self.rules):
+            self._prefilter = re.compile("|".join(re.escape(required) for _, _, required in self.rules))
+        self.remap_key = lru_cache(maxsize=cache_size)(self._remap_key)
 
+    def _remap_key(self, key: str) -> str:
+        if self._prefilter is not None and not self._prefilter.search(key):
+            return key
+        for pattern, replacement, required in self.rules:
+            if required not in key:
+                continue
+            if isinstance(pattern, str):
+                key = key.replace(pattern, replacement)
+            else:
+                key = pattern.sub(replacement, key)
+        return key
+
+    def __call__(self, data: UnStructuredData) -> list[tuple[str, Any]]:
+        remap_key = self.remap_key
+        return [(remap_key(key), value) for key, value in data]
+
+
+class KeyFilter:
+    """
+    A compiled set of `NestedData.filter_` patterns, which can be reused across many documents.
+
+    All of the patterns are combined into a single regex, so each keypath is tested with one match instead of one
+    test per pattern, and the result for each distinct keypath is cached.
+    """
+
+    def __init__(self, key_list: list[str], cache_size: int | None = 2**16) -> None:
+        alternatives = []
+        literals = []
+        for key in key_list:
+            pattern = NestedData._compile_keys_if_needed(key)[0]
+            if isinstance(pattern, re.Pattern):
+                # wildcard patterns have to match from the start of the keypath
+                alternatives.append(f"(?:{pattern.pattern})")
+            else:
+                literals.append(re.escape(pattern))
+        if literals:
+            # plain strings can appear anywhere in the keypath
+            alternatives.append(f"(?s:.*?)(?:{'|'.join(literals)})")
+        self._pattern = re.compile("|".join(alternatives)) if alternatives else None
+        self.matches = lru_cache(maxsize=cache_size)(self._matches)
+
+    def _matches(self, key: str) -> bool:
+        return self._pattern is not None and self._pattern.match(key) is not None
+
+    def __call__(self, data: UnStructuredData) -> UnStructuredData:
+        matches = self.matches
         for tup in data:
-            # yield tup if it matches any of the filters
-            for pat in filters_list:
-                if test(pat, tup):
-                    yield tup
-                    break
+            if matches(tup[0]):
+                yield tup
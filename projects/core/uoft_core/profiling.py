@@ -0,0 +1,451 @@
+"""
+Hierarchical span profiler.
+
+A successor to `uoft_core.Timeit`. Wrap any block of code in a `span` (or decorate a function with one) and its
+wall-clock time is recorded in the global `profiler` registry, along with which span it was nested in:
+
+```python
+from uoft_core.profiling import span
+
+@span()  # named after the function's qualified name
+def load_inventory():
+    with span("fetch", source="nautobot"):
+        ...
+    with span("parse"):
+        ...
+```
+
+Nesting is tracked per thread (and per asyncio task). A thread started from inside a span starts with no parent.
+Repeated spans with the same name are aggregated into a count, total, p50 and p95. Each individual span is also
+kept as a Chrome trace event (up to `Profiler.max_events` of them), so a whole run can be viewed as a flame chart
+in `chrome://tracing`, https://ui.perfetto.dev or https://www.speedscope.app.
+
+To get a report at the end of a run, set the `UOFT_TRACE` environment variable:
+
+- `UOFT_TRACE=1` prints a summary table of all spans to stderr at process exit
+- `UOFT_TRACE=/path/to/file.json` writes a Chrome trace-event JSON file at process exit
+
+While `tracemalloc` is tracing, each span also records the peak traced memory seen while it was open. Peaks are
+process-wide, so spans running concurrently in other threads can inflate each other's peaks.
+
+For function-level detail of a single run, `start_profiling` runs cProfile and/or a sampling profiler until the
+process exits. Every typer app built with `BaseSettings.wrap_typer_command` exposes this as `--profile`.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from . import logging
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# all spans currently open in this thread / task, outermost first
+_span_stack: ContextVar[tuple["Span", ...]] = ContextVar("span_stack", default=())
+
+# span durations are counted in a log-scale histogram, where each bucket is 2 ** (1 / _BUCKETS_PER_OCTAVE) times
+# wider than the last. that keeps quantile estimates within ~9% of the true value using a few hundred counters at
+# most (1us to 1h is ~256 buckets), no matter how many times a span is recorded
+_BUCKETS_PER_OCTAVE = 8
+
+
+class SpanStats:
+    "Running totals for all spans with a given name"
+
+    __slots__ = ("buckets", "count", "max_time", "min_time", "peak_memory", "total_time")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_time = 0.0
+        self.min_time = float("inf")
+        self.max_time = 0.0
+        # bucket index -> number of spans in it. bucket i holds durations up to 2 ** ((i + 1) / _BUCKETS_PER_OCTAVE)
+        self.buckets: dict[int, int] = {}
+        self.peak_memory: int | None = None
+
+    def add(self, elapsed: float, peak_memory: int | None = None):
+        self.count += 1
+        self.total_time += elapsed
+        self.min_time = min(self.min_time, elapsed)
+        self.max_time = max(self.max_time, elapsed)
+        bucket = math.floor(math.log2(max(elapsed, 1e-9)) * _BUCKETS_PER_OCTAVE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        if peak_memory is not None:
+            self.peak_memory = max(self.peak_memory or 0, peak_memory)
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        "Estimate a nearest-rank quantile of all recorded durations from the histogram"
+        if not self.count:
+            return 0.0
+        rank = min(int(q * self.count), self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                # the upper bound of the bucket the quantile falls in, but never outside the range actually seen
+                upper = 2 ** ((bucket + 1) / _BUCKETS_PER_OCTAVE)
+                return max(self.min_time, min(upper, self.max_time))
+        return self.max_time
+
+    def as_dict(self) -> dict[str, Any]:
+        return dict(
+            count=self.count,
+            total_time=self.total_time,
+            mean_time=self.mean_time,
+            min_time=self.min_time if self.count else 0.0,
+            max_time=self.max_time,
+            p50=self.quantile(0.5),
+            p95=self.quantile(0.95),
+            peak_memory=self.peak_memory,
+        )
+
+
+class Span:
+    """
+    A single timed region. Use it as a context manager, or as a decorator.
+
+    When used as a decorator, each call to the decorated function gets its own span,
+    so decorated functions can safely be called recursively or from multiple threads.
+    """
+
+    __slots__ = ("_parent_span", "_token", "args", "name", "parent", "peak_memory", "profiler", "start")
+
+    def __init__(self, profiler: "Profiler", name: str | None, args: dict[str, Any]) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.parent: str | None = None
+        self.start = 0.0
+        self.peak_memory: int | None = None
+
+    def __enter__(self):
+        assert self.name, "spans used as context managers must be given a name"
+        stack = _span_stack.get()
+        self._parent_span = stack[-1] if stack else None
+        self.parent = self._parent_span.name if self._parent_span else None
+        if tracemalloc.is_tracing():
+            # tracemalloc only has one peak counter. before resetting it for this span,
+            # hand the peak seen so far up to the enclosing span
+            self._fold_peak_memory(self._parent_span)
+            self.peak_memory = 0
+        self._token = _span_stack.set((*stack, self))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        _span_stack.reset(self._token)
+        if self.peak_memory is not None and tracemalloc.is_tracing():
+            self._fold_peak_memory(self)
+            self._fold_peak_memory(self._parent_span, self.peak_memory)
+        self.profiler.record(self, end)
+
+    @staticmethod
+    def _fold_peak_memory(span: "Span | None", peak: int | None = None):
+        if peak is None:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        if span is not None and span.peak_memory is not None:
+            span.peak_memory = max(span.peak_memory, peak)
+
+    def __call__(self, func: F) -> F:
+        profiler, name, args = self.profiler, self.name or func.__qualname__, self.args
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*a, **kw):
+                with Span(profiler, name, args):
+                    return await func(*a, **kw)
+
+            return async_wrapper  # pyright: ignore[reportReturnType]
+
+        @functools.wraps(func)
+        def wrapper(*a, **kw):
+            with Span(profiler, name, args):
+                return func(*a, **kw)
+
+        return wrapper  # pyright: ignore[reportReturnType]
+
+
+class Profiler:
+    "A thread-safe registry of completed spans, aggregated by name and kept as a list of trace events"
+
+    def __init__(self, max_events: int = 100_000) -> None:
+        self._lock = threading.Lock()
+        self.max_events = max_events
+        self.spans: dict[str, SpanStats] = {}
+        self.events: list[dict[str, Any]] = []
+        self.dropped_events = 0
+        self.thread_names: dict[int, str] = {}
+        self.epoch = time.perf_counter()
+
+    def span(self, name: str | None = None, **args) -> Span:
+        """
+        Create a new span. `args` are attached to the span's trace event.
+        `name` may only be omitted when the span is used as a decorator.
+        """
+        return Span(self, name, args)
+
+    def record(self, span: Span, end: float):
+        assert span.name
+        elapsed = end - span.start
+        thread = threading.current_thread()
+        tid = thread.native_id or thread.ident or 0
+        with self._lock:
+            stats = self.spans.get(span.name)
+            if stats is None:
+                stats = self.spans[span.name] = SpanStats()
+            stats.add(elapsed, span.peak_memory)
+            if len(self.events) >= self.max_events:
+                self.dropped_events += 1
+                return
+            self.thread_names.setdefault(tid, thread.name)
+            event = dict(
+                name=span.name,
+                ph="X",
+                ts=(span.start - self.epoch) * 1e6,
+                dur=elapsed * 1e6,
+                pid=os.getpid(),
+                tid=tid,
+            )
+            args = dict(span.args)
+            if span.parent:
+                args["parent"] = span.parent
+            if span.peak_memory is not None:
+                args["peak_memory"] = span.peak_memory
+            if args:
+                event["args"] = args
+            self.events.append(event)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.events.clear()
+            self.thread_names.clear()
+            self.dropped_events = 0
+            self.epoch = time.perf_counter()
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        "All span stats as a list of dicts, sorted by total time spent (hottest spans first)"
+        with self._lock:
+            items = [dict(name=name, **stats.as_dict()) for name, stats in self.spans.items()]
+        return sorted(items, key=lambda d: d["total_time"], reverse=True)
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        "All recorded spans in the Chrome trace-event format"
+        pid = os.getpid()
+        with self._lock:
+            metadata = [
+                dict(name="thread_name", ph="M", pid=pid, tid=tid, args=dict(name=name))
+                for tid, name in self.thread_names.items()
+            ]
+            events = self.events[:]
+            dropped = self.dropped_events
+        return dict(
+            traceEvents=metadata + events,
+            displayTimeUnit="ms",
+            otherData=dict(dropped_events=dropped),
+        )
+
+    def write(self, path: Path):
+        "Write all recorded spans to `path` as a Chrome trace-event JSON file"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.to_chrome_trace()))
+        tmp.replace(path)
+
+    def print_summary(self, limit: int = 30):
+        "Print a table of the `limit` spans with the most total time spent to stderr"
+        from rich.table import Table
+        from .console import console
+
+        snapshot = self.snapshot()
+        if not snapshot:
+            return
+        show_memory = any(item["peak_memory"] is not None for item in snapshot)
+        table = Table(title="Spans by total time")
+        for col in ["Span", "Count", "Total", "Mean", "p50", "p95", "Max"] + (["Peak mem"] if show_memory else []):
+            table.add_column(col, justify="left" if col == "Span" else "right")
+        for item in snapshot[:limit]:
+            row = [
+                item["name"],
+                str(item["count"]),
+                f"{item['total_time']:.3f}s",
+                f"{item['mean_time'] * 1000:.1f}ms",
+                f"{item['p50'] * 1000:.1f}ms",
+                f"{item['p95'] * 1000:.1f}ms",
+                f"{item['max_time'] * 1000:.1f}ms",
+            ]
+            if show_memory:
+                peak = item["peak_memory"]
+                row.append(f"{peak / 1024 / 1024:.1f}MiB" if peak is not None else "")
+            table.add_row(*row)
+        console().print(table)
+
+
+profiler = Profiler()
+
+
+def span(name: str | None = None, **args) -> Span:
+    "Create a new span in the global `profiler`. See `Profiler.span`"
+    return profiler.span(name, **args)
+
+
+def current_span() -> str | None:
+    "The name of the innermost span open in this thread / task, if any"
+    stack = _span_stack.get()
+    return stack[-1].name if stack else None
+
+
+class ProfileMode(str, Enum):
+    cprofile = "cprofile"
+    sample = "sample"
+
+
+class StackSampler:
+    """
+    A sampling profiler for all threads in the process.
+
+    A background thread wakes up every `interval` seconds and records the current stack of every other thread.
+    Stacks are kept as counts in the collapsed-stack format used by flamegraph.pl, speedscope, etc.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="uoft-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                f = frame
+                while f is not None:
+                    code = f.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    f = f.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def to_collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    """
+    Profile the rest of this process, and write the results to `output_dir` when stopped.
+
+    Files written, all named `<name>-<timestamp>-<pid>.<ext>`:
+
+    - `.pstats`: cProfile stats for the thread which started the session (mode `cprofile` only),
+      for use with `python -m pstats`, snakeviz, etc.
+    - `.collapsed`: sampled stacks of all threads, in collapsed-stack format, for use with flamegraph.pl or speedscope
+    - `.trace.json`: all spans recorded by the global `profiler`, with per-span peak memory if `memory` is set
+    """
+
+    def __init__(self, mode: ProfileMode, output_dir: Path, name: str = "profile", memory: bool = False) -> None:
+        self.mode = ProfileMode(mode)
+        self.memory = memory
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.output_stem = Path(output_dir) / f"{name}-{stamp}-{os.getpid()}"
+        self.sampler = StackSampler()
+        self._cprofile = None
+        self.running = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.sampler.start()
+        if self.mode == ProfileMode.cprofile:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self.running = True
+
+    def stop(self) -> list[Path]:
+        if not self.running:
+            return []
+        self.running = False
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.sampler.stop()
+
+        self.output_stem.parent.mkdir(parents=True, exist_ok=True)
+        written = []
+        if self._cprofile is not None:
+            pstats_file = self.output_stem.with_suffix(".pstats")
+            self._cprofile.dump_stats(pstats_file)
+            written.append(pstats_file)
+        collapsed_file = self.output_stem.with_suffix(".collapsed")
+        collapsed_file.write_text(self.sampler.to_collapsed())
+        written.append(collapsed_file)
+        trace_file = self.output_stem.with_suffix(".trace.json")
+        profiler.write(trace_file)
+        written.append(trace_file)
+        if self.memory:
+            logger.info(f"Peak traced memory: {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f}MiB")
+            tracemalloc.stop()
+        for file in written:
+            logger.info(f"Wrote profiling data to {file}")
+        return written
+
+
+def start_profiling(
+    mode: ProfileMode, output_dir: Path, name: str = "profile", memory: bool = False
+) -> ProfileSession:
+    "Start a `ProfileSession` which runs until the process exits"
+    session = ProfileSession(mode, output_dir, name=name, memory=memory)
+    session.start()
+    atexit.register(session.stop)
+    return session
+
+
+def _report_at_exit():
+    target = os.environ.get("UOFT_TRACE", "")
+    if target.lower() in ("", "0", "false", "no"):
+        return
+    if target.lower() in ("1", "true", "yes"):
+        profiler.print_summary()
+    else:
+        profiler.write(Path(target))
+
+
+atexit.register(_report_at_exit)
@@ -0,0 +1,312 @@
+"""
+A longest-prefix-match radix tree for IPv4 and IPv6 prefixes.
+
+`RadixTree` maps prefixes to arbitrary values, like a dict, and answers the questions our sync and reporting code
+keeps asking of lists of networks, without scanning them:
+
+```python
+from uoft_core.radix import RadixTree
+
+tree = RadixTree()
+tree["10.0.0.0/8"] = "campus"
+tree["10.1.0.0/16"] = "building"
+tree.longest_match("10.1.2.3")      # (CompactIPNetwork('10.1.0.0/16'), 'building')
+list(tree.covering("10.1.2.0/24"))  # every entry containing 10.1.2.0/24, least specific first
+list(tree.covered("10.0.0.0/8"))    # every entry within 10.0.0.0/8, in sorted order
+```
+
+Prefixes can be given as strings, `uoft_core.types` compact or netaddr networks / addresses, or stdlib `ipaddress`
+networks / addresses. Addresses are treated as host prefixes (/32 or /128). Host bits are ignored, so
+`10.0.0.5/24` and `10.0.0.0/24` are the same key. Keys are always returned as `CompactIPNetwork`s.
+
+The tree is path-compressed (a Patricia tree), so each lookup visits at most one node per distinct prefix length on
+the path to the answer, and never more than 33 / 129 nodes.
+"""
+
+import ipaddress
+from typing import Any, Generic, Iterable, Iterator, TypeVar
+
+from ._vendor.netaddr import IPAddress as IPAddressBase, IPNetwork as IPNetworkBase
+from .types import CompactIPAddress, CompactIPNetwork
+
+V = TypeVar("V")
+
+_WIDTHS = {4: 32, 6: 128}
+_MISSING: Any = object()
+
+
+class _Node:
+    __slots__ = ("key", "left", "prefixlen", "right", "value")
+
+    def __init__(self, key: int, prefixlen: int, value: Any = _MISSING) -> None:
+        self.key = key
+        self.prefixlen = prefixlen
+        # nodes holding _MISSING are glue nodes, which only exist to join two branches
+        self.value = value
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+
+
+def _to_prefix(prefix: Any) -> tuple[int, int, int]:
+    "Normalize any supported prefix type to (version, network address, prefixlen)"
+    if isinstance(prefix, str):
+        prefix = CompactIPNetwork(prefix)
+    if isinstance(prefix, CompactIPNetwork):
+        return prefix.version, prefix.first, prefix.prefixlen
+    if isinstance(prefix, CompactIPAddress):
+        return prefix.version, prefix.value, _WIDTHS[prefix.version]
+    if isinstance(prefix, IPNetworkBase):
+        version, prefixlen = prefix._module.version, prefix._prefixlen
+        shift = _WIDTHS[version] - prefixlen
+        return version, prefix._value >> shift << shift, prefixlen
+    if isinstance(prefix, IPAddressBase):
+        return prefix._module.version, prefix._value, prefix._module.width
+    if isinstance(prefix, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        return prefix.version, int(prefix.network_address), prefix.prefixlen
+    if isinstance(prefix, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+        return prefix.version, int(prefix), prefix.max_prefixlen
+    raise TypeError(f"Cannot use {prefix!r} as an IP prefix")
+
+
+class RadixTree(Generic[V]):
+    "A mapping of IPv4 and IPv6 prefixes to values, with longest-prefix-match and containment queries"
+
+    def __init__(self, items: "Iterable[tuple[Any, V]] | None" = None) -> None:
+        # one tree per IP version. each root is the /0 prefix, which only holds a value if /0 is inserted
+        self._roots = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self._len = 0
+        if items is not None:
+            self.update(items)
+
+    @classmethod
+    def from_sorted(cls, items: "Iterable[tuple[Any, V]]") -> "RadixTree[V]":
+        """
+        Build a tree from (prefix, value) pairs sorted by (version, network address, prefixlen), the order that
+        `sorted()` puts `CompactIPNetwork`s and netaddr networks in. Works for input in any order, but sorted input
+        is built in amortized constant time per prefix.
+        """
+        tree = cls()
+        tree.update(items)
+        return tree
+
+    def update(self, items: "Iterable[tuple[Any, V]]"):
+        "Insert many (prefix, value) pairs. Consecutive prefixes which are close together are inserted fastest"
+        paths = {4: [self._roots[4]], 6: [self._roots[6]]}
+        for prefix, value in items:
+            version, key, prefixlen = _to_prefix(prefix)
+            self._insert(paths[version], _WIDTHS[version], key, prefixlen, value)
+
+    def _insert(self, path: list[_Node], width: int, key: int, prefixlen: int, value: Any):
+        """
+        Insert below the deepest node in `path` which covers the new prefix. `path` is a list of nodes from the root
+        down, and is updated to end at the inserted node, so that it can be reused as a starting point for the next
+        insert. Since the root covers everything, it never gets popped off.
+        """
+        while True:
+            node = path[-1]
+            if node.prefixlen <= prefixlen and (key ^ node.key) >> (width - node.prefixlen) == 0:
+                break
+            path.pop()
+
+        while True:
+            if node.prefixlen == prefixlen:
+                if node.value is _MISSING:
+                    self._len += 1
+                node.value = value
+                return
+            right = (key >> (width - 1 - node.prefixlen)) & 1
+            child = node.right if right else node.left
+            if child is None:
+                new = _Node(key, prefixlen, value)
+                self._len += 1
+                self._set_child(node, right, new)
+                path.append(new)
+                return
+            maxlen = min(child.prefixlen, prefixlen)
+            common = maxlen - ((child.key ^ key) >> (width - maxlen)).bit_length()
+            if common == child.prefixlen:
+                # child covers the new prefix, keep going down
+                path.append(child)
+                node = child
+                continue
+            new = _Node(key, prefixlen, value)
+            self._len += 1
+            if common == prefixlen:
+                # the new prefix goes between node and child
+                self._set_child(new, (child.key >> (width - 1 - prefixlen)) & 1, child)
+                self._set_child(node, right, new)
+                path.append(new)
+                return
+            # the new prefix and child diverge below node, join them with a glue node
+            shift = width - common
+            glue = _Node(key >> shift << shift, common)
+            child_right = (child.key >> (width - 1 - common)) & 1
+            self._set_child(glue, child_right, child)
+            self._set_child(glue, 1 - child_right, new)
+            self._set_child(node, right, glue)
+            path.append(glue)
+            path.append(new)
+            return
+
+    @staticmethod
+    def _set_child(node: _Node, right: int, child: "_Node | None"):
+        if right:
+            node.right = child
+        else:
+            node.left = child
+
+    def _walk(self, version: int, key: int, prefixlen: int) -> Iterator[_Node]:
+        "Yield every node on the path from the root towards the given prefix which covers it, root first"
+        width = _WIDTHS[version]
+        node = self._roots[version]
+        while node is not None:
+            if node.prefixlen > prefixlen or (key ^ node.key) >> (width - node.prefixlen):
+                return
+            yield node
+            if node.prefixlen == prefixlen:
+                return
+            node = node.right if (key >> (width - 1 - node.prefixlen)) & 1 else node.left
+
+    def _find(self, prefix: Any) -> "_Node | None":
+        version, key, prefixlen = _to_prefix(prefix)
+        for node in self._walk(version, key, prefixlen):
+            if node.prefixlen == prefixlen and node.value is not _MISSING:
+                return node
+        return None
+
+    @staticmethod
+    def _key(version: int, node: _Node) -> CompactIPNetwork:
+        return CompactIPNetwork._make(node.key, node.prefixlen, version)
+
+    def __setitem__(self, prefix: Any, value: V):
+        version, key, prefixlen = _to_prefix(prefix)
+        self._insert([self._roots[version]], _WIDTHS[version], key, prefixlen, value)
+
+    def __getitem__(self, prefix: Any) -> V:
+        node = self._find(prefix)
+        if node is None:
+            raise KeyError(prefix)
+        return node.value
+
+    def get(self, prefix: Any, default: Any = None) -> "V | Any":
+        node = self._find(prefix)
+        return default if node is None else node.value
+
+    def __contains__(self, prefix: Any) -> bool:
+        return self._find(prefix) is not None
+
+    def __delitem__(self, prefix: Any):
+        version, key, prefixlen = _to_prefix(prefix)
+        path = list(self._walk(version, key, prefixlen))
+        node = path[-1] if path else None
+        if node is None or node.prefixlen != prefixlen or node.value is _MISSING:
+            raise KeyError(prefix)
+        node.value = _MISSING
+        self._len -= 1
+        if len(path) == 1:
+            return  # the root stays, as a glue node
+        parent = path[-2]
+        children = [c for c in (node.left, node.right) if c is not None]
+        if len(children) == 2:
+            return  # still needed as a glue node
+        replacement = children[0] if children else None
+        self._set_child(parent, parent.right is node, replacement)
+        if replacement is None and parent.value is _MISSING and len(path) > 2:
+            # parent was a glue node joining node and one other branch, so it isn't needed anymore
+            grandparent = path[-3]
+            self._set_child(grandparent, grandparent.right is parent, parent.left or parent.right)
+
+    def pop(self, prefix: Any, default: Any = _MISSING) -> "V | Any":
+        node = self._find(prefix)
+        if node is None:
+            if default is _MISSING:
+                raise KeyError(prefix)
+            return default
+        value = node.value
+        del self[prefix]
+        return value
+
+    def longest_match(self, prefix: Any) -> "tuple[CompactIPNetwork, V] | None":
+        "The most specific entry which contains (or equals) `prefix`, as a (key, value) pair, or None"
+        version, key, prefixlen = _to_prefix(prefix)
+        best = None
+        for node in self._walk(version, key, prefixlen):
+            if node.value is not _MISSING:
+                best = node
+        if best is None:
+            return None
+        return self._key(version, best), best.value
+
+    def covering(self, prefix: Any) -> "Iterator[tuple[CompactIPNetwork, V]]":
+        "Every entry which contains (or equals) `prefix`, least specific first"
+        version, key, prefixlen = _to_prefix(prefix)
+        for node in self._walk(version, key, prefixlen):
+            if node.value is not _MISSING:
+                yield self._key(version, node), node.value
+
+    def covered(self, prefix: Any) -> "Iterator[tuple[CompactIPNetwork, V]]":
+        "Every entry contained in (or equal to) `prefix`, in sorted order"
+        version, key, prefixlen = _to_prefix(prefix)
+        width = _WIDTHS[version]
+        node = self._roots[version]
+        # find the topmost node inside prefix
+        while node is not None and node.prefixlen < prefixlen:
+            if (key ^ node.key) >> (width - node.prefixlen):
+                return
+            node = node.right if (key >> (width - 1 - node.prefixlen)) & 1 else node.left
+        if node is None or (key ^ node.key) >> (width - prefixlen):
+            return
+        yield from self._iter_from(version, node)
+
+    def _iter_from(self, version: int, top: _Node) -> "Iterator[tuple[CompactIPNetwork, V]]":
+        for node in self._iter_nodes(top):
+            yield self._key(version, node), node.value
+
+    @staticmethod
+    def _iter_nodes(top: _Node) -> Iterator[_Node]:
+        "All non-glue nodes under (and including) `top`, in sorted order"
+        # a pre-order traversal, left first
+        stack = [top]
+        while stack:
+            node = stack.pop()
+            if node.value is not _MISSING:
+                yield node
+            if node.right is not None:
+                stack.append(node.right)
+            if node.left is not None:
+                stack.append(node.left)
+
+    def items(self) -> "Iterator[tuple[CompactIPNetwork, V]]":
+        "All (key, value) pairs, IPv4 before IPv6, in sorted order"
+        for version, root in self._roots.items():
+            yield from self._iter_from(version, root)
+
+    def keys(self) -> Iterator[CompactIPNetwork]:
+        return (k for k, _ in self.items())
+
+    def values(self) -> Iterator[V]:
+        return (v for _, v in self.items())
+
+    def __iter__(self) -> Iterator[CompactIPNetwork]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({len(self)} prefixes)"
+
+    # the node graph can be far deeper than pickle's recursion limit allows, so pickle a flat, sorted list of entries
+    # instead, which can be rebuilt in a single pass
+    def __getstate__(self):
+        return [
+            (version, node.key, node.prefixlen, node.value)
+            for version, root in self._roots.items()
+            for node in self._iter_nodes(root)
+        ]
+
+    def __setstate__(self, state):
+        self.__init__()
+        paths = {4: [self._roots[4]], 6: [self._roots[6]]}
+        for version, key, prefixlen, value in state:
+            self._insert(paths[version], _WIDTHS[version], key, prefixlen, value)
@@ -0,0 +1,246 @@
+"""
+A local agent which holds decrypted secrets in memory, so that they don't need to be decrypted on every command run.
+
+Loading settings for a uoft command runs `pass show ...` for each settings source and `ref[pass:...]` field,
+and `bw get ...` for each `ref[bw:...]` field, and each of those costs a GPG decryption or a vault unlock.
+When the agent is running, `PassPath` and `bitwarden_get` ask it for a secret first, and hand it every
+secret they had to decrypt themselves, so repeated commands skip the decryption entirely until the secret expires.
+
+The agent is entirely optional. If it isn't running, secrets are fetched exactly as they were before.
+
+Start it with `uoft agent start` (or `python -m uoft_core.secrets_agent` to run it in the foreground).
+It listens on a Unix socket in a directory only the current user can access
+(`$XDG_RUNTIME_DIR/uoft-tools-<uid>/agent.sock` by default, or the path in `UOFT_AGENT_SOCKET`),
+and refuses connections from any other user. Clients likewise refuse to talk to a socket in a directory which
+isn't private to them, or to an agent running as another user. Secrets are never written to disk.
+Set `UOFT_AGENT=0` to stop commands from talking to a running agent.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from tempfile import gettempdir
+from typing import Any
+
+from . import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+
+_supported = hasattr(socket, "AF_UNIX") and hasattr(os, "getuid")
+
+
+def socket_path() -> Path:
+    if custom := os.environ.get("UOFT_AGENT_SOCKET"):
+        return Path(custom)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or gettempdir()
+    return Path(runtime_dir, f"uoft-tools-{os.getuid()}", "agent.sock")
+
+
+def _enabled() -> bool:
+    return _supported and os.environ.get("UOFT_AGENT", "").lower() not in ("0", "false", "no")
+
+
+def _peer_uid(conn: socket.socket) -> int | None:
+    "The uid of the process on the other end of a Unix socket, or None if this platform can't tell"
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+def _is_private_dir(path: Path) -> bool:
+    "Whether `path` is a real directory (not a symlink), owned by the current user, and accessible only to them"
+    try:
+        st = path.lstat()
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and stat.S_IMODE(st.st_mode) == 0o700
+
+
+# region client
+def _request(msg: dict[str, Any]) -> dict[str, Any] | None:
+    "Send a message to the agent and return its reply, or None if the agent isn't running"
+    if not _enabled():
+        return None
+    path = socket_path()
+    # the socket directory may be in a shared location like /tmp, where another user could have created it first
+    # and be listening in our place. secrets only go to an agent in a private directory, running as us
+    if not _is_private_dir(path.parent):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(2)
+            s.connect(str(path))
+            if (uid := _peer_uid(s)) is not None and uid != os.getuid():
+                logger.warning(f"Refusing to talk to a secrets agent on {path} running as another user (uid {uid})")
+                return None
+            s.sendall(json.dumps(msg).encode() + b"\n")
+            reply = s.makefile("rb").readline()
+        return json.loads(reply)
+    except (OSError, ValueError):
+        return None
+
+
+def get(key: str) -> str | None:
+    "Fetch a secret from the agent. Returns None if the agent isn't running or doesn't have the secret"
+    res = _request({"op": "get", "key": key})
+    if res and res.get("found"):
+        logger.debug(f"Loaded {key} from secrets agent")
+        return res["value"]
+    return None
+
+
+def put(key: str, value: str) -> bool:
+    "Hand a secret to the agent. Returns False if the agent isn't running"
+    return bool(_request({"op": "put", "key": key, "value": value}))
+
+
+def clear() -> bool:
+    "Make the agent forget all secrets. Returns False if the agent isn't running"
+    return bool(_request({"op": "clear"}))
+
+
+def status() -> dict[str, Any] | None:
+    "Returns a dict of the agent's pid, ttl and number of cached secrets, or None if the agent isn't running"
+    return _request({"op": "status"})
+
+
+def stop() -> bool:
+    "Shut down the agent. Returns False if the agent isn't running"
+    return bool(_request({"op": "stop"}))
+
+
+def start_background(ttl: float = DEFAULT_TTL, timeout: float = 5) -> dict[str, Any]:
+    "Start the agent in a detached background process, and wait for it to come up"
+    if (res := status()) is not None:
+        return res
+    subprocess.Popen(
+        [sys.executable, "-m", "uoft_core.secrets_agent", "--ttl", str(ttl)],
+        start_new_session=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (res := status()) is not None:
+            return res
+        time.sleep(0.05)
+    raise TimeoutError(f"Secrets agent did not start listening on {socket_path()} within {timeout}s")
+
+
+# endregion client
+# region server
+class _Handler(socketserver.StreamRequestHandler):
+    server: "SecretsAgent"
+
+    def handle(self):
+        if not self.server.peer_allowed(self.request):
+            logger.warning("Refusing secrets agent connection from another user")
+            return
+        for line in self.rfile:
+            try:
+                reply = self.server.dispatch(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {"error": repr(e)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class SecretsAgent(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    The agent server. Secrets are kept in a dict in memory, and expire `ttl` seconds after they were handed over.
+
+    Args:
+        path: where to create the Unix socket. Its parent directory is created (or restricted) with mode 0700.
+        ttl: number of seconds to keep each secret for.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, ttl: float = DEFAULT_TTL) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self.secrets: dict[str, tuple[float, str]] = {}
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # mkdir's mode doesn't apply to a directory that already exists
+        self.path.parent.chmod(0o700)
+        if not _is_private_dir(self.path.parent):
+            raise PermissionError(f"{self.path.parent} must be a directory owned by the current user")
+        # a socket file left behind by an agent that didn't shut down cleanly
+        self.path.unlink(missing_ok=True)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(str(self.path), _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def peer_allowed(self, conn: socket.socket) -> bool:
+        "Only allow connections from processes running as the same user as the agent"
+        uid = _peer_uid(conn)
+        # if there's no way to check on this platform, the directory permissions still apply
+        return uid is None or uid == os.getuid()
+
+    def dispatch(self, msg: dict[str, Any]) -> dict[str, Any]:
+        op = msg["op"]
+        now = time.monotonic()
+        with self.lock:
+            if op == "get":
+                entry = self.secrets.get(msg["key"])
+                if entry is None or entry[0] < now:
+                    self.secrets.pop(msg["key"], None)
+                    return {"found": False}
+                return {"found": True, "value": entry[1]}
+            if op == "put":
+                self.secrets[msg["key"]] = (now + self.ttl, str(msg["value"]))
+                return {"ok": True}
+            if op == "clear":
+                self.secrets.clear()
+                return {"ok": True}
+            if op == "status":
+                live = sum(1 for expiry, _ in self.secrets.values() if expiry >= now)
+                return {"pid": os.getpid(), "ttl": self.ttl, "entries": live, "socket": str(self.path)}
+            if op == "stop":
+                # shutdown() blocks until serve_forever() returns, so it can't be called from a handler thread directly
+                threading.Thread(target=self.shutdown).start()
+                return {"ok": True}
+        raise ValueError(f"Unknown operation: {op}")
+
+    def server_close(self):
+        super().server_close()
+        self.path.unlink(missing_ok=True)
+
+
+def serve(ttl: float = DEFAULT_TTL, path: Path | None = None):
+    "Run the agent in the foreground until it's stopped"
+    agent = SecretsAgent(path or socket_path(), ttl)
+    logger.info(f"Secrets agent listening on {agent.path}")
+    try:
+        agent.serve_forever()
+    finally:
+        agent.server_close()
+
+
+# endregion server
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the uoft secrets agent in the foreground")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="seconds to keep each secret for")
+    args = parser.parse_args()
+    try:
+        serve(args.ttl)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,516 @@
+"""
+Micro-benchmarks for uoft_core's hot paths.
+
+These aren't collected by pytest. Run them with:
+
+    python -m uoft_core.tests.benchmarks [name ...]
+
+With no names, every benchmark is run. Each benchmark prints the best-of-N time per call for each implementation
+it compares, so that the relative numbers can be compared across machines.
+"""
+
+import re
+import sys
+import timeit
+from typing import Callable
+
+from uoft_core import txt
+
+BENCHMARKS: dict[str, Callable[[], None]] = {}
+
+
+def benchmark(func: Callable[[], None]):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def report(title: str, cases: dict[str, Callable[[], object]], repeat: int = 5):
+    "Time each case, and print the best time per call along with its speedup relative to the first case"
+    print(title)
+    baseline = None
+    for name, case in cases.items():
+        # auto-scale the number of calls per measurement so that each measurement takes ~0.2s
+        number, _ = timeit.Timer(case).autorange()
+        best = min(timeit.repeat(case, number=number, repeat=repeat)) / number
+        baseline = baseline or best
+        print(f"  {name:<24} {best * 1000:>10.3f}ms  {baseline / best:>6.1f}x")
+
+
+# region yaml
+def _yaml_doc(n: int = 200) -> str:
+    "A config-style document with comments, anchors, merges and a mix of scalar types"
+    header = txt(
+        """
+        # shared defaults
+        defaults: &defaults
+            enabled: true # eol comment
+            vlan: 100
+            mtu: 9000
+            updated: 2024-01-01
+        devices:
+        """
+    )
+    device = txt(
+        """
+            - name: sw-{i}.example.com
+              <<: *defaults
+              ip: 10.0.{i}.1
+              ports: [1, 2, 3, 4]
+              description: |
+                  a long description
+                  spanning lines
+        """
+    )
+    return header + "".join(device.format(i=i) for i in range(n))
+
+
+@benchmark
+def yaml_loads():
+    from uoft_core import yaml
+    from uoft_core.yaml import plain
+
+    doc = _yaml_doc()
+    cases = {
+        "round-trip": lambda: yaml.loads(doc),
+        "plain (pure python)": lambda: plain.load(doc, pure=True),
+    }
+    if plain.libyaml_available:
+        cases["plain (libyaml)"] = lambda: plain.load(doc)
+    report(f"yaml.loads, {len(doc) // 1024}KiB document", cases)
+
+
+# endregion yaml
+# region toml
+def _toml_small() -> str:
+    "A typical uoft-tools config file"
+    return txt(
+        """
+        # shared settings
+        [nautobot]
+        url = "https://nautobot.example.com"
+        token = "ref[pass:nautobot/token]"
+        verify_ssl = true
+        timeout = 30
+
+        [switchconfig]
+        templates_dir = "~/templates"
+        default_vlan = 100
+        console_servers = ["cs1.example.com", "cs2.example.com"]
+        """
+    )
+
+
+def _toml_table_array(n: int = 2000) -> str:
+    "A long array of tables, like an inventory export"
+    entry = txt(
+        """
+        [[devices]]
+        name = "sw-{i}.example.com"
+        ip = "10.0.{i}.1"
+        vlan = {i}
+        enabled = true
+        ports = [1, 2, 3, 4, 5, 6, 7, 8]
+        description = "access switch {i} in building \\"{i}\\""
+
+        """
+    )
+    return "".join(entry.format(i=i) for i in range(n))
+
+
+def _toml_nested(depth: int = 40, width: int = 50) -> str:
+    "Deeply nested tables, addressed with long dotted keys"
+    lines = []
+    for d in range(1, depth + 1):
+        path = ".".join(f"level_{n}" for n in range(d))
+        lines.append(f"[{path}]")
+        lines.extend(f"key_{w} = {w}" for w in range(width))
+    return "\n".join(lines) + "\n"
+
+
+@benchmark
+def toml_loads():
+    from uoft_core import toml
+
+    cases = {"uoft_core.toml": toml.loads}
+    try:
+        import tomllib
+
+        cases["tomllib (stdlib)"] = tomllib.loads
+    except ImportError:
+        pass
+    for title, doc in [
+        ("small config", _toml_small()),
+        ("large table array", _toml_table_array()),
+        ("deeply nested tables", _toml_nested()),
+    ]:
+        assert all(parse(doc) == toml.loads(doc) for parse in cases.values())
+        report(
+            f"toml.loads, {title} ({len(doc) // 1024}KiB)",
+            {name: lambda parse=parse, doc=doc: parse(doc) for name, parse in cases.items()},
+        )
+
+
+# endregion toml
+# region nested_data
+def _graphql_payload(n: int = 50_000) -> dict:
+    "A Nautobot GraphQL-style response, with 20 leaves per device (1M leaves by default)"
+    return {
+        "data": {
+            "devices": [
+                {
+                    "name": f"sw-{i}.example.com",
+                    "serial": f"FOC{i:08}",
+                    "primary_ip4": {"address": f"10.0.{i % 256}.1/24"},
+                    "location": {"name": f"building {i % 100}", "parent": {"name": "campus"}},
+                    "interfaces": [
+                        {"name": f"Gi1/0/{p}", "enabled": True, "untagged_vlan": {"vid": 100 + p}}
+                        for p in range(5)
+                    ],
+                }
+                for i in range(n)
+            ]
+        }
+    }
+
+
+def _unstructure_recursive(data):
+    "The recursive implementation NestedData.unstructure used to have, for comparison"
+    if isinstance(data, (list, dict)):
+        items = (
+            ((f"[{i}]", v) for i, v in enumerate(data))
+            if isinstance(data, list)
+            else (((f'"{k}"' if " " in k else k), v) for k, v in data.items())
+        )
+        for keyname, item in items:
+            for keypath, value in _unstructure_recursive(item):
+                yield (f"{keyname}.{keypath}" if keypath else keyname), value
+    else:
+        yield "", data
+
+
+def _restructure_recursive(data):
+    "The group-by-first-segment-and-recurse implementation NestedData.restructure used to have, for comparison"
+    groups: dict = {}
+    for keypath, value in data:
+        key, _, keypath = keypath.partition(".")
+        groups.setdefault(key, []).append((keypath, value))
+    if len(groups) == 1 and "" in groups:
+        return groups[""][0][1]
+    if all(k.startswith("[") and k.endswith("]") and k[1:-1].isdecimal() for k in groups):
+        return [_restructure_recursive(v) for v in groups.values()]
+    return {k: _restructure_recursive(v) for k, v in groups.items()}
+
+
+@benchmark
+def nested_data():
+    from uoft_core.nested_data import NestedData
+
+    payload = _graphql_payload()
+    flat = list(NestedData.unstructure(payload))
+    assert flat == list(_unstructure_recursive(payload))
+    assert NestedData.restructure(flat) == _restructure_recursive(flat) == payload
+    report(
+        f"NestedData.restructure, {len(flat):,} leaves",
+        {"recursive": lambda: _restructure_recursive(flat), "trie": lambda: NestedData.restructure(flat)},
+        repeat=3,
+    )
+    report(
+        f"NestedData.unstructure, {len(flat):,} leaves",
+        {
+            "recursive": lambda: list(_unstructure_recursive(payload)),
+            "iterative": lambda: list(NestedData.unstructure(payload)),
+        },
+        repeat=3,
+    )
+
+
+def _remap_per_rule(data, key_map):
+    "The rule-by-rule implementation NestedData.remap used to have, for comparison"
+    from uoft_core.nested_data import NestedData
+
+    result = list(data)
+    for from_key, to_key in key_map:
+        from_key, to_key = NestedData._compile_keys_if_needed(from_key, to_key)
+        for index, (key, value) in enumerate(result):
+            if isinstance(from_key, str):
+                result[index] = key.replace(from_key, to_key), value
+            else:
+                result[index] = re.sub(from_key, to_key, key), value
+    return result
+
+
+@benchmark
+def nested_data_rules():
+    from uoft_core.nested_data import KeyFilter, KeyMap, NestedData
+
+    # an inventory of small documents which all share the same shape, like one GraphQL result per device
+    docs = [list(NestedData.unstructure(_graphql_payload(10))) for _ in range(200)]
+    key_map = [
+        ("data.devices.", ""),
+        ("primary_ip4.address", "ip"),
+        ("location.parent.name", "campus"),
+        ("location.name", "building"),
+        ("interfaces.[*].untagged_vlan.vid", "interfaces.[*].vlan"),
+        *((f"interfaces.[{p}].name", f"interfaces.[{p}].port") for p in range(5)),
+        ("*.enabled", "*.up"),
+    ]
+    filters = ["name", "ip", "interfaces.*.vlan", "*.building"]
+    compiled_map, compiled_filter = KeyMap(key_map), KeyFilter(filters)
+    assert all(_remap_per_rule(doc, key_map) == compiled_map(doc) for doc in docs)
+
+    leaves = sum(len(doc) for doc in docs)
+    report(
+        f"NestedData.remap, {len(docs)} documents, {len(key_map)} rules, {leaves:,} leaves",
+        {
+            "rule by rule": lambda: [_remap_per_rule(doc, key_map) for doc in docs],
+            "KeyMap per call": lambda: [NestedData.remap(doc, key_map) for doc in docs],
+            "shared KeyMap": lambda: [NestedData.remap(doc, compiled_map) for doc in docs],
+        },
+    )
+    report(
+        f"NestedData.filter_, {len(docs)} documents, {len(filters)} patterns, {leaves:,} leaves",
+        {
+            "KeyFilter per call": lambda: [list(NestedData.filter_(doc, filters)) for doc in docs],
+            "shared KeyFilter": lambda: [list(NestedData.filter_(doc, compiled_filter)) for doc in docs],
+        },
+    )
+
+
+# endregion nested_data
+
+
+# region ip types
+def _ip_strings(n: int = 100_000) -> list[str]:
+    "n distinct prefixes, about a tenth of them IPv6, like the subnets and addresses in a sync dataset"
+    v4 = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}/{24 + i % 9}" for i in range(n - n // 10)]
+    v6 = [f"2001:db8:{i >> 16 & 0xFFFF:x}:{i & 0xFFFF:x}::1/64" for i in range(n // 10)]
+    return v4 + v6
+
+
+def _traced_size(build: Callable[[], list]) -> int:
+    "Bytes of memory allocated by `build` and still held by its result"
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+@benchmark
+def ip_types():
+    from uoft_core.types import CompactIPNetwork, IPNetwork
+
+    strings = _ip_strings()
+    netaddr_nets = [IPNetwork(s) for s in strings]
+    compact_nets = [CompactIPNetwork(s) for s in strings]
+    assert [str(n) for n in netaddr_nets] == [str(n) for n in compact_nets]
+    assert sorted(compact_nets) == [CompactIPNetwork(n) for n in sorted(netaddr_nets)]
+
+    def parse_distinct():
+        CompactIPNetwork._parse.cache_clear()
+        return [CompactIPNetwork(s) for s in strings]
+
+    # validation is what a pydantic model does with each field value
+    (netaddr_validator,) = IPNetwork.__get_validators__()
+    (compact_validator,) = CompactIPNetwork.__get_validators__()
+    report(
+        f"parse {len(strings):,} distinct prefixes",
+        {"IPNetwork": lambda: [IPNetwork(s) for s in strings], "CompactIPNetwork": parse_distinct},
+        repeat=3,
+    )
+    report(
+        f"re-parse {len(strings):,} prefixes (interned)",
+        {
+            "IPNetwork": lambda: [netaddr_validator(s) for s in strings],
+            "CompactIPNetwork": lambda: [compact_validator(s) for s in strings],
+        },
+        repeat=3,
+    )
+    report(
+        f"convert {len(strings):,} netaddr prefixes",
+        {
+            "IPNetwork": lambda: [netaddr_validator(n) for n in netaddr_nets],
+            "CompactIPNetwork": lambda: [compact_validator(n) for n in netaddr_nets],
+        },
+        repeat=3,
+    )
+    outer_netaddr, outer_compact = IPNetwork("10.0.0.0/12"), CompactIPNetwork("10.0.0.0/12")
+    report(
+        f"containment test x {len(strings):,}",
+        {
+            "IPNetwork": lambda: [n in outer_netaddr for n in netaddr_nets],
+            "CompactIPNetwork": lambda: [n in outer_compact for n in compact_nets],
+        },
+        repeat=3,
+    )
+    report(
+        f"sort {len(strings):,} prefixes",
+        {"IPNetwork": lambda: sorted(netaddr_nets), "CompactIPNetwork": lambda: sorted(compact_nets)},
+        repeat=3,
+    )
+
+    CompactIPNetwork._parse.cache_clear()
+    netaddr_size = _traced_size(lambda: [IPNetwork(s) for s in strings])
+    compact_size = _traced_size(lambda: [CompactIPNetwork._parse.__wrapped__(CompactIPNetwork, s) for s in strings])
+    print(f"memory for {len(strings):,} prefixes")
+    print(f"  {'IPNetwork':<24} {netaddr_size / len(strings):>10.0f}B each")
+    print(f"  {'CompactIPNetwork':<24} {compact_size / len(strings):>10.0f}B each")
+
+
+# endregion ip types
+
+
+# region radix
+def _routing_table(n: int = 1_000_000) -> list:
+    "n distinct, sorted IPv4 prefixes between /8 and /32, shaped roughly like a full routing table plus host routes"
+    import random
+
+    from uoft_core.types import CompactIPNetwork
+
+    rng = random.Random(0)
+    lengths = [8, 12, 16, 20, 22, 23, 24, 24, 24, 28, 30, 32]
+    prefixes = set()
+    while len(prefixes) < n:
+        prefixlen = rng.choice(lengths)
+        shift = 32 - prefixlen
+        prefixes.add(CompactIPNetwork._make(rng.getrandbits(32) >> shift << shift, prefixlen, 4))
+    return sorted(prefixes)
+
+
+@benchmark
+def radix():
+    import pickle
+    import random
+
+    from uoft_core.radix import RadixTree
+    from uoft_core.types import CompactIPAddress
+
+    prefixes = _routing_table()
+    items = [(p, i) for i, p in enumerate(prefixes)]
+    shuffled = items[:]
+    random.Random(0).shuffle(shuffled)
+    report(
+        f"build a tree of {len(items):,} prefixes",
+        {"shuffled": lambda: RadixTree(shuffled), "from_sorted": lambda: RadixTree.from_sorted(items)},
+        repeat=1,
+    )
+
+    tree = RadixTree.from_sorted(items)
+    rng = random.Random(1)
+    addresses = [CompactIPAddress._make(rng.getrandbits(32), 4) for _ in range(100_000)]
+    small, small_tree = prefixes[::1000], RadixTree.from_sorted((p, None) for p in prefixes[::1000])
+
+    def linear_scan(address):
+        "What our sync code does today: check every network, keep the most specific match"
+        best = None
+        for p in small:
+            if address in p and (best is None or p.prefixlen > best.prefixlen):
+                best = p
+        return best
+
+    sample = addresses[:1000]
+    assert [linear_scan(a) for a in sample] == [(m[0] if (m := small_tree.longest_match(a)) else None) for a in sample]
+    report(
+        f"longest-prefix match x {len(sample):,} against {len(small):,} prefixes",
+        {
+            "linear scan": lambda: [linear_scan(a) for a in sample],
+            "RadixTree": lambda: [small_tree.longest_match(a) for a in sample],
+        },
+        repeat=3,
+    )
+    report(
+        f"longest-prefix match x {len(addresses):,} against {len(tree):,} prefixes",
+        {"RadixTree": lambda: [tree.longest_match(a) for a in addresses]},
+        repeat=3,
+    )
+
+    data = pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"pickled tree of {len(tree):,} prefixes: {len(data) / 1024 / 1024:.1f}MiB")
+    report(
+        f"pickle round trip, {len(tree):,} prefixes",
+        {
+            "dumps": lambda: pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL),
+            "loads": lambda: pickle.loads(data),
+        },
+        repeat=1,
+    )
+
+
+# endregion radix
+# region jinja
+_SWITCH_TEMPLATE = """
+hostname {{ hostname }}
+// for vlan in vlans
+vlan {{ vlan.id }}
+ name {{ vlan.name | upper }}
+// endfor
+// for port in range(1, 49)
+interface GigabitEthernet1/0/{{ port }}
+ description {{ hostname }} port {{ port }}
+ // if port in trunks
+ switchport mode trunk
+ switchport trunk allowed vlan {{ vlans | map(attribute="id") | join(",") }}
+ // else
+ switchport access vlan {{ vlans[port % vlans | length].id }}
+ // endif
+// endfor
+"""
+
+
+@benchmark
+def jinja():
+    import os
+    import tempfile
+    from pathlib import Path
+
+    from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+    from uoft_core import jinja_library
+
+    opts = dict(
+        trim_blocks=True,
+        lstrip_blocks=True,
+        undefined=StrictUndefined,
+        line_statement_prefix="//",
+        line_comment_prefix="##",
+    )
+    data = {"vlans": [{"id": i, "name": f"vlan{i}"} for i in range(10, 20)], "trunks": [47, 48]}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["UOFT_CORE_USER_CACHE"] = tmp
+        templates = Path(tmp, "templates")
+        templates.mkdir()
+        templates.joinpath("switch.j2").write_text(_SWITCH_TEMPLATE)
+
+        def fresh_environment():
+            env = Environment(loader=FileSystemLoader(templates), **opts)
+            env.globals.update(data, hostname="sw1")
+            return env.get_template("switch.j2").render()
+
+        def shared_environment():
+            env = jinja_library.get_environment(templates, **opts)
+            return jinja_library.load_template(env, "switch.j2", dict(data, hostname="sw1")).render()
+
+        assert fresh_environment() == shared_environment()
+        report(
+            "render a switch config",
+            {"new Environment": fresh_environment, "get_environment": shared_environment},
+        )
+        print(f"  {jinja_library.cache_info()}")
+        jinja_library.cache_clear()
+
+
+# endregion jinja
+
+
+def main(names: list[str]):
+    for name in names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -92,6 +92,12 @@ importable_modules = [
     "uoft_core.types",
     "uoft_core.nested_data",
     "uoft_core.api",
+    "uoft_core.async_api",
+    "uoft_core.metrics",
+    "uoft_core.secrets_agent",
+    "uoft_core.completion",
+    "uoft_core.profiling",
+    "uoft_core.radix",
     "uoft_core.__main__",
     "uoft_core.toml._re",
     "uoft_core.toml._writer",
@@ -101,6 +107,7 @@ importable_modules = [
     "uoft_core.yaml.util",
     "uoft_core.yaml.comments",
     "uoft_core.yaml.main",
+    "uoft_core.yaml.plain",
     "uoft_core.yaml.serializer",
     "uoft_core.yaml.scanner",
     "uoft_core.yaml.io",
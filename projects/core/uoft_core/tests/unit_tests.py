@@ -124,6 +124,769 @@ def test_timeit():
     timer.stop()
 
 
+def test_spans(tmp_path: Path):
+    import json
+    import threading
+    from uoft_core.profiling import Profiler, SpanStats, current_span
+
+    profiler = Profiler()
+
+    @profiler.span()
+    def leaf(n):
+        assert current_span() == "test_spans.<locals>.leaf"
+        return n
+
+    with profiler.span("outer", device="sw1"):
+        with profiler.span("inner"):
+            for i in range(20):
+                leaf(i)
+        t = threading.Thread(target=leaf, args=(0,), name="worker")
+        t.start()
+        t.join()
+    assert current_span() is None
+
+    stats = {s["name"]: s for s in profiler.snapshot()}
+    assert stats["test_spans.<locals>.leaf"]["count"] == 21
+    assert stats["outer"]["count"] == 1
+    assert stats["outer"]["total_time"] >= stats["inner"]["total_time"]
+    leaf_stats = stats["test_spans.<locals>.leaf"]
+    assert leaf_stats["min_time"] <= leaf_stats["p50"] <= leaf_stats["p95"] <= leaf_stats["max_time"]
+
+    # quantiles come from a fixed-size histogram, so hot spans don't grow memory without bound
+    many = SpanStats()
+    for i in range(1, 100_001):
+        many.add(i / 1_000_000)  # 1us to 100ms
+    assert len(many.buckets) < 150
+    assert many.quantile(0.5) == pytest.approx(0.05, rel=0.1)
+    assert many.quantile(0.95) == pytest.approx(0.095, rel=0.1)
+    assert many.quantile(1) == many.max_time
+
+    trace_file = tmp_path / "trace.json"
+    profiler.write(trace_file)
+    trace = json.loads(trace_file.read_text())
+    events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert len(events) == 23
+    by_name = {e["name"]: e for e in events}
+    assert by_name["outer"]["args"] == {"device": "sw1"}
+    assert by_name["inner"]["args"] == {"parent": "outer"}
+    # a new thread starts with no parent span, in its own lane of the trace
+    worker_leaf = [e for e in events if e["name"].endswith("leaf") and e["tid"] != by_name["outer"]["tid"]]
+    assert len(worker_leaf) == 1 and "args" not in worker_leaf[0]
+    assert {"name": "worker"} in [e["args"] for e in trace["traceEvents"] if e["ph"] == "M"]
+
+    profiler.max_events = 23
+    with profiler.span("overflow"):
+        pass
+    assert profiler.dropped_events == 1
+    # spans past max_events are still aggregated, just not kept as trace events
+    assert "overflow" in {s["name"] for s in profiler.snapshot()}
+
+
+def test_profile_session(tmp_path: Path):
+    import json
+    import pstats
+    from uoft_core.profiling import ProfileSession, ProfileMode, profiler, span
+
+    def busy():
+        return sum(i * i for i in range(200_000))
+
+    profiler.clear()
+    session = ProfileSession(ProfileMode.cprofile, tmp_path, name="test", memory=True)
+    session.start()
+    with span("allocate"):
+        data = [bytes(1024) for _ in range(2000)]  # ~2MiB
+        del data
+        with span("compute"):
+            busy()
+    files = session.stop()
+    assert session.stop() == []  # stopping twice is harmless
+
+    assert {f.suffix for f in files} == {".pstats", ".collapsed", ".json"}
+    pstats_file = next(f for f in files if f.suffix == ".pstats")
+    stats = pstats.Stats(str(pstats_file))
+    assert any(func[2] == "busy" for func in stats.stats)  # pyright: ignore[reportAttributeAccessIssue]
+
+    trace = json.loads(next(f for f in files if f.suffix == ".json").read_text())
+    by_name = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert by_name["allocate"]["args"]["peak_memory"] >= 2_000_000
+    # the inner span's peak is folded into the outer span's
+    assert by_name["allocate"]["args"]["peak_memory"] >= by_name["compute"]["args"]["peak_memory"]
+    profiler.clear()
+
+
+def test_memoize(mocker: "MockerFixture"):
+    calls = []
+
+    @uoft_core.memoize
+    def unbounded(x):
+        calls.append(x)
+        return x * 2
+
+    assert unbounded(1) == 2
+    assert unbounded(1) == 2
+    assert calls == [1]
+    assert unbounded.cache_info() == uoft_core.CacheInfo(
+        hits=1, misses=1, evictions=0, maxsize=None, ttl=None, currsize=1
+    )
+
+    @uoft_core.memoize(maxsize=2)
+    def bounded(x):
+        calls.append(x)
+        return x
+
+    calls.clear()
+    bounded(1)
+    bounded(2)
+    bounded(1)  # 1 is now the most recently used, so 2 gets evicted next
+    bounded(3)
+    assert list(bounded.cache) == [(1,), (3,)]
+    bounded(2)
+    assert calls == [1, 2, 3, 2]
+    info = bounded.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (1, 4, 2, 2)
+
+    bounded.cache_clear()
+    assert bounded.cache_info() == uoft_core.CacheInfo(0, 0, 0, 2, None, 0)
+
+    now = 1000.0
+    mocker.patch("uoft_core.time.monotonic", side_effect=lambda: now)
+
+    @uoft_core.memoize(ttl=10)
+    def expiring(x):
+        calls.append(x)
+        return x
+
+    calls.clear()
+    expiring(1)
+    now += 5
+    expiring(2)
+    expiring(1)
+    assert calls == [1, 2]
+    now += 6
+    # 1 has expired and is recomputed, 2 is still fresh
+    expiring(1)
+    expiring(2)
+    assert calls == [1, 2, 1]
+    now += 20
+    # a call with new arguments sweeps out all expired entries
+    expiring(3)
+    assert list(expiring.cache) == [(3,)]
+
+
+def test_logging_queue(tmp_path: Path):
+    import threading
+    from uoft_core import logging
+
+    class Collector(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.records: list[logging.LogRecord] = []
+            self.threads: set[str] = set()
+
+        def emit(self, record):
+            self.records.append(record)
+            self.threads.add(threading.current_thread().name)
+
+    collector = Collector()
+    root = logging.getLogger()
+    old_handlers, old_level = root.handlers[:], root.level
+    try:
+        logging.basicConfig(level=logging.INFO, handlers=[collector], queue=True, force=True)
+        assert len(root.handlers) == 1
+        assert isinstance(root.handlers[0], logging._LocalQueueHandler)
+
+        def work(n):
+            with logging.Context(f"job{n}"):
+                for i in range(50):
+                    logging.getLogger("test_logging_queue").info("job %s record %s", n, i)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        logging._stop_queue_listener()
+    finally:
+        logging.basicConfig(handlers=old_handlers, level=old_level, force=True)
+
+    assert len(collector.records) == 250
+    # every record was rendered by the single background writer, not the worker threads
+    assert len(collector.threads) == 1
+    assert not collector.threads & {t.name for t in threads}
+    # contexts are captured by the logging thread, and only applied once
+    assert "job3: job 3 record 7" in {r.getMessage() for r in collector.records}
+
+    log_file = tmp_path / "errors.log"
+    log_file.write_text("earlier\n")
+    handler = logging.BufferedFileHandler(log_file, capacity=3)
+    logger = logging.getLogger("test_logging_buffered")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning("one")
+        logger.warning("two")
+        assert log_file.read_text() == "earlier\n"  # still buffered
+        logger.error("three")  # errors flush immediately
+        assert log_file.read_text() == "earlier\none\ntwo\nthree\n"
+        logger.warning("four")
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    # closing the handler flushes what's left, and the file is only ever appended to
+    assert log_file.read_text() == "earlier\none\ntwo\nthree\nfour\n"
+
+
+def test_logging_plain_stderr(monkeypatch: pytest.MonkeyPatch):
+    import io
+    import sys
+    from uoft_core import logging
+
+    class Stream(io.StringIO):
+        flushes = 0
+
+        def flush(self):
+            self.flushes += 1
+
+    # stderr isn't a terminal, so there's nothing for rich to render
+    stream = Stream()
+    monkeypatch.setattr(sys, "stderr", stream)
+    root = logging.getLogger()
+    old_handlers, old_level = root.handlers[:], root.level
+    try:
+        logging.basicConfig(level=logging.INFO, force=True)
+        [handler] = root.handlers
+        assert isinstance(handler, logging.BufferedStreamHandler)
+        logging.getLogger("test_plain").info("hello %s", "world")
+        assert stream.flushes == 0  # still buffered
+        logging.getLogger("test_plain").error("oops")
+        assert stream.flushes == 1
+        lines = stream.getvalue().splitlines()
+        assert lines[0].endswith(" INFO test_plain: hello world")
+        assert lines[1].endswith(" ERROR test_plain: oops")
+    finally:
+        logging.basicConfig(handlers=old_handlers, level=old_level, force=True)
+
+
+def test_logging_context():
+    import threading
+    from uoft_core import logging
+
+    class Collector(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.records: list[logging.LogRecord] = []
+
+        def emit(self, record):
+            self.records.append(record)
+
+    collector = Collector()
+    logger = logging.getLogger("test_logging_context")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(collector)
+    barrier = threading.Barrier(2)
+
+    def work(name):
+        with logging.Context(name):
+            barrier.wait()  # both threads are inside their own context at the same time
+            logger.info("working")
+            barrier.wait()
+
+    shared = logging.Context("pool")
+    first_entered, second_entered, first_exited = threading.Event(), threading.Event(), threading.Event()
+    errors = []
+
+    def shared_work(first: bool):
+        # both threads enter the same Context object, and the first one in is the first one out
+        try:
+            if not first:
+                first_entered.wait()
+            with shared:
+                (first_entered if first else second_entered).set()
+                second_entered.wait()
+                if not first:
+                    first_exited.wait()
+                logger.info("working")
+            first_exited.set()
+        except Exception as e:
+            errors.append(e)
+            first_exited.set()
+
+    try:
+        with logging.Context("outer"):
+            with logging.Context("inner"):
+                logger.info("hello %s", "world")
+                logger.debug("discarded")
+            logger.info("bye")
+        logger.info("plain")
+        records = collector.records[:]
+
+        collector.records.clear()
+        threads = [threading.Thread(target=work, args=(n,)) for n in ("a", "b")]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        thread_records = collector.records[:]
+
+        collector.records.clear()
+        threads = [threading.Thread(target=shared_work, args=(first,)) for first in (True, False)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        logger.removeHandler(collector)
+
+    assert [r.getMessage() for r in records] == ["outer: inner: hello world", "outer: bye", "plain"]
+    assert records[0].contexts == ("outer", "inner")
+    assert records[0].msg == "hello %s"  # the context is only applied on output
+    assert records[2].contexts == ()
+    # contexts don't leak between threads
+    assert sorted(r.getMessage() for r in thread_records) == ["a: working", "b: working"]
+    # and one Context object can be used from several threads at once
+    assert not errors
+    assert [r.getMessage() for r in collector.records] == ["pool: working", "pool: working"]
+
+
+def test_debug_cache(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setenv("PYDEBUG", "1")
+    monkeypatch.setenv("UOFT_CORE_SITE_CACHE", str(tmp_path / "site-cache"))
+    monkeypatch.setenv("UOFT_CORE_USER_CACHE", str(tmp_path))
+    calls = []
+
+    def func(x, **kw):
+        calls.append(x)
+        return x
+
+    cached = uoft_core.debug_cache(maxsize=2)(func)
+    cached(1, opts={"a", "b"})
+    cached(1, opts={"b", "a"})
+    assert calls == [1]
+    # results are pickled, so they're kept in a private per-user directory, never in the shared site cache
+    assert (tmp_path / "debug_cache" / "debug_cache.sqlite3").exists()
+    assert (tmp_path / "debug_cache").stat().st_mode & 0o777 == 0o700
+    assert not (tmp_path / "site-cache").exists()
+
+    # a freshly decorated copy of the same function (ie. a new run of the same script) shares the cache
+    cached = uoft_core.debug_cache(maxsize=2)(func)
+    cached(1, opts={"a", "b"})
+    assert calls == [1]
+
+    # maxsize drops the oldest results
+    cached(2)
+    cached(3)
+    cached(1, opts={"a", "b"})
+    assert calls == [1, 2, 3, 1]
+
+    cached.clear_cache()
+    cached(3)
+    assert calls == [1, 2, 3, 1, 3]
+
+    # a cache directory other users can get into is never used
+    (tmp_path / "debug_cache").chmod(0o777)
+    with pytest.raises(uoft_core.UofTCoreError):
+        uoft_core.Util("uoft_core").private_cache_dir("debug_cache")
+    assert uoft_core.debug_cache(func) is func
+
+
+def test_secrets_agent(monkeypatch: pytest.MonkeyPatch, mocker: "MockerFixture", tmp_path: Path):
+    import os
+    import socket
+    import threading
+    from uoft_core import secrets_agent
+
+    sock = tmp_path / "agent" / "agent.sock"
+    monkeypatch.setenv("UOFT_AGENT_SOCKET", str(sock))
+    assert secrets_agent.get("pass:uoft-test") is None  # agent not running yet
+
+    agent = secrets_agent.SecretsAgent(sock, ttl=60)
+    threading.Thread(target=agent.serve_forever, daemon=True).start()
+    try:
+        assert sock.stat().st_mode & 0o777 == 0o600
+        assert sock.parent.stat().st_mode & 0o777 == 0o700
+
+        mocker.patch("uoft_core._is_pass_installed", return_value=True)
+        shell = mocker.patch("uoft_core.shell", return_value="key = 'value'")
+        assert uoft_core.PassPath("uoft-test").contents == "key = 'value'"
+        # a new PassPath (ie. a new command run) gets the secret from the agent instead of decrypting it again
+        assert uoft_core.PassPath("uoft-test").contents == "key = 'value'"
+        assert shell.call_count == 1
+        assert secrets_agent.status()["entries"] == 1  # pyright: ignore[reportOptionalSubscript]
+
+        # expired secrets are dropped
+        agent.ttl = -1
+        secrets_agent.put("bw:thing", "secret")
+        assert secrets_agent.get("bw:thing") is None
+
+        monkeypatch.setenv("UOFT_AGENT", "0")
+        assert secrets_agent.get("pass:uoft-test") is None
+        monkeypatch.delenv("UOFT_AGENT")
+
+        # nothing is sent to a socket in a directory other users can get into, or to an agent running as another user
+        sock.parent.chmod(0o755)
+        assert secrets_agent.status() is None
+        sock.parent.chmod(0o700)
+        send = mocker.spy(socket.socket, "sendall")
+        mocker.patch("uoft_core.secrets_agent._peer_uid", return_value=os.getuid() + 1)
+        assert not secrets_agent.put("pass:other", "secret")
+        assert send.call_count == 0
+        mocker.stopall()
+
+        assert secrets_agent.clear()
+        assert secrets_agent.get("pass:uoft-test") is None
+        assert secrets_agent.stop()
+    finally:
+        agent.shutdown()
+        agent.server_close()
+    assert not sock.exists()
+
+
+def test_lazy_subcommands(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    import sys
+    from typer.testing import CliRunner
+    from uoft_core import __main__ as main
+
+    pkg = tmp_path / "pkgs/uoft_lazytest"
+    pkg.mkdir(parents=True)
+    (pkg / "__init__.py").write_text("")
+    (pkg / "cli.py").write_text(
+        uoft_core.txt(
+            """
+            "Help text for lazytest"
+            import typer
+            app = typer.Typer(name="lazy", help=__doc__)
+
+            @app.command()
+            def hello(name: str):
+                print(f"hello {name}")
+
+            @app.command()
+            def other():
+                pass
+            """
+        )
+    )
+    monkeypatch.syspath_prepend(str(tmp_path / "pkgs"))
+    monkeypatch.setenv("UOFT_CORE_SITE_CACHE", str(tmp_path / "site-cache"))
+    monkeypatch.setenv("UOFT_CORE_USER_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(main, "ALL_PROJECTS", ["lazytest"])
+    monkeypatch.setattr(main, "_lazy_subcommands", {})
+    monkeypatch.setattr(main, "_subcommands", None)
+
+    # the first run builds the manifest by importing the cli module
+    assert main._subcommand_manifest() == {
+        "lazy": {"project": "lazytest", "module": "uoft_lazytest.cli", "help": "Help text for lazytest"}
+    }
+    # the manifest decides what gets imported, so it's only kept where other users can't write to it
+    manifest_file = tmp_path / "cache/cli/subcommands.json"
+    assert manifest_file.exists()
+    assert manifest_file.parent.stat().st_mode & 0o777 == 0o700
+    assert not (tmp_path / "site-cache").exists()
+    del sys.modules["uoft_lazytest.cli"]
+
+    # later runs only import it when the subcommand is invoked
+    assert main._add_subcommands() == ({"lazytest"}, set())
+    runner = CliRunner()
+    result = runner.invoke(main.app, ["--help"])
+    assert "Help text for lazytest" in result.output
+    assert "uoft_lazytest.cli" not in sys.modules
+    result = runner.invoke(main.app, ["lazy", "hello", "world"])
+    assert result.output == "hello world\n"
+    assert "uoft_lazytest.cli" in sys.modules
+
+    # modules and executables recorded in the manifest are never used as-is
+    import json
+
+    manifest = json.loads(manifest_file.read_text())
+    manifest["subcommands"] = {
+        "lazy": {"project": "lazytest", "module": "os", "help": "Help text for lazytest"},
+        "evil": {"project": "evil", "executable": "/bin/false"},
+    }
+    manifest_file.write_text(json.dumps(manifest))
+    monkeypatch.setattr(main, "_lazy_subcommands", {})
+    monkeypatch.setattr(main, "_subcommands", None)
+    assert main._add_subcommands() == ({"lazytest"}, set())
+    assert main._lazy_subcommands["lazy"].module == "uoft_lazytest.cli"
+
+
+def test_completion(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, capsys: pytest.CaptureFixture):
+    import enum
+    import typer
+    from uoft_core import completion
+
+    monkeypatch.setenv("UOFT_CORE_SITE_CACHE", str(tmp_path / "site-cache"))
+    monkeypatch.setenv("UOFT_CORE_USER_CACHE", str(tmp_path / "cache"))
+    root = tmp_path / "templates"
+    root.mkdir()
+    (root / "alpha.j2").touch()
+    (root / "beta.j2").touch()
+    calls = []
+
+    @completion.cached_completion(params=["root"], watch=lambda ctx: [ctx.params["root"]])
+    def template_names(ctx: typer.Context):
+        calls.append(1)
+        return [p.name for p in ctx.params["root"].iterdir()]
+
+    class Color(enum.Enum):
+        red = "red"
+        green = "green"
+
+    app = typer.Typer()
+    sub = typer.Typer(help="Subcommands")
+    app.add_typer(sub, name="sub")
+
+    @app.callback()
+    def callback(debug: bool = False):
+        pass
+
+    @sub.command()
+    def render(
+        template: str = typer.Argument(..., autocompletion=template_names),
+        root: Path = root,
+        color: Color = Color.red,
+    ):
+        "Render a template"
+
+    tree = completion.build_tree(typer.main.get_command(app))
+
+    assert completion.complete(tree, [], "s") == [("sub", "Subcommands")]
+    assert completion.complete(tree, ["--debug", "sub"], "") == [("render", "Render a template")]
+    options = completion.complete(tree, ["sub", "render"], "--")
+    assert [v for v, _ in options or []] == ["--root", "--color", "--help"]
+    assert completion.complete(tree, ["sub", "render", "--color"], "g") == [("green", None)]
+    # paths are left for the shell to complete, with the same (empty) reply typer gives
+    assert completion.complete(tree, ["sub", "render", "--root"], "te") == []
+    monkeypatch.setenv("_TEST_COMPLETE", "complete_zsh")
+    monkeypatch.setenv("_TYPER_COMPLETE_ARGS", "test sub render --root te")
+    assert completion.fast_complete(tree, "test", "_TEST_COMPLETE")
+    assert capsys.readouterr().out == "_files\n"
+    assert completion.complete(tree, ["sub", "render", "x", "--color", "red"], "--") == [
+        ("--root", None),
+        ("--help", "Show this message and exit."),
+    ]
+    # nothing's been cached for the dynamic argument yet, so the real app has to answer
+    assert completion.complete(tree, ["sub", "render"], "a") is None
+
+    ctx = typer.Context(typer.main.get_command(app))
+    ctx.params = {"root": root}
+    assert template_names(ctx, "a") == ["alpha.j2"]
+    assert sorted(template_names(ctx, "")) == ["alpha.j2", "beta.j2"]
+    assert len(calls) == 1
+    assert completion.complete(tree, ["sub", "render"], "a") == [("alpha.j2", None)]
+    # candidate lists can come from one user's credentials, so they're never kept in the shared site cache
+    assert (tmp_path / "cache/completion").stat().st_mode & 0o777 == 0o700
+    assert not (tmp_path / "site-cache").exists()
+    # a cached list for a different --root doesn't exist
+    assert completion.complete(tree, ["sub", "render", "--root", str(tmp_path)], "a") is None
+
+    # changes to watched paths invalidate the cached list
+    (root / "another.j2").touch()
+    assert completion.complete(tree, ["sub", "render"], "a") is None
+    assert sorted(template_names(ctx, "a")) == ["alpha.j2", "another.j2"]
+    assert len(calls) == 2
+
+    # other matching modes
+    @completion.cached_completion(match="icontains")
+    def hostnames(ctx: typer.Context):
+        return ["core-SW1", "edge-sw2"]
+
+    assert hostnames(ctx, "sw") == ["core-SW1", "edge-sw2"]
+    assert completion.matches("sub/template.j2", "template", "substring")
+    assert not completion.matches("sub/template.j2", "template")
+
+
+def test_compact_ip_types():
+    import pickle
+    from uoft_core.types import CompactIPAddress, CompactIPNetwork, IPAddress, IPNetwork
+    from uoft_core._vendor.netaddr import AddrFormatError
+
+    net = CompactIPNetwork("10.0.0.5/24")
+    assert CompactIPNetwork("10.0.0.5/24") is net  # interned
+    assert (net.value, net.prefixlen, net.version) == (IPNetwork("10.0.0.5/24").value, 24, 4)
+    assert str(net) == "10.0.0.5/24" and str(net.cidr) == "10.0.0.0/24" and str(net.network) == "10.0.0.0"
+    assert net.size == 256 and net.last - net.first == 255
+    assert net.to_netaddr() == IPNetwork("10.0.0.5/24")
+
+    assert CompactIPAddress("10.0.0.200") in net
+    assert "10.0.0.128/25" in net
+    assert "10.0.0.0/23" not in net
+    assert CompactIPNetwork("::/0").__contains__(net) is False  # different IP versions never contain each other
+
+    # accepts netaddr objects, netmasks and IPv6
+    assert CompactIPNetwork(IPNetwork("2001:db8::1/48")) == CompactIPNetwork("2001:db8::1/48")
+    assert CompactIPNetwork("10.0.0.0/255.255.0.0") == CompactIPNetwork("10.0.0.0/16")
+    assert CompactIPNetwork(IPAddress("10.1.1.1")) == CompactIPNetwork("10.1.1.1") == CompactIPNetwork("10.1.1.1/32")
+    assert CompactIPAddress(IPAddress("2001:db8::1")) == CompactIPAddress("2001:DB8::1")
+    with pytest.raises(AddrFormatError):
+        CompactIPNetwork("10.0.0.300/24")
+
+    # host bits don't take part in equality or hashing, same as netaddr
+    assert CompactIPNetwork("10.0.0.5/24") == CompactIPNetwork("10.0.0.0/24")
+    assert IPNetwork("10.0.0.5/24") == IPNetwork("10.0.0.0/24")
+    assert len({CompactIPNetwork("10.0.0.5/24"), CompactIPNetwork("10.0.0.0/24")}) == 1
+    assert CompactIPNetwork("10.0.0.0/24") != CompactIPNetwork("10.0.0.0/25")
+
+    # same ordering as netaddr
+    strings = ["10.0.0.0/16", "::/0", "9.0.0.0/8", "10.0.0.0/8", "10.0.0.1/8", "2001:db8::/32"]
+    assert [str(n) for n in sorted(map(CompactIPNetwork, strings))] == [str(n) for n in sorted(map(IPNetwork, strings))]
+
+    with pytest.raises(AttributeError):
+        net.prefixlen = 8  # pyright: ignore[reportAttributeAccessIssue]
+    assert pickle.loads(pickle.dumps(net)) == net
+    assert pickle.loads(pickle.dumps(CompactIPAddress("::1"))) == CompactIPAddress("::1")
+
+    (validator,) = CompactIPNetwork.__get_validators__()
+    assert validator(net) is net
+    assert validator("10.0.0.5/24") is net
+    assert validator(IPNetwork("10.0.0.5/24")) == net
+
+
+def test_radix_tree():
+    import ipaddress
+    import pickle
+    import random
+    from uoft_core.radix import RadixTree
+    from uoft_core.types import CompactIPNetwork, IPNetwork
+
+    tree = RadixTree()
+    tree["10.0.0.0/8"] = "campus"
+    tree[IPNetwork("10.1.0.0/16")] = "building"
+    tree[ipaddress.ip_network("10.1.2.0/24")] = "floor"
+    tree["2001:db8::/32"] = "v6"
+    assert len(tree) == 4
+    assert tree["10.1.0.5/16"] == "building"  # host bits are ignored
+    assert "10.2.0.0/16" not in tree and tree.get("10.2.0.0/16") is None
+    assert tree.longest_match("10.1.2.3") == (CompactIPNetwork("10.1.2.0/24"), "floor")
+    assert tree.longest_match("10.1.3.3")[1] == "building"  # pyright: ignore[reportOptionalSubscript]
+    assert tree.longest_match("11.0.0.1") is None
+    assert tree.longest_match("2001:db8::1")[1] == "v6"  # pyright: ignore[reportOptionalSubscript]
+    assert [v for _, v in tree.covering("10.1.2.128/25")] == ["campus", "building", "floor"]
+    assert [v for _, v in tree.covered("10.1.0.0/16")] == ["building", "floor"]
+    assert [str(k) for k in tree] == ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "2001:db8::/32"]
+    assert tree.pop("10.1.0.0/16") == "building"
+    with pytest.raises(KeyError):
+        del tree["10.1.0.0/16"]
+    assert tree.longest_match("10.1.3.3")[1] == "campus"  # pyright: ignore[reportOptionalSubscript]
+
+    # compare against brute force over a random mix of inserts and deletes
+    rng = random.Random(0)
+    ref: dict[CompactIPNetwork, int] = {}
+    tree = RadixTree()
+    for i in range(2000):
+        prefixlen = rng.choice([8, 12, 16, 20, 24, 28, 32])
+        prefix = CompactIPNetwork._make(10 << 24 | rng.getrandbits(16) << 8, prefixlen, 4).cidr
+        if ref and rng.random() < 0.3:
+            victim = rng.choice(list(ref))
+            del tree[victim], ref[victim]
+        else:
+            tree[prefix] = ref[prefix] = i
+    assert len(tree) == len(ref)
+    assert list(tree.items()) == sorted(ref.items())
+    for _ in range(200):
+        query = CompactIPNetwork._make(10 << 24 | rng.getrandbits(16) << 8, rng.choice([16, 24, 32]), 4).cidr
+        covering = sorted(((k, v) for k, v in ref.items() if query in k), key=lambda kv: kv[0].prefixlen)
+        assert list(tree.covering(query)) == covering
+        assert tree.longest_match(query) == (covering[-1] if covering else None)
+        assert list(tree.covered(query)) == sorted((k, v) for k, v in ref.items() if k in query)
+
+    assert list(RadixTree.from_sorted(sorted(ref.items())).items()) == list(tree.items())
+    restored = pickle.loads(pickle.dumps(tree))
+    assert len(restored) == len(tree) and list(restored.items()) == list(tree.items())
+
+
+def test_jinja_environment_cache(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    from jinja2 import StrictUndefined, UndefinedError
+    from uoft_core import jinja_library
+
+    monkeypatch.setenv("UOFT_CORE_SITE_CACHE", str(tmp_path / "site-cache"))
+    monkeypatch.setenv("UOFT_CORE_USER_CACHE", str(tmp_path / "cache"))
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    templates.joinpath("macros.j2").write_text(
+        "{% macro show(x) %}{{ x | up }}-{{ name }}-{{ range(2) | list | length }}{% endmacro %}"
+    )
+    templates.joinpath("main.j2").write_text('{% import "macros.j2" as m %}{{ m.show(1) }}')
+    filters = {"up": lambda s: str(s).upper()}
+
+    def render(name: str):
+        env = jinja_library.get_environment(templates, filters=filters, undefined=StrictUndefined)
+        return jinja_library.load_template(env, "main.j2", {"name": name}).render()
+
+    jinja_library.cache_clear()
+    try:
+        assert [render(f"sw{i}") for i in range(3)] == ["1-sw0-2", "1-sw1-2", "1-sw2-2"]
+        # one environment, and each template compiled only once
+        assert jinja_library.cache_info() == (2, 2, 1)
+        assert jinja_library.get_environment(str(templates), filters=filters, undefined=StrictUndefined) is (
+            jinja_library.get_environment(templates, filters=filters, undefined=StrictUndefined)
+        )
+        assert jinja_library.get_environment(templates) is not jinja_library.get_environment(templates, filters=filters)
+
+        # per-render data doesn't leak into later renders
+        env = jinja_library.get_environment(templates, filters=filters, undefined=StrictUndefined)
+        with pytest.raises(UndefinedError):
+            jinja_library.load_template(env, "main.j2").render()
+
+        # a new process picks the compiled templates up from disk
+        jinja_library.cache_clear()
+        assert render("sw3") == "1-sw3-2"
+        assert jinja_library.cache_info() == (2, 0, 1)
+
+        # compiled code is only ever kept in a private, per-user directory
+        cache_dir = tmp_path / "cache" / "jinja"
+        assert cache_dir.stat().st_mode & 0o777 == 0o700
+        assert len(list(cache_dir.iterdir())) == 2
+        assert not (tmp_path / "site-cache").exists()
+
+        # and if that directory is open to other users, it isn't used
+        cache_dir.chmod(0o777)
+        assert jinja_library._private_cache_dir() is None
+    finally:
+        jinja_library.cache_clear()
+
+
+def test_toml():
+    from datetime import date, datetime, time as dt_time, timezone
+    from uoft_core import toml
+
+    doc = uoft_core.txt(
+        r'''
+        bare-key_2 = "tab\tquote\"unicode\u00e9"
+        "quoted key".nested = 'literal \n'
+        ml = """
+        first "line" ""
+        second \
+            continued"""
+        ints = [0, -17, +3, 1_000, 0xdead_BEEF, 0o17, 0b101]
+        floats = [1.5, -2e3, inf]
+        when = [1979-05-27, 1979-05-27T07:32:00Z, 07:32:00]
+
+        [[devices]]
+        name = "sw1"
+        [[devices]]
+        name = "sw2"
+        '''
+    )
+    assert toml.loads(doc) == {
+        "bare-key_2": 'tab\tquote"unicode\u00e9',
+        "quoted key": {"nested": "literal \\n"},
+        "ml": 'first "line" ""\nsecond continued',
+        "ints": [0, -17, 3, 1000, 0xDEADBEEF, 15, 5],
+        "floats": [1.5, -2000.0, float("inf")],
+        "when": [date(1979, 5, 27), datetime(1979, 5, 27, 7, 32, tzinfo=timezone.utc), dt_time(7, 32)],
+        "devices": [{"name": "sw1"}, {"name": "sw2"}],
+    }
+    for bad, err in [
+        ('a = "ctrl\x01"', "line 1, column 10"),
+        ('a = "unterminated', "end of document"),
+        ("a = 123abc", "line 1, column 8"),
+        ("a = 1979-13-01", "line 1, column 9"),
+    ]:
+        with pytest.raises(toml.TOMLDecodeError, match=err):
+            toml.loads(bad)
+
+
 class UtilsTests:
     def test_config_files(self, mock_util: "MockedUtil", caplog: "LogCaptureFixture"):
         """
@@ -530,6 +1293,48 @@ class UtilsTests:
         result = mock_util.config.merged_data
         assert result == {"key1": "val1", "key2": "val2"}
 
+    def test_merged_config_data_snapshot(self, mock_util: "MockedUtil", mocker: "MockerFixture"):
+        config_file = mock_util.mock_folders.user_config.yaml_file
+        config_file.write_text("key1: val1\n")
+        assert mock_util.config.merged_data == {"key1": "val1"}
+        assert mock_util.config.snapshot_file.stat().st_mode & 0o777 == 0o600  # pyright: ignore[reportOptionalMemberAccess]
+
+        # on the next run, nothing has changed, so config files aren't probed or parsed
+        parse = mocker.spy(uoft_core, "parse_config_file")
+        state = mocker.spy(uoft_core.File, "state")
+        mock_util._clear_caches()
+        assert mock_util.config.merged_data == {"key1": "val1"}
+        assert parse.call_count == 0
+        assert state.call_count == 0
+
+        # changing a config file invalidates the snapshot
+        config_file.write_text("key1: changed\n")
+        mock_util._clear_caches()
+        assert mock_util.config.merged_data == {"key1": "changed"}
+        assert parse.call_count == 1
+
+        # so does adding a new one
+        mock_util.mock_folders.user_config.json_file.write_text('{"key2": "val2"}')
+        mock_util._clear_caches()
+        assert mock_util.config.merged_data == {"key1": "changed", "key2": "val2"}
+
+        # rewriting the snapshot never follows a file planted at a predictable temp file name
+        import os
+
+        snapshot_file = mock_util.config.snapshot_file
+        assert snapshot_file is not None
+        victim = snapshot_file.parent / "victim"
+        victim.write_text("untouched")
+        snapshot_file.with_name(f".{snapshot_file.name}.{os.getpid()}.tmp").symlink_to(victim)
+        config_file.write_text("key1: again\n")
+        mock_util._clear_caches()
+        assert mock_util.config.merged_data == {"key1": "again", "key2": "val2"}
+        assert victim.read_text() == "untouched"
+        calls = parse.call_count
+        mock_util._clear_caches()
+        assert mock_util.config.merged_data == {"key1": "again", "key2": "val2"}
+        assert parse.call_count == calls
+
     def test_merged_config_data_multi(
         self,
         mock_util: "MockedUtil",
@@ -785,6 +1590,43 @@ class NestedDataTests:
         output = NestedData.restructure(input_data)
         assert output == expected_output
 
+    def test_restructure_edge_cases(self):
+        from uoft_core.nested_data import NestedData
+
+        # a bare leaf, and an empty structure
+        assert NestedData.restructure([("", 1)]) == 1
+        assert NestedData.restructure([]) == []
+        # list indices are positional, in the order they're first seen
+        assert NestedData.restructure([("[5]", "a"), ("[2]", "b")]) == ["a", "b"]
+        # a mix of index keys and other keys makes a dict
+        assert NestedData.restructure([("[0]", "a"), ("b", "b")]) == {"[0]": "a", "b": "b"}
+        # duplicate keypaths keep the first value
+        assert NestedData.restructure([("a.b", 1), ("a.b", 2)]) == {"a": {"b": 1}}
+        # a leaf which also has children ends up under the empty key, regardless of which comes first
+        assert NestedData.restructure([("a", 1), ("a.b", 2)]) == {"a": {"": 1, "b": 2}}
+        assert NestedData.restructure([("a.b", 2), ("a", 1)]) == {"a": {"b": 2, "": 1}}
+
+    def test_deeply_nested(self):
+        import sys
+
+        from uoft_core.nested_data import NestedData
+
+        depth = sys.getrecursionlimit() * 2
+        input_data = leaf = {}
+        for _ in range(depth):
+            leaf["key"] = [{}]
+            leaf = leaf["key"][0]
+        leaf["value"] = 1
+
+        unstructured = list(NestedData.unstructure(input_data))
+        assert unstructured == [(".".join(["key", "[0]"] * depth + ["value"]), 1)]
+        output = NestedData.restructure(unstructured)
+        # comparing nested structures is itself recursive, so walk down to the leaf instead
+        for _ in range(depth):
+            assert list(output) == ["key"] and len(output["key"]) == 1
+            output = output["key"][0]
+        assert output == {"value": 1}
+
     def test_remap(self):
         from uoft_core.nested_data import NestedData
         keymap = [
@@ -901,3 +1743,326 @@ class NestedDataTests:
         filtered = NestedData.filter_(unstructured, filters)
         output = NestedData.restructure(filtered)
         assert output == expected_output
+
+    def test_compiled_rules(self):
+        from uoft_core.nested_data import KeyFilter, KeyMap, NestedData
+
+        key_map = KeyMap(
+            [
+                ("header", "footer"),
+                # later rules see the output of earlier ones
+                ("items.*", "entries.*"),
+                ("entries.[*].id", "entries.[*].name"),
+            ]
+        )
+        key_filter = KeyFilter(["footer", "menu.entries.*.name"])
+        for n in range(3):
+            # the same rule sets can be reused across documents
+            data = {"menu": {"header": f"doc {n}", "items": [{"id": i, "label": "x"} for i in range(n)]}}
+            remapped = NestedData.remap(NestedData.unstructure(data), key_map)
+            filtered = NestedData.filter_(remapped, key_filter)
+            assert NestedData.restructure(filtered) == {
+                "menu": {"footer": f"doc {n}", **({"entries": [{"name": i} for i in range(n)]} if n else {})}
+            }
+        assert key_map.remap_key("unrelated.key") == "unrelated.key"
+        assert not key_filter.matches("unrelated.key")
+        assert list(NestedData.filter_([("a", 1)], KeyFilter([]))) == []
+
+
+class APITests:
+    @pytest.fixture()
+    def flaky_server(self):
+        # a tiny local http server which fails the first `failures` requests to any path with a 503
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        import threading
+
+        state = {"failures": 2, "hits": 0, "etag": None}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                state["hits"] += 1
+                if state["etag"] and self.headers.get("If-None-Match") == state["etag"]:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                if state["hits"] <= state["failures"]:
+                    self.send_response(503)
+                    body = b'{"error": "try again"}'
+                else:
+                    self.send_response(200)
+                    body = b'{"ok": true}'
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if state["etag"]:
+                    self.send_header("ETag", state["etag"])
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_POST = do_PATCH = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}", state
+        server.shutdown()
+        server.server_close()
+
+    def test_retry(self, flaky_server):
+        from uoft_core.api import APIBase
+
+        url, state = flaky_server
+        api = APIBase(url)
+        api.configure_transport(backoff_factor=0)
+        assert api.get("/thing").json() == {"ok": True}
+        assert state["hits"] == 3
+
+    def test_retries_exhausted(self, flaky_server):
+        from uoft_core.api import APIBase
+
+        url, state = flaky_server
+        api = APIBase(url)
+        api.configure_transport(max_retries=1, backoff_factor=0)
+        with pytest.raises(APIBase.RESTAPIError) as exc_info:
+            api.get("/thing")
+        assert exc_info.value.data == {"error": "try again"}
+        assert state["hits"] == 2
+
+    def test_configure_transport_closes_old_adapters(self, flaky_server):
+        from uoft_core.api import APIBase, ThreadedAPIPool
+
+        url, state = flaky_server
+        state.update(failures=0)
+        api = APIBase(url)
+        api.get("/thing")
+        old = api.adapters["http://"]
+        assert old.poolmanager.pools
+        with ThreadedAPIPool(api, max_workers=api.pool_maxsize + 1):
+            pass
+        assert api.adapters["http://"] is not old
+        assert not old.poolmanager.pools
+
+    def test_response_cache(self, flaky_server, tmp_path: Path):
+        import json
+        from uoft_core.api import APIBase
+
+        url, state = flaky_server
+        state.update(failures=0, etag='"v1"')
+        api = APIBase(url)
+        cache = api.enable_response_cache(tmp_path, default_ttl=60, ttls={"*/always-revalidate*": 0})
+
+        # fresh entries are served from disk without touching the server
+        assert api.get("/thing", params={"a": 1}).json() == {"ok": True}
+        res = api.get("/thing", params={"a": 1})
+        assert res.json() == {"ok": True} and getattr(res, "from_cache", False)
+        assert state["hits"] == 1
+
+        # stale entries are revalidated with If-None-Match, and a 304 is turned back into the cached response
+        api.get("/always-revalidate")
+        res = api.get("/always-revalidate")
+        assert res.status_code == 200 and res.json() == {"ok": True}
+        assert state["hits"] == 3
+
+        # writes invalidate cached entries below the written URL
+        api.post("/thing")
+        assert not any(f.name.endswith(".tmp") for f in tmp_path.rglob("*"))
+        api.get("/thing", params={"a": 1})
+        assert state["hits"] == 5
+
+        # entries are plain JSON, never pickles
+        entry = next(tmp_path.rglob("*.response"))
+        assert json.loads(entry.read_text())["url"].startswith(url)
+
+        # and the collection the written URL belongs to, but not the collection's other members
+        api.get("/things/", params={"q": "x"})
+        api.get("/things/2/")
+        api.patch("/things/1/")
+        hits = state["hits"]
+        api.get("/things/", params={"q": "x"})
+        api.get("/things/2/")
+        assert state["hits"] == hits + 1
+
+        assert cache.invalidate("*/always-revalidate") == 1
+        assert cache.clear() == 3
+
+    def test_iter_records(self, mocker: "MockerFixture"):
+        from uoft_core.api import APIBase
+
+        api = APIBase("https://localhost", api_root="/api/v2")
+        pages = {
+            "https://localhost/api/v2/addresses": {
+                "data": [1, 2],
+                "_links": {"next": {"href": "/api/v2/addresses?offset=2"}},
+            },
+            "https://localhost/api/v2/addresses?offset=2": {
+                "data": [3, 4],
+                "_links": {"next": {"href": "/api/v2/addresses?offset=4"}},
+            },
+            "https://localhost/api/v2/addresses?offset=4": {"data": [5], "_links": {}},
+            "https://localhost/api/v2/prefixes": {"results": ["a"], "next": "https://localhost/api/v2/prefixes?page=2"},
+            "https://localhost/api/v2/prefixes?page=2": {"results": ["b"], "next": None},
+        }
+        requested = []
+
+        def get(url, params=None, **kwargs):
+            requested.append((str(url), params))
+            if isinstance(url, str):
+                url = api.safe_append_path(api.api_url, url)
+            res = mocker.Mock()
+            res.json.return_value = pages[str(url)]
+            return res
+
+        mocker.patch.object(api, "get", side_effect=get)
+        assert list(api.iter_records("/addresses", page_size=2)) == [1, 2, 3, 4, 5]
+        assert requested[0] == ("/addresses", {"limit": 2})
+        assert list(api.iter_records(api.api_url / "prefixes", prefetch=False)) == ["a", "b"]
+
+        # stopping early doesn't fetch the whole collection
+        requested.clear()
+        for record in api.iter_records("/addresses"):
+            break
+        assert len(requested) <= 2
+
+    def test_metrics(self, flaky_server, tmp_path: Path):
+        from uoft_core.api import APIBase
+        from uoft_core.metrics import api_metrics, path_template
+
+        assert path_template("https://h/api/v2/networks/1234") == "/api/v2/networks/{id}"
+        uuid = "7b9f7e52-0c3b-4b8e-9d3e-1b2c3d4e5f60"
+        assert path_template(f"https://h/ipam/prefixes/{uuid}/") == "/ipam/prefixes/{uuid}/"
+        assert path_template("https://h/search/10.0.0.1/aa:bb:cc:dd:ee:ff?x=1") == "/search/{ip}/{mac}"
+
+        url, state = flaky_server
+        state["failures"] = 0
+        api_metrics.clear()
+        api = APIBase(url, api_root="/api")
+        api.configure_transport(max_retries=0)
+        api.get("/records/1")
+        api.get("/records/2")
+        [stats] = api_metrics.snapshot()
+        assert stats["method"] == "GET" and stats["path"] == "/api/records/{id}"
+        assert stats["count"] == 2 and stats["errors"] == 0
+        assert stats["bytes_received"] == 2 * len(b'{"ok": true}')
+
+        api_metrics.write(tmp_path / "metrics.prom")
+        prom = (tmp_path / "metrics.prom").read_text()
+        labels = 'host="127.0.0.1",method="GET",path="/api/records/{id}"'
+        assert f"uoft_api_request_duration_seconds_count{{{labels}}} 2" in prom
+        api_metrics.clear()
+
+    def test_cassette(self, flaky_server, tmp_path: Path):
+        from uoft_core.api import APIBase, CassetteMissError
+
+        url, state = flaky_server
+        state["failures"] = 0
+        cassette_file = tmp_path / "run.jsonl"
+
+        api = APIBase(url, api_root="/api")
+        api.use_cassette(cassette_file, mode="record")
+        api.get("/records", params={"page": 1})
+        api.post("/records", json={"name": "new"})
+        assert state["hits"] == 2
+
+        api = APIBase(url, api_root="/api")
+        api.use_cassette(cassette_file, latency=0.05)
+        start = time.perf_counter()
+        assert api.get("/records", params={"page": 1}).json() == {"ok": True}
+        assert api.post("/records", json={"name": "new"}).json() == {"ok": True}
+        assert time.perf_counter() - start >= 0.1
+        assert state["hits"] == 2  # nothing was sent to the server
+        with pytest.raises(CassetteMissError):
+            api.post("/records", json={"name": "other"})
+
+    def test_rate_limiter(self):
+        from uoft_core.api import RateLimiter
+
+        limiter = RateLimiter(rate=20, burst=2)
+        start = time.perf_counter()
+        for _ in range(4):
+            limiter.acquire()
+        # first two tokens are free (burst), the next two take 1/20th of a second each
+        assert time.perf_counter() - start >= 0.09
+        # more tokens than the bucket can ever hold would block forever
+        with pytest.raises(ValueError):
+            limiter.acquire(3)
+
+    def test_threadpool_pool_size(self):
+        from uoft_core.api import APIBase
+
+        api = APIBase("https://localhost")
+        with api.threadpool(max_workers=64):
+            pass
+        assert api.pool_maxsize == 64
+        assert api.get_adapter("https://localhost")._pool_maxsize == 64  # pyright: ignore[reportAttributeAccessIssue]
+
+    def test_async_retry(self, flaky_server):
+        pytest.importorskip("httpx")
+        import asyncio
+        from uoft_core.async_api import AsyncAPIBase
+
+        url, state = flaky_server
+        state["failures"] = 1
+
+        async def main():
+            api = AsyncAPIBase(url)
+            api.configure_transport(backoff_factor=0)
+            async with api:
+                return await api.get_many([f"/thing/{i}" for i in range(10)])
+
+        responses = asyncio.run(main())
+        assert [r.json() for r in responses] == [{"ok": True}] * 10
+        assert state["hits"] == 11
+
+    def test_async_retry_backoff_releases_slot(self, flaky_server):
+        httpx = pytest.importorskip("httpx")
+        import asyncio
+        from uoft_core.async_api import AsyncAPIBase
+
+        url, state = flaky_server
+        state["failures"] = 0
+        finished = {}
+
+        async def main():
+            api = AsyncAPIBase(url, max_concurrency=1)
+            api._backoff = lambda attempt: 0.5
+            async with api:
+                assert api._client is not None
+                request = api._client.request
+                calls = []
+
+                async def flaky_request(method, url, **kwargs):
+                    calls.append(url)
+                    if url.endswith("/down") and calls.count(url) == 1:
+                        raise httpx.ConnectError("connection refused")
+                    return await request(method, url, **kwargs)
+
+                api._client.request = flaky_request  # pyright: ignore[reportAttributeAccessIssue]
+
+                async def get(path):
+                    await api.get(path)
+                    finished[path] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                await asyncio.gather(get("/down"), get("/up"))
+
+        asyncio.run(main())
+        # /up got the only concurrency slot while /down was backing off, instead of waiting for it to finish
+        assert finished["/up"] < 0.25
+        assert finished["/down"] >= 0.5
+
+    def test_async_sync_facade(self, flaky_server):
+        pytest.importorskip("httpx")
+        from uoft_core.async_api import AsyncAPIBase
+
+        url, state = flaky_server
+        api = AsyncAPIBase(url)
+        api.configure_transport(max_retries=0)
+        with api.sync() as s:
+            with pytest.raises(AsyncAPIBase.RESTAPIError) as exc_info:
+                s.get("/thing")
+            assert exc_info.value.response.status_code == 503
+            assert exc_info.value.data == {"error": "try again"}
+            state["failures"] = 0
+            assert s.get("/thing").json() == {"ok": True}
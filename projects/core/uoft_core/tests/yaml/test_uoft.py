@@ -1,7 +1,10 @@
 "Test UofT's usage of the vendored yaml library"
 
+import pytest
+
 from uoft_core import yaml, txt
 from uoft_core.yaml import CommentedSeq
+from uoft_core.yaml.error import YAMLError
 
 def test_to_yaml():
     t = yaml.to_yaml(
@@ -40,3 +43,106 @@ def test_from_yaml():
     assert "comment on list item" in c2
     c3 = yaml.get_comment(s["list"], 1)  # type: ignore
     assert c3 is None
+
+PLAIN_DOC = txt(
+    """
+    # comment
+    defaults: &defaults
+        host: localhost # eol comment
+        port: 5432
+    dev:
+        <<: *defaults
+        host: dev.example.com
+    inline:
+        <<: {a: 1, b: 2}
+        b: 3
+    flags: [yes, on, true, False, ~, null, ""]
+    ints: [017, 0o17, 0x1F, 0b101, 1_000, -12]
+    floats: [1.5, -2.0e3, .inf]
+    dates: [2001-12-14, 2001-12-14 21:59:43.10]
+    text: |
+        literal
+        block
+    ? [complex, key]
+    : value
+    set: !!set {a, b}
+    omap: !!omap [{x: 1}, {y: 2}]
+    """
+)
+
+
+def test_plain_loads():
+    from uoft_core.yaml import plain
+
+    rt = yaml.loads(PLAIN_DOC)
+    s = yaml.loads(PLAIN_DOC, plain=True)
+    pure = plain.load(PLAIN_DOC, pure=True)
+    for data in (s, pure):
+        assert type(data) is dict
+        assert type(data["dev"]) is dict
+        assert type(data["ints"]) is list
+        assert type(data["text"]) is str
+        assert data["dev"] == {"host": "dev.example.com", "port": 5432}
+        assert data["inline"] == {"a": 1, "b": 3}
+        assert data["flags"] == ["yes", "on", True, False, None, None, ""]
+        assert data["ints"] == [17, 15, 31, 5, 1000, -12]
+        assert data["floats"] == [1.5, -2000.0, float("inf")]
+        assert data["dates"] == rt["dates"]
+        assert data[("complex", "key")] == "value"
+        assert data["set"] == {"a", "b"}
+        assert data["omap"] == {"x": 1, "y": 2}
+        assert data["defaults"] == rt["defaults"]
+    assert s == pure
+
+    for bad in ["a: 1\na: 2\n", "a: [1\n"]:
+        with pytest.raises(YAMLError):
+            yaml.loads(bad, plain=True)
+        with pytest.raises(YAMLError):
+            plain.load(bad, pure=True)
+
+
+@pytest.mark.parametrize("plain", [False, True])
+def test_iter_load_dump_iter(tmp_path, plain):
+    target = tmp_path / "inventory.yaml"
+    produced = []
+
+    def records():
+        for i in range(100):
+            produced.append(i)
+            yield {"name": f"sw{i}", "ports": [1, 2, 3]}
+
+    yaml.dump_iter(records(), target)
+    assert target.read_text().startswith("name: sw0\nports:\n  - 1\n")
+    assert target.read_text().count("---\n") == 99
+
+    docs = yaml.iter_load(target, plain=plain)
+    assert next(docs) == {"name": "sw0", "ports": [1, 2, 3]}
+    assert [doc["name"] for doc in docs] == [f"sw{i}" for i in range(1, 100)]
+
+    # open file handles work too
+    with target.open() as f:
+        assert sum(1 for _ in yaml.iter_load(f, plain=plain)) == 100
+
+
+def test_get_yaml():
+    from concurrent.futures import ThreadPoolExecutor
+
+    y = yaml.get_yaml()
+    assert yaml.get_yaml() is y
+    assert yaml.get_yaml(width=200) is not y
+    assert yaml.get_yaml("plain").typ == "plain"
+    with pytest.raises(ValueError):
+        yaml.get_yaml("safe")
+
+    # each thread gets its own instances
+    with ThreadPoolExecutor(4) as pool:
+        others = list(pool.map(lambda _: yaml.get_yaml(), range(4)))
+    assert all(other is not y for other in others)
+
+    # and reusing them across calls and threads doesn't leak state between documents
+    def roundtrip(i):
+        return yaml.loads(yaml.dumps({"name": f"sw{i}", "ports": list(range(i % 5))}), plain=True)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(roundtrip, range(200)))
+    assert results == [{"name": f"sw{i}", "ports": list(range(i % 5))} for i in range(200)]
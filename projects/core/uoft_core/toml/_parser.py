@@ -1,3 +1,4 @@
+import re
 import string
 from types import MappingProxyType
 from typing import (
@@ -39,6 +40,15 @@ TOML_WS_AND_NEWLINE = TOML_WS | frozenset("\n")
 BARE_KEY_CHARS = frozenset(string.ascii_letters + string.digits + "-_")
 KEY_INITIAL_CHARS = BARE_KEY_CHARS | frozenset("\"'")
 HEXDIGIT_CHARS = frozenset(string.hexdigits)
+NUMBER_INITIAL_CHARS = frozenset(string.digits + "+-")
+
+# Fast paths which scan a whole run of characters with a single regex match,
+# instead of looking up each character in one of the sets above
+RE_BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+# Runs of characters in a basic string which need no special handling,
+# ie anything but a quote, a backslash, or a character from the matching ILLEGAL_* set
+RE_BASIC_STR_RUN = re.compile(r'[^"\\\x00-\x08\x0a-\x1f\x7f]*')
+RE_MULTILINE_BASIC_STR_RUN = re.compile(r'[^"\\\x00-\x08\x0b-\x1f\x7f]*')
 
 BASIC_STR_ESCAPE_REPLACEMENTS = MappingProxyType(
     {
@@ -400,9 +410,8 @@ def parse_key_part(src: str, pos: Pos) -> Tuple[Pos, str]:
     except IndexError:
         char = None
     if char in BARE_KEY_CHARS:
-        start_pos = pos
-        pos = skip_chars(src, pos, BARE_KEY_CHARS)
-        return pos, src[start_pos:pos]
+        match = RE_BARE_KEY.match(src, pos)
+        return match.end(), match.group()  # pyright: ignore[reportOptionalMemberAccess]
     if char == "'":
         return parse_literal_str(src, pos)
     if char == '"':
@@ -561,12 +570,16 @@ def parse_basic_str(src: str, pos: Pos, *, multiline: bool) -> Tuple[Pos, str]:
     if multiline:
         error_on = ILLEGAL_MULTILINE_BASIC_STR_CHARS
         parse_escapes = parse_basic_str_escape_multiline
+        skip_run = RE_MULTILINE_BASIC_STR_RUN.match
     else:
         error_on = ILLEGAL_BASIC_STR_CHARS
         parse_escapes = parse_basic_str_escape
+        skip_run = RE_BASIC_STR_RUN.match
     result = ""
     start_pos = pos
     while True:
+        # jump straight to the next character that needs handling
+        pos = skip_run(src, pos).end()  # pyright: ignore[reportOptionalMemberAccess]
         try:
             char = src[pos]
         except IndexError:
@@ -617,24 +630,29 @@ def parse_value(
         if src.startswith("false", pos):
             return pos + 5, False
 
-    # Dates and times
-    datetime_match = RE_DATETIME.match(src, pos)
-    if datetime_match:
-        try:
-            datetime_obj = match_to_datetime(datetime_match)
-        except ValueError:
-            raise suffixed_err(src, pos, "Invalid date or datetime")
-        return datetime_match.end(), datetime_obj
-    localtime_match = RE_LOCALTIME.match(src, pos)
-    if localtime_match:
-        return localtime_match.end(), match_to_localtime(localtime_match)
-
-    # Integers and "normal" floats.
-    # The regex will greedily match any type starting with a decimal
-    # char, so needs to be located after handling of dates and times.
-    number_match = RE_NUMBER.match(src, pos)
-    if number_match:
-        return number_match.end(), match_to_number(number_match, parse_float)
+    if char in NUMBER_INITIAL_CHARS:
+        # Dates and times.
+        # Dates always start with "YYYY-" and times with "HH:", so there's no
+        # need to try their (comparatively expensive) regexes for anything else
+        if src[pos + 4 : pos + 5] == "-":
+            datetime_match = RE_DATETIME.match(src, pos)
+            if datetime_match:
+                try:
+                    datetime_obj = match_to_datetime(datetime_match)
+                except ValueError:
+                    raise suffixed_err(src, pos, "Invalid date or datetime")
+                return datetime_match.end(), datetime_obj
+        elif src[pos + 2 : pos + 3] == ":":
+            localtime_match = RE_LOCALTIME.match(src, pos)
+            if localtime_match:
+                return localtime_match.end(), match_to_localtime(localtime_match)
+
+        # Integers and "normal" floats.
+        # The regex will greedily match any type starting with a decimal
+        # char, so needs to be located after handling of dates and times.
+        number_match = RE_NUMBER.match(src, pos)
+        if number_match:
+            return number_match.end(), match_to_number(number_match, parse_float)
 
     # Arrays
     if char == "[":
@@ -1,31 +1,95 @@
 # coding: utf-8
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, cast
+import threading
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Iterable, Iterator, cast
 
 if TYPE_CHECKING:
-    from typing import Dict, Any  # NOQA
+    from typing import Dict  # NOQA
 
-# This module tree  originally forked from ruamel.yaml (https://sourceforge.net/p/ruamel-yaml/code/ci/0.17.21/tree/) by Anton van der Neut
+# This module tree  originally forked from ruamel.yaml (https://sourceforge.net/p/ruamel-yaml/code/ci/0.17.21/tree/)
+# by Anton van der Neut
 
 from .main import *  # NOQA
+from .main import YAML
+from .compat import StringIO
 from .comments import CommentedMap, CommentedSeq, CommentToken
 
 
-def loads(doc: str) -> dict:
-    y = YAML()
-    y.indent(mapping=2, sequence=4, offset=2)
-    return y.load(doc)
+_engines = threading.local()
+
+
+def get_yaml(
+    typ: str = "rt", *, pure: bool = False, width: int | None = None, indent: tuple[int, int, int] = (2, 4, 2)
+) -> YAML:
+    """
+    Get a `YAML` instance configured with the given options.
+
+    Instances are cached per thread and reused across calls, so code which loads / dumps lots of small documents
+    doesn't pay for setting one up every time. Don't reconfigure the instance you get back (that would change it for
+    every other caller in the thread), ask for one with different options instead.
+
+    Args:
+        typ: "rt" to load documents in round-trip mode, "plain" to load them as builtin types. See `loads`.
+        pure: for typ="plain", don't use libyaml even if it's available
+        width: the line width to wrap long scalars at when dumping
+        indent: (mapping, sequence, offset) indentation to use when dumping
+    """
+    key = (typ, pure, width, indent)
+    cache: dict[tuple, YAML] = _engines.__dict__.setdefault("cache", {})
+    y = cache.get(key)
+    if y is None:
+        y = YAML(typ=typ, pure=pure)
+        mapping, sequence, offset = indent
+        y.indent(mapping=mapping, sequence=sequence, offset=offset)
+        y.width = width
+        cache[key] = y
+    return y
+
+
+def loads(doc: str, *, plain: bool = False) -> dict:
+    """
+    Parse a YAML document.
+
+    By default, the document is loaded in round-trip mode, as `CommentedMap`s / `CommentedSeq`s which retain
+    comments and formatting, so that it can be modified and dumped back out.
+    Read-only consumers should pass `plain=True`, which is much faster and builds builtin dicts and lists.
+    """
+    return get_yaml("plain" if plain else "rt").load(doc)
 
 
 def dumps(data) -> str:
-    y = YAML()
-    y.indent(mapping=2, sequence=4, offset=2)
     stream = StringIO()
-    y.dump(data, stream)
+    get_yaml().dump(data, stream)
     return stream.getvalue()
 
 
+def iter_load(source: Path | str | IO, *, plain: bool = False) -> Iterator[Any]:
+    """
+    Lazily load each document from a multi-document YAML file.
+
+    `source` can be a path or an open file. The file is read incrementally and each document is yielded as soon as
+    it has been parsed, so memory use is bounded by the size of the largest document, not the size of the file.
+    See `loads` for the meaning of `plain`.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            yield from iter_load(f, plain=plain)
+        return
+    yield from get_yaml("plain" if plain else "rt").load_all(source)
+
+
+def dump_iter(docs: Iterable[Any], target: Path | str | IO) -> None:
+    """
+    Dump each item of `docs` as a separate document in a multi-document YAML file.
+
+    `target` can be a path or an open file. Documents are emitted to the file one at a time as `docs` is consumed,
+    so `docs` can be a generator which produces records on demand.
+    """
+    get_yaml().dump_all(docs, Path(target) if isinstance(target, str) else target)
+
+
 def from_yaml(doc: str) -> dict:
     return loads(doc)
 
@@ -36,7 +100,7 @@ def to_yaml(data) -> str:
 
 def get_comment(
     obj: CommentedSeq | CommentedMap, key: str | int | None = None
-) -> str | None:  # noqa
+) -> str | None:
     """
     Take a yaml object, and fetch comments from it. if a key is provided,
     fetch the comment associated with that key
@@ -2,10 +2,8 @@
 # pylint: disable=unused-import, unused-wildcard-import, wildcard-import, unused-argument, redefined-outer-name
 
 from __future__ import annotations
-from functools import cached_property
 from pathlib import Path
-from typing import Iterator, List, Any, Optional, TYPE_CHECKING
-from io import StringIO, TextIOWrapper
+from typing import IO, Iterable, Iterator, Any, Optional
 
 from .compat import StringIO
 
@@ -28,9 +26,16 @@ from .comments import CommentedMap, CommentedSeq
 
 
 class YAML:
-    def __init__(self) -> None:  # input=None,
+    def __init__(self, *, typ: str = "rt", pure: bool = False) -> None:  # input=None,
         """
+        typ: "rt" (round-trip) loads documents as CommentedMap / CommentedSeq, retaining comments and formatting.
+            "plain" loads them as builtin types (see `plain.py`). Dumping works the same for both.
+        pure: for "plain", don't use libyaml even if it's available
         """
+        if typ not in ("rt", "plain"):
+            raise ValueError(f"typ={typ!r} is not supported, use 'rt' or 'plain'")
+        self.typ = typ
+        self.pure = pure
         self._context_manager = None
 
         self.allow_unicode = True
@@ -66,18 +71,32 @@ class YAML:
         self.brace_single_entry_mapping_in_flow_sequence = False
 
     def load(self, stream: str) -> Any:
+        if self.typ == "plain":
+            from .plain import load
+
+            return load(stream, pure=self.pure)
         return Loader(self).load(stream)
 
-    def load_all(self, stream: str) -> Iterator[CommentedMap]:  # *, skip=None):
+    def load_all(self, stream: str | IO) -> Iterator[CommentedMap]:  # *, skip=None):
+        if self.typ == "plain":
+            from .plain import load_all
+
+            return load_all(stream, pure=self.pure)
         return Loader(self).load_all(stream)
 
     def dump(self, data: Any, stream: StringIO | Path | None = None) -> str | None:
         return Dumper(self).dump(data, stream)
 
-    def dump_all(self, documents: List[Any], stream: StringIO | TextIOWrapper| Path | None) -> str | None:
+    def dump_all(self, documents: Iterable[Any], stream: IO | Path | None) -> str | None:
         return Dumper(self).dump_all(documents, stream)
 
-    def indent(self, mapping: Optional[int]=None, sequence: Optional[int]=None, scalar: Optional[int]=None, offset: Optional[int]=None) -> None:
+    def indent(
+        self,
+        mapping: Optional[int] = None,
+        sequence: Optional[int] = None,
+        scalar: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> None:
 
         if mapping is not None:
             self.map_indent = mapping
@@ -99,11 +118,12 @@ class Dumper:
     def dump(self, data: Any, stream: StringIO | Path | None = None) -> str | None:
         return self.dump_all([data], stream)
 
-    def dump_all(self, documents: List[Any], stream: StringIO | TextIOWrapper| Path | None) -> str | None:
-        if not isinstance(stream, (StringIO, TextIOWrapper)):
-            output = StringIO()
-        else:
-            output = stream
+    def dump_all(self, documents: Iterable[Any], stream: IO | Path | None) -> str | None:
+        if isinstance(stream, Path):
+            # emit straight into the file, rather than building the whole document in memory first
+            with stream.open("w", encoding=self.conf.encoding) as f:
+                return self.dump_all(documents, f)
+        output = StringIO() if stream is None else stream
 
         self.emitter.stream = output
         self.serializer.open()
@@ -111,15 +131,11 @@ class Dumper:
             self.representer.represent(data)
         self.serializer.close()
 
-        if isinstance(stream, Path):
-            assert isinstance(output, StringIO)
-            stream.write_text(output.getvalue())
-        elif stream is None:
+        if stream is None:
             assert isinstance(output, StringIO)
             return output.getvalue()
-        else:
-            return None
-    
+        return None
+
 
 class Loader:
     def __init__(self, parent: YAML) -> None:
@@ -135,7 +151,7 @@ class Loader:
         self.reader.stream = stream
         return self.constructor.get_single_data()
 
-    def load_all(self, stream: str) -> Iterator[CommentedMap | CommentedSeq]:  # *, skip=None):
+    def load_all(self, stream: str | IO) -> Iterator[CommentedMap | CommentedSeq]:  # *, skip=None):
         self.reader.stream = stream
         while self.constructor.check_data():
-            yield self.constructor.get_data()
\ No newline at end of file
+            yield self.constructor.get_data()
@@ -0,0 +1,287 @@
+# coding: utf-8
+"""
+A loading mode for read-only consumers, which builds builtin dicts, lists, strs, ints, etc.
+
+The round-trip loader in `main.py` keeps every comment, anchor, quoting style and line/column position around, so
+that a document can be dumped back out unchanged. Code which only reads a document (config files, data files, API
+datasources) pays for all of that bookkeeping without ever using it. `load` skips it: comments are dropped in the
+scanner, and the constructor builds plain builtin types directly.
+
+If PyYAML is installed with its libyaml bindings, documents are scanned and parsed in C. Otherwise, the pure-Python
+scanner and parser from this package are used. Either way, scalars are resolved with the same YAML 1.2 rules as the
+round-trip loader (`yes`/`on` are strings, `017` is 17, `0o17` is 15), so both paths produce identical data.
+"""
+from __future__ import annotations
+
+import re
+from collections.abc import Hashable
+from typing import IO, Any, Iterator
+
+from .constructor import Constructor, ConstructorError
+from .error import YAMLError
+from .main import YAML, Loader
+from .nodes import MappingNode
+from .resolver import implicit_resolvers
+from .scanner import Scanner
+from .util import create_timestamp, timestamp_regexp
+
+__all__ = ["PlainLoader", "libyaml_available", "load", "load_all"]
+
+
+# region scalars
+# shared by the pure-Python and libyaml paths, so that both resolve scalars identically
+def _int12(value: str) -> int:
+    value = value.replace("_", "")
+    sign = -1 if value[0] == "-" else 1
+    if value[0] in "+-":
+        value = value[1:]
+    prefix = value[:2]
+    if prefix == "0b":
+        return sign * int(value[2:], 2)
+    if prefix == "0x":
+        return sign * int(value[2:], 16)
+    if prefix == "0o":
+        return sign * int(value[2:], 8)
+    # YAML 1.2 has no implicit octals, a leading zero is just a leading zero
+    return sign * int(value)
+
+
+def _float12(value: str) -> float:
+    value = value.replace("_", "").lower()
+    sign = -1 if value[0] == "-" else 1
+    if value[0] in "+-":
+        value = value[1:]
+    if value == ".inf":
+        return sign * float("inf")
+    if value == ".nan":
+        return float("nan")
+    return sign * float(value)
+
+
+def _timestamp(value: str):
+    match = timestamp_regexp.match(value)
+    if match is None:
+        raise ValueError(f'failed to construct timestamp from "{value}"')
+    return create_timestamp(**match.groupdict())
+
+
+# endregion scalars
+# region pure python
+class PlainScanner(Scanner):
+    "A scanner which throws comments away instead of attaching them to tokens"
+
+    def fetch_comment(self, comment) -> None:
+        pass
+
+
+class PlainConstructor(Constructor):
+    "A constructor which builds builtin types instead of the round-trip Commented* types"
+
+    def construct_scalar(self, node) -> str:
+        value = super().construct_scalar(node)
+        # the round-trip constructor wraps some scalars (ie literal / folded block scalars) in str subclasses
+        return str(value) if isinstance(value, str) else value
+
+    def construct_yaml_int(self, node) -> int:
+        return _int12(self.construct_scalar(node))
+
+    def construct_yaml_float(self, node) -> float:
+        return _float12(self.construct_scalar(node))
+
+    def construct_yaml_bool(self, node) -> bool:
+        return self.bool_values[self.construct_scalar(node).lower()]
+
+    def construct_yaml_seq(self, node) -> Iterator[list]:
+        data = []
+        yield data
+        data.extend(self.construct_sequence(node, deep=True))
+
+    def construct_yaml_set(self, node) -> Iterator[set]:
+        data = set()
+        yield data
+        data.update(self.construct_mapping(node, {}, deep=True))
+
+    def construct_yaml_map(self, node) -> Iterator[dict]:
+        data = {}
+        yield data
+        self.construct_mapping(node, data, deep=True)
+
+    def construct_yaml_omap(self, node) -> Iterator[dict]:
+        data = {}
+        yield data
+        pairs = self.construct_yaml_pairs(node)
+        items = next(pairs)
+        for _ in pairs:
+            pass
+        data.update(items)
+
+    def construct_mapping(self, node, maptyp: dict, deep: bool = False) -> dict:  # type: ignore[override]
+        if not isinstance(node, MappingNode):
+            raise ConstructorError(
+                None, None, f"expected a mapping node, but found {node.id!s}", node.start_mark
+            )
+        # merged mappings have to be fully constructed before their keys can be copied into a plain dict
+        deep_construct, self.deep_construct = self.deep_construct, True
+        try:
+            merge_map = self.flatten_mapping(node)
+        finally:
+            self.deep_construct = deep_construct
+        for key_node, value_node in node.value:
+            key = self.construct_object(key_node, deep=True)
+            if isinstance(key, list):
+                key = tuple(key)
+            if not isinstance(key, Hashable):
+                raise ConstructorError(
+                    "while constructing a mapping", node.start_mark, "found unhashable key", key_node.start_mark
+                )
+            value = self.construct_object(value_node, deep=deep)
+            if self.check_mapping_key(node, key_node, maptyp, key, value):  # pyright: ignore[reportArgumentType]
+                maptyp[key] = value
+        # explicit keys win over merged ones, and earlier merges win over later ones
+        for _, merged in merge_map:
+            for key, value in merged.items():
+                maptyp.setdefault(key, value)
+        return maptyp
+
+    def construct_yaml_timestamp(self, node, values=None):
+        try:
+            return _timestamp(node.value)
+        except ValueError as e:
+            raise ConstructorError(None, None, str(e), node.start_mark)
+
+
+class PlainLoader(Loader):
+    def __init__(self, parent: YAML) -> None:
+        super().__init__(parent)
+        self.constructor = PlainConstructor(self)
+        self.scanner = PlainScanner(self)
+
+
+# endregion pure python
+# region libyaml
+try:
+    import yaml as _pyyaml
+    from yaml.cyaml import CParser as _CParser
+except ImportError:
+    _pyyaml = None
+    _CLoader = None
+else:
+    from yaml.constructor import ConstructorError as _CConstructorError, SafeConstructor as _SafeConstructor
+    from yaml.nodes import MappingNode as _CMappingNode
+    from yaml.resolver import BaseResolver as _BaseResolver
+
+    class _CResolver(_BaseResolver):
+        "PyYAML's resolver implements YAML 1.1, so load it up with the same 1.2 rules our Resolver uses"
+
+    for _versions, _tag, _regexp, _first in implicit_resolvers:
+        if (1, 2) in _versions:
+            _CResolver.add_implicit_resolver(_tag, re.compile(_regexp.pattern, _regexp.flags), _first)
+
+    class _CConstructor(_SafeConstructor):
+        def construct_yaml_int(self, node) -> int:
+            return _int12(self.construct_scalar(node))
+
+        def construct_yaml_float(self, node) -> float:
+            return _float12(self.construct_scalar(node))
+
+        def construct_yaml_bool(self, node) -> bool:
+            return Constructor.bool_values[self.construct_scalar(node).lower()]
+
+        def construct_yaml_timestamp(self, node):
+            try:
+                return _timestamp(node.value)
+            except ValueError as e:
+                raise _CConstructorError(None, None, str(e), node.start_mark)
+
+        def construct_yaml_omap(self, node):
+            data = {}
+            yield data
+            pairs = self.construct_yaml_pairs(node)
+            items = next(pairs)
+            for _ in pairs:
+                pass
+            data.update(items)
+
+        def construct_mapping(self, node, deep=False):
+            if not isinstance(node, _CMappingNode):
+                return super().construct_mapping(node, deep)
+            # same semantics as PlainConstructor: list keys become tuples, duplicate keys are an error,
+            # and explicit keys win over merged ones
+            explicit = sum(1 for key_node, _ in node.value if key_node.tag != "tag:yaml.org,2002:merge")
+            self.flatten_mapping(node)
+            first_explicit = len(node.value) - explicit
+            mapping = {}
+            seen = set()
+            for i, (key_node, value_node) in enumerate(node.value):
+                key = self.construct_object(key_node, deep=True)
+                if isinstance(key, list):
+                    key = tuple(key)
+                if not isinstance(key, Hashable):
+                    raise _CConstructorError(
+                        "while constructing a mapping", node.start_mark, "found unhashable key", key_node.start_mark
+                    )
+                if i >= first_explicit:
+                    if key in seen:
+                        raise _CConstructorError(
+                            "while constructing a mapping",
+                            node.start_mark,
+                            f'found duplicate key "{key}"',
+                            key_node.start_mark,
+                        )
+                    seen.add(key)
+                mapping[key] = self.construct_object(value_node, deep=deep)
+            return mapping
+
+    # SafeConstructor registers its own methods by reference, so overriding them isn't enough
+    for _tag, _method in [
+        ("int", _CConstructor.construct_yaml_int),
+        ("float", _CConstructor.construct_yaml_float),
+        ("bool", _CConstructor.construct_yaml_bool),
+        ("timestamp", _CConstructor.construct_yaml_timestamp),
+        ("omap", _CConstructor.construct_yaml_omap),
+    ]:
+        _CConstructor.add_constructor(f"tag:yaml.org,2002:{_tag}", _method)
+
+    class _CLoader(_CParser, _CConstructor, _CResolver):
+        def __init__(self, stream):
+            _CParser.__init__(self, stream)
+            _CConstructor.__init__(self)
+            _CResolver.__init__(self)
+
+
+libyaml_available = _CLoader is not None
+
+# endregion libyaml
+
+
+def load(stream: str, *, pure: bool = False) -> Any:
+    """
+    Load a single YAML document as builtin types, using libyaml if it's available.
+
+    Args:
+        stream: the YAML document
+        pure: skip libyaml and always use the pure-Python scanner and parser
+    """
+    if pure or _CLoader is None:
+        return PlainLoader(YAML()).load(stream)
+    try:
+        return _pyyaml.load(stream, Loader=_CLoader)  # pyright: ignore[reportOptionalMemberAccess]
+    except _pyyaml.YAMLError as e:  # pyright: ignore[reportOptionalMemberAccess]
+        # keep the exception types the same regardless of which parser is used
+        raise YAMLError(str(e)) from e
+
+
+def load_all(stream: str | bytes | IO, *, pure: bool = False) -> Iterator[Any]:
+    """
+    Lazily load each document in a multi-document YAML stream as builtin types, using libyaml if it's available.
+
+    `stream` can be a string or an open file. Files are read incrementally, so only the document currently being
+    constructed is held in memory.
+    """
+    if pure or _CLoader is None:
+        yield from PlainLoader(YAML()).load_all(stream)  # pyright: ignore[reportArgumentType]
+        return
+    try:
+        yield from _pyyaml.load_all(stream, Loader=_CLoader)  # pyright: ignore[reportOptionalMemberAccess]
+    except _pyyaml.YAMLError as e:  # pyright: ignore[reportOptionalMemberAccess]
+        raise YAMLError(str(e)) from e
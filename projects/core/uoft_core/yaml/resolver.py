@@ -103,6 +103,10 @@ implicit_resolvers = [
 ]
 # fmt: on
 
+# implicit_resolvers, indexed by first character, for each YAML version.
+# built on first use and shared by every Resolver, rather than rebuilt for every load / dump
+_versioned_resolvers: Dict[Tuple[int, int], Dict[str | None, List[Tuple[str, LazyEval]]]] = {}
+
 
 class ResolverError(YAMLError):
     pass
@@ -132,7 +136,6 @@ class Resolver:
             self.dumper = parent
         self.resolver_exact_paths = []
         self.resolver_prefix_paths = []
-        self._version_implicit_resolver = {}
 
     @property
     def loader_version(self):
@@ -149,14 +152,6 @@ class Resolver:
         # assume string
         return tuple(map(int, version.split(".")))
 
-    def add_version_implicit_resolver(self, version: Tuple[int, int], tag: str, regexp: LazyEval, first: List[str | None]) -> None:
-
-        if first is None:
-            first = [None]
-        impl_resolver = self._version_implicit_resolver.setdefault(version, {})
-        for ch in first:
-            impl_resolver.setdefault(ch, []).append((tag, regexp))
-
     @property
     def versioned_resolver(self) -> Dict[str | None, List[Tuple[str, LazyEval]]]:
 
@@ -166,11 +161,15 @@ class Resolver:
         version = self.processing_version
         if isinstance(version, str):
             version = tuple(map(int, version.split(".")))
-        if version not in self._version_implicit_resolver:
-            for x in implicit_resolvers:
-                if version in x[0]:
-                    self.add_version_implicit_resolver(version, x[1], x[2], x[3])
-        return self._version_implicit_resolver[version]
+        table = _versioned_resolvers.get(version)
+        if table is None:
+            table = {}
+            for versions, tag, regexp, first in implicit_resolvers:
+                if version in versions:
+                    for ch in first or [None]:
+                        table.setdefault(ch, []).append((tag, regexp))
+            _versioned_resolvers[version] = table
+        return table
 
     @classmethod
     def add_implicit_resolver_base(cls, tag, regexp, first):
@@ -200,6 +199,7 @@ class Resolver:
         for ch in first:
             cls.yaml_implicit_resolvers.setdefault(ch, []).append((tag, regexp))
         implicit_resolvers.append(([(1, 2), (1, 1)], tag, regexp, first))
+        _versioned_resolvers.clear()
 
     @classmethod
     def add_path_resolver(cls, tag, path, kind=None):
@@ -330,7 +330,8 @@ class Resolver:
                 resolvers = self.versioned_resolver.get(value[0], [])
             else:
                 resolvers = self.versioned_resolver.get(value, [])
-            resolvers += self.versioned_resolver.get(None, [])
+            # the tables are shared, so don't extend them in place
+            resolvers = resolvers + self.versioned_resolver.get(None, [])
             for tag, regexp in resolvers:
                 if regexp.match(value):
                     return tag
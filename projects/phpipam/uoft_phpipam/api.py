@@ -1,4 +1,5 @@
 from requests import Session
+from uoft_core.metrics import instrument_session
 from . import Settings
 
 
@@ -10,7 +11,7 @@ class phpIPAMRESTAPIClient:
         self.app_id = app_id
         self.rest_url = f"https://{self.hostname}/api/{self.app_id}/"
         self.auth = dict(username=username, password=password)
-        self.session = Session()
+        self.session = instrument_session(Session())
         self.session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
 
     def login(self):
@@ -26,6 +26,8 @@ import concurrent.futures as cf
 from uoft_core.api import RESTAPIError
 from uoft_core.types import IPNetwork, BaseModel, Field
 from uoft_core.prompt import Prompt
+from uoft_core.profiling import span
+from uoft_core.radix import RadixTree
 from uoft_bluecat import Settings as BluecatSettings
 from uoft_librenms import Settings as LibrenmsSettings
 from uoft_core import logging
@@ -187,11 +189,15 @@ class SyncManager:
         self.on_orphan = on_orphan
         self.changes = Changes()
 
+    @span()
     def load(self):
         """Load data from both source and destination systems. This method should be called before synchronize."""
         with cf.ThreadPoolExecutor(thread_name_prefix="load_data") as executor:
-            source_task = executor.submit(self.source.load_data, datasets=self.datasets)
-            dest_task = executor.submit(self.dest.load_data, datasets=self.datasets)
+            # worker threads don't inherit the caller's span, so give each side its own top-level span
+            source_load = span(f"{self.source.name}.load_data")(self.source.load_data)
+            dest_load = span(f"{self.dest.name}.load_data")(self.dest.load_data)
+            source_task = executor.submit(source_load, datasets=self.datasets)
+            dest_task = executor.submit(dest_load, datasets=self.datasets)
             source_task.result()
             dest_task.result()
         self.loaded = True
@@ -205,6 +211,7 @@ class SyncManager:
         self.source.preprocess(dest=self.dest.name)
         self.dest.preprocess(source=self.source.name)
 
+    @span()
     def synchronize(self):
         assert self.loaded, "Data must be loaded before synchronization can occur"
         self.preprocess()
@@ -247,6 +254,7 @@ class SyncManager:
         msg = f"Found {total_records}" if total_records else "No records to synchronize, everything is in sync!"
         logger.info(msg)
 
+    @span()
     def commit(self):
         assert self.changes is not None, "Synchronize must be called before commit"
         self.dest.create(self.changes.create)
@@ -760,8 +768,9 @@ class BluecatTarget(Target):
         # create prefixes in order from largest to smallest,
         # so that the parent prefix is created before the child prefix
         prefixes_to_create = sorted([p for p in prefixes.values()], key=lambda x: x.ip_network.prefixlen)
+        prefix_tree = self.prefix_tree()
         for pfx in prefixes_to_create:
-            res = self.create_prefix(pfx)
+            res = self.create_prefix(pfx, prefix_tree)
             new_id = res["id"]
             created_ids.append(new_id)
             # add the new id to the local_ids table
@@ -770,10 +779,11 @@ class BluecatTarget(Target):
             # so it can be looked up and used as a parent_id for a smaller prefix being created at the same time
             assert self.syncdata.prefixes
             self.syncdata.prefixes[pfx.prefix] = pfx
+            prefix_tree[pfx.ip_network] = str(pfx.ip_network).lower()
         return created_ids
 
-    def create_prefix(self, pfx: PrefixModel):
-        parent_id: int = self._find_parent_id(pfx.ip_network)
+    def create_prefix(self, pfx: PrefixModel, prefix_tree: RadixTree[str] | None = None):
+        parent_id: int = self._find_parent_id(pfx.ip_network, prefix_tree)
         name = pfx.description
         if pfx.status == "Deprecated" and self._name_missing_status_indicator(name):
             name += "-DEPRECATED"
@@ -966,37 +976,24 @@ class BluecatTarget(Target):
             logger.info(f"Bluecat: {msg}")
             self.api.delete(f"/addresses/{id_}", comment=msg)
 
-    def _find_parent_id(self, this_net: IPNetwork) -> int:
+    def _find_parent_id(self, this_net: IPNetwork, prefix_tree: RadixTree[str] | None = None) -> int:
         "Find the smallest parent prefix that contains the given prefix"
-        v4_nets, v6_nets = self.all_nets()
-        if this_net.version == 4:
-            nets = v4_nets
-        else:
-            nets = v6_nets
-        # nets are already sorted from smallest to largest, so first hit should be the parent
-        for net in nets:
-            if this_net in net:
-                # WARNING: at some point, bluecat was returning IPv6 addresses in all uppercase
-                # and at some point it started returning them in lowercase. I have no idea why.
-                # so we need to normalize the address to lowercase before looking it up in local_ids
-                net = str(net).lower()
-                return t.cast(int, self.syncdata.local_ids[str(net)])
+        if prefix_tree is None:
+            prefix_tree = self.prefix_tree()
+        match = prefix_tree.longest_match(this_net)
+        if match is not None:
+            _, net = match
+            return t.cast(int, self.syncdata.local_ids[net])
         logger.warning(f"Parent prefix not found for {this_net}, using configuration root")
         return self.api.configuration_id
 
-    def all_nets(self):
-        self._ipv4_nets = []
-        self._ipv6_nets = []
-        assert self.syncdata.prefixes, "Prefixes must be loaded before calling all_nets"
-        for pfx in self.syncdata.prefixes.keys():
-            net = IPNetwork(pfx)
-            if net.version == 4:
-                self._ipv4_nets.append(net)
-            else:
-                self._ipv6_nets.append(net)
-        self._ipv4_nets.sort(key=lambda x: x.prefixlen, reverse=True)
-        self._ipv6_nets.sort(key=lambda x: x.prefixlen, reverse=True)
-        return self._ipv4_nets, self._ipv6_nets
+    def prefix_tree(self) -> RadixTree[str]:
+        "All loaded prefixes, in a radix tree which maps each one to the key it's stored under in local_ids"
+        assert self.syncdata.prefixes, "Prefixes must be loaded before calling prefix_tree"
+        # WARNING: at some point, bluecat was returning IPv6 addresses in all uppercase
+        # and at some point it started returning them in lowercase. I have no idea why.
+        # so we need to normalize the address to lowercase before looking it up in local_ids
+        return RadixTree((net, str(net).lower()) for net in map(IPNetwork, self.syncdata.prefixes.keys()))
 
 
 class LibreNMSTarget(Target):
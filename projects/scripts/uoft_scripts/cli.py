@@ -9,7 +9,8 @@ from .sib_turnup.cli import app as sib_turnup_app
 from .stg_ipam_dev.cli import app as stg_ipam_dev_app
 from .arista.cli import app as arista_app
 
-from uoft_core import logging
+from uoft_core import logging, Util
+from uoft_core.profiling import ProfileMode, start_profiling
 
 import typer
 
@@ -54,6 +55,12 @@ def callback(
     ] = None,
     debug: bool = typer.Option(False, help="Turn on debug logging", envvar="DEBUG"),
     trace: bool = typer.Option(False, help="Turn on trace logging. implies --debug", envvar="TRACE"),
+    profile: t.Optional[ProfileMode] = typer.Option(
+        None,
+        help="Profile this invocation with cProfile or a sampling profiler. Results are written to the cache directory",
+        show_default=False,
+    ),
+    profile_memory: bool = typer.Option(False, help="With --profile, also record peak memory use of each span"),
 ):
     global DEBUG_MODE
     log_level = "INFO"
@@ -64,6 +71,8 @@ def callback(
         log_level = "TRACE"
         DEBUG_MODE = True
     logging.basicConfig(level=log_level)
+    if profile is not None:
+        start_profiling(profile, Util("scripts").cache_dir / "profiles", name="scripts", memory=profile_memory)
 
 
 class DeviceType(str, Enum):
@@ -2,6 +2,7 @@ import typing as t
 from pathlib import Path
 
 from uoft_core import logging
+from uoft_core.completion import cached_completion
 
 from . import OnOrphanAction, ComplianceReportGoal
 
@@ -22,17 +23,14 @@ def _validate_templates_dir(templates_dir):
     return templates_dir
 
 
-def _autocomplete_hostnames(ctx: typer.Context, partial: str):
+@cached_completion(ttl=3600, params=["dev"], match="icontains")
+def _autocomplete_hostnames(ctx: typer.Context):
     from . import get_api
     from pynautobot.models.extras import Record
 
     dev = ctx.params.get("dev", False)
     nb = get_api(dev)
-    if partial:
-        query = nb.dcim.devices.filter(name__ic=partial)
-    else:
-        query = nb.dcim.devices.all()
-    query = t.cast(list[Record], query)
+    query = t.cast(list[Record], nb.dcim.devices.all())
     return [d.name for d in query]
 
 
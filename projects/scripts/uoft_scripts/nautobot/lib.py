@@ -496,7 +496,7 @@ def device_type_add_or_update(
     # read the device type file
     from uoft_core.yaml import loads
 
-    device_type = loads(device_type_file.read_text())
+    device_type = loads(device_type_file.read_text(), plain=True)
 
     prompt = Settings._prompt()
 
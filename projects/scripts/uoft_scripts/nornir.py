@@ -4,6 +4,7 @@ import typing as t
 
 from uoft_core import logging, txt
 from uoft_core.console import console
+from uoft_core.profiling import span
 from uoft_ssh import Settings as SSHSettings
 
 from .nautobot import get_api
@@ -80,6 +81,7 @@ class NautobotInventory(Inventory):
         return api.graphql.query(query).json["data"]["devices"]
 
     @classmethod
+    @span()
     def from_nautobot(cls, dev: bool = False) -> "NautobotInventory":
         """Load of Nornir inventory.
 
@@ -5,11 +5,13 @@ Code for pulling data out of the uoft-ipam database's dev instance
 import contextlib
 import typing as t
 from datetime import date
+from itertools import pairwise
 from ipaddress import IPv4Network, IPv6Network
 from time import monotonic_ns
 
 from uoft_core import BaseSettings, SecretStr
 from uoft_core import logging
+from uoft_core.radix import RadixTree
 
 from sqlmodel import Field, SQLModel, Session, create_engine, select
 import sqlalchemy as sa
@@ -157,34 +159,27 @@ class Data:
 
 
 def _calculate_parentage(networks: dict[int, Network]) -> dict[int, Network]:
-    v4_networks = sorted(
-        [n for n in networks.values() if n.ip4],
-        key=lambda x: int(t.cast(IPv4Network, x.ip4).netmask),
-        reverse=True,
-    )
-
-    for network in v4_networks:
-        next_index = v4_networks.index(network) + 1
-        for n in v4_networks[next_index:]:
-            if t.cast(IPv4Network, n.ip4).supernet_of(t.cast(IPv4Network, network.ip4)):
-                network._parent = n.id
-                break
-
-    v6_networks = sorted(
-        [n for n in networks.values() if n.ip6],
-        key=lambda x: int(t.cast(IPv6Network, x.ip6).netmask),
-        reverse=True,
-    )
-
     # theoretically, we could have a network that has a v4 parent and a v6 parent
     # but we're not going to worry about that for now. it's likely to be a very rare
-    # edge case for the forseeable future
-    for network in v6_networks:
-        next_index = v6_networks.index(network) + 1
-        for n in v6_networks[next_index:]:
-            if t.cast(IPv6Network, n.ip6).supernet_of(t.cast(IPv6Network, network.ip6)):
-                network._parent = n.id
-                break
+    # edge case for the forseeable future. if a network has both, its v6 parent wins
+    for attr in ("ip4", "ip6"):
+        tree: RadixTree[list[Network]] = RadixTree()
+        for network in networks.values():
+            if prefix := getattr(network, attr):
+                group = tree.get(prefix)
+                if group is None:
+                    group = tree[prefix] = []
+                group.append(network)
+
+        for prefix, group in tree.items():
+            # duplicate networks are each other's supernets. each one's parent is the next one along
+            for network, next_network in pairwise(group):
+                network._parent = next_network.id
+            # the last one's parent is the first of the most specific networks which strictly contain it
+            covering = list(tree.covering(prefix))
+            if len(covering) > 1:
+                _, parents = covering[-2]
+                group[-1]._parent = parents[0].id
 
     return networks
 
@@ -482,6 +477,7 @@ def sync_to_paloalto(commit: bool):
     ]
     pa_networks_by_name = {n["@name"]: n for n in pa_networks}
     pa_networks_by_prefix = {n["ip-netmask"]: n for n in pa_networks}
+    tags_tree = RadixTree(s.tags_by_network.items())
 
     def derive_tags(net: Network, v: t.Literal[4, 6]) -> set[str]:
         tags = {"source:ipam.utoronto.ca", f"net_type:{net.net_type.replace(' ', '_').lower()}"}
@@ -498,13 +494,11 @@ def sync_to_paloalto(commit: bool):
 
         assert ip is not None
 
-        for prefix, tag in s.tags_by_network.items():
-            if prefix.version == ip.version and ip.subnet_of(prefix):  # pyright: ignore[reportArgumentType]
-                tags.add(tag)
+        # every configured network which ip is a subnet of (or equal to)
+        tags.update(tag for _, tag in tags_tree.covering(ip))
 
-        for prefix, tag in s.tags_by_network_exact.items():
-            if prefix.version == ip.version and ip == prefix:
-                tags.add(tag)
+        if (tag := s.tags_by_network_exact.get(ip)) is not None:
+            tags.add(tag)
 
         if not ip.is_private and "address_space:cgnat" not in tags:
             tags.add("address_space:public")
@@ -1,5 +1,6 @@
 import requests
 import re
+from uoft_core.metrics import instrument_session
 from . import Settings
 
 
@@ -7,6 +8,7 @@ class SnipeITAPI:
     def __init__(self, hostname: str, token: str):
         self.hostname = hostname
         self.token = token
+        self.session = instrument_session(requests.Session())
 
     def create_asset(self, model_id: int, mac_addr: str, name: str, serial: str) -> int:
         create_url = f"https://{self.hostname}/api/v1/hardware"
@@ -18,7 +20,7 @@ class SnipeITAPI:
             "serial": serial,
         }
         headers = self.headers()
-        response = requests.post(create_url, json=payload, headers=headers)
+        response = self.session.post(create_url, json=payload, headers=headers)
         asset_search = re.findall('"asset_tag":"([^"]+)"', str(response.text))
         asset = asset_search[0]
         return asset
@@ -35,11 +37,11 @@ class SnipeITAPI:
             "name": name,
         }
         headers = self.headers()
-        r = requests.post(checkout_url, json=payload, headers=headers)
+        r = self.session.post(checkout_url, json=payload, headers=headers)
         data = r.json()
         if "status" in data and data["status"] == "error":
             raise Exception(f'{data["messages"]}')
-        r = requests.put(status_url, json=payload, headers=headers)
+        r = self.session.put(status_url, json=payload, headers=headers)
         data = r.json()
         if "status" in data and data["status"] == "error":
             raise Exception(f'{data["messages"]}')
@@ -47,19 +49,19 @@ class SnipeITAPI:
     def lookup_locations_raw(self):
         query_url = f"https://{self.hostname}/api/v1/locations"
         headers = self.headers()
-        locations = requests.get(query_url, headers=headers)
+        locations = self.session.get(query_url, headers=headers)
         return locations
 
     def lookup_serial_raw(self, serial):
         query_url = f"https://{self.hostname}/api/v1/hardware/byserial/{serial}"
         headers = self.headers()
-        device = requests.get(query_url, headers=headers)
+        device = self.session.get(query_url, headers=headers)
         return device
 
     def lookup_asset_raw(self, id):
         query_url = f"https://{self.hostname}/api/v1/hardware/{id}"
         headers = self.headers()
-        device = requests.get(query_url, headers=headers)
+        device = self.session.get(query_url, headers=headers)
         return device
 
     def headers(self) -> dict:
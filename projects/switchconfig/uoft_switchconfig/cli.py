@@ -16,6 +16,7 @@ from uoft_core import (
     parse_config_file,
     write_config_file,
 )
+from uoft_core.completion import cached_completion
 from uoft_core.console import console
 from uoft_core.other import Prompt
 
@@ -183,18 +184,16 @@ def get_cache_dir(cache_dir: Optional[Path] = None):
     return cache_dir
 
 
-def template_name_completion(ctx: typer.Context, partial: str):
+def _template_dirs(ctx: typer.Context):
+    # every directory in the template cache, so that adding a template anywhere in it invalidates the completion cache
     root = get_cache_dir(ctx.params["cache_dir"])
+    return [root, *(p for p in root.rglob("*") if p.is_dir())]
 
-    def template_names():
-        for path in root.rglob("*.j2"):
-            path = path.relative_to(root)
-            path = str(path)
-            if partial and partial not in path:
-                continue
-            yield path
 
-    return list(template_names())
+@cached_completion(ttl=3600, params=["cache_dir"], watch=_template_dirs, match="substring")
+def template_name_completion(ctx: typer.Context):
+    root = get_cache_dir(ctx.params["cache_dir"])
+    return [str(path.relative_to(root)) for path in root.rglob("*.j2")]
 
 
 class args:
@@ -237,7 +236,7 @@ def generate_from_cache(
             logger.info("reading data from stdin and parsing as JSON...")
             data = json.load(sys.stdin)
         else:
-            data = parse_config_file(data_file, parse_as=data_file_format)
+            data = parse_config_file(data_file, parse_as=data_file_format, plain=True)
     else:
         data = {}
     cache_dir = get_cache_dir(cache_dir)
@@ -260,7 +259,7 @@ def generate_from_file(
             logger.info("reading data from stdin and parsing as JSON...")
             data = json.load(sys.stdin)
         else:
-            data = parse_config_file(data_file, parse_as=data_file_format)
+            data = parse_config_file(data_file, parse_as=data_file_format, plain=True)
     else:
         data = {}
     print(render_template(template, data))
@@ -3,7 +3,7 @@ import sys
 from typing import Callable, Optional, Any, Type
 from inspect import getmembers, isfunction
 from pydantic.v1 import BaseModel
-from jinja2 import Environment, StrictUndefined, FileSystemLoader
+from jinja2 import StrictUndefined
 
 from .util import (
     DEFAULT_GLOBALS,
@@ -14,7 +14,7 @@ from .util import (
     normalize_extension_name
 )
 
-from uoft_core import logging
+from uoft_core import logging, jinja_library
 
 logger = logging.getLogger(__name__)
 
@@ -108,34 +108,36 @@ def render_template(template: Path, input_data: dict[str, Any] | None = None):
         template_data = input_data
     template_data = validate_data_for_template(template, extension, template_data)
 
-    jinja = Environment(
+    # Add filter and test functions from the Filters and Tests classes to the environment for use inside the templates.
+    # Environments are shared between renders which use the same template directory and extension module, so that
+    # templates are only compiled once
+    if extension and extension.filters:
+        logger.trace("Loading filters from `Filters` class in template extension module")
+    if extension and extension.tests:
+        logger.trace("Loading tests from `Tests` class in template extension module")
+    jinja = jinja_library.get_environment(
+        template.parent,
+        filters=extension.filters if extension else None,
+        tests=extension.tests if extension else None,
         trim_blocks=True,
         lstrip_blocks=True,
-        loader=FileSystemLoader(template.parent),
         undefined=StrictUndefined,
         line_statement_prefix="//",
         line_comment_prefix="##",
     )
-    # Add filter functions from the Filters class to the environment for use inside the templates
-    if extension and extension.filters:
-        logger.trace("Loading filters from `Filters` class in template extension module")
-        jinja.filters.update(extension.filters)
-
-    # Add test functions from the Tests class to the environment for use inside the templates
-    if extension and extension.tests:
-        logger.trace("Loading tests from `Tests` class in template extension module")
-        jinja.tests.update(extension.tests)
 
     # make all useable data available to the template
-    jinja.globals.update(DEFAULT_GLOBALS)
+    template_globals = dict(DEFAULT_GLOBALS)
     if extension and extension.globals:
         logger.trace("loading `GLOBALS` from templates module")
-        jinja.globals.update(extension.globals)
-    jinja.globals.update(template_data)
-    logger.trace(f"jinja environment globals: {jinja.globals}")
-
-    # Fetch and render the template
-    rendered = jinja.get_template(template.name).render()
+        template_globals.update(extension.globals)
+    template_globals.update(template_data)
+    logger.trace(f"jinja template globals: {template_globals}")
+
+    # Fetch and render the template.
+    # The environment is shared, so the data goes into the globals of a fresh copy of the template rather than into
+    # the environment's globals
+    rendered = jinja_library.load_template(jinja, template.name, template_globals).render()
 
     logger.success(f"template {template.name} has been successfully rendered")
 
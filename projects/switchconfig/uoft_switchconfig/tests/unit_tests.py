@@ -105,7 +105,10 @@ ADVANCED_INTERMEDIARY = {
 
 class CLITests:
     "integration tests for the CLI code"
-    def template_name_completion_test(self):
+    def template_name_completion_test(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+        # keep cached completion candidates out of the real cache directory
+        monkeypatch.setenv("UOFT_CORE_USER_CACHE", str(tmp_path))
+
         class MockContext:
             params = {"cache_dir": Path(__file__).parent / "fixtures/templates"}
 
@@ -134,6 +137,15 @@ class CLITests:
             ]
         )
 
+        # partial names match anywhere in the path, not just at the start
+        res = template_name_completion(MockContext(), "other")  # pyright: ignore[reportArgumentType]
+        assert set(res) == set(
+            [
+                "subdirectory/other_template.j2",
+            ]
+        )
+        assert list(tmp_path.rglob("*.json"))
+
     def console_name_completion_test(self, mocker: "MockFixture"):
         mock_settings = Settings(
             generate={"templates_dir": Path(__file__).parent / "templates"}, # type: ignore